@@ -7,6 +7,37 @@ from rest_framework.test import APIClient
 from core.models import User, Brand, Category, Product
 
 
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark")
+    group.addoption(
+        "--benchmark",
+        action="store_true",
+        help="run the endpoint benchmarks against their baseline",
+    )
+    group.addoption(
+        "--benchmark-update",
+        action="store_true",
+        help="run the endpoint benchmarks and rewrite their baseline",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: endpoint benchmark, needs --benchmark"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark") or config.getoption(
+        "--benchmark-update"
+    ):
+        return
+    skip = pytest.mark.skip(reason="needs --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
 @pytest.fixture
 def api_client():
     """
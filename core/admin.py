@@ -11,6 +11,7 @@ from core.models import (
     DeliveryTimeStatus,
     Faq,
     Carousel,
+    Tag,
 )
 
 # Register your models here.
@@ -25,3 +26,4 @@ admin.site.register(DeliveryTimeStatus)
 admin.site.register(Faq)
 admin.site.register(Carousel)
 admin.site.register(Image)
+admin.site.register(Tag)
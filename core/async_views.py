@@ -0,0 +1,257 @@
+"""
+Async read views for the catalog
+
+The async counterparts of the category, brand and product list/detail
+GET endpoints in ``core.views``, for deployments served by an ASGI
+server (``eshop_backend.asgi``). Queries go through Django's async ORM
+and cache reads through the async cache API, so a worker keeps serving
+other requests while one waits on the database or the cache.
+
+They answer the same JSON, conditional GET validators and errors as the
+DRF views, and share the product detail cache with them; writes and the
+browsable API stay on the DRF views. Under WSGI they still work, Django
+runs each one in an event loop of its own.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from rest_framework import exceptions, permissions
+from rest_framework.request import Request
+from core.authentication import JWTAuthentication
+from core.cache import product_detail_cache
+from core.conditional import afingerprint, set_validators, validators
+from core.db import primary_reads, replica_reads
+from core.filters import ProductFilter
+from core.models import (
+    Brand,
+    Carousel,
+    Category,
+    Compatibility,
+    DeliveryTimeStatus,
+    Faq,
+    Image,
+    Product,
+    Specification,
+    Variant,
+)
+from core.pagination import ProductCursorPagination
+from core.querysets import annotate_lead_image, plan_queryset
+from core.renderers import JSONRenderer
+from core.serializers import (
+    BrandSerializer,
+    CategorySerializer,
+    ProductDetailSerializer,
+    ProductListSerializer,
+)
+
+
+class AsyncReadView(View):
+    """
+    JSON GET view with the DRF views' authentication, conditional GET
+    and error bodies
+    """
+
+    http_method_names = ["get"]
+    authentication_class = JWTAuthentication
+    permission_class = permissions.IsAuthenticated
+    renderer = JSONRenderer()
+
+    async def get(self, request, *args, **kwargs):
+        # query_params, build_absolute_uri and friends for serializers,
+        # filters and pagination
+        request = Request(request)
+        try:
+            await self.check_permissions(request)
+            rows = await afingerprint(
+                *self.get_conditional_querysets(request, *args, **kwargs)
+            )
+            etag, last_modified = validators(
+                request, self.renderer.media_type, rows
+            )
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = await self.respond(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+        return set_validators(response, etag, last_modified)
+
+    def handle_exception(self, request, exc):
+        """The error response DRF's exception handler would give"""
+
+        response = self.render(
+            (
+                exc.detail
+                if isinstance(exc.detail, (dict, list))
+                else {"detail": exc.detail}
+            ),
+            status=exc.status_code,
+        )
+        if exc.status_code == 401:
+            response["WWW-Authenticate"] = (
+                self.authentication_class().authenticate_header(request)
+            )
+        return response
+
+    async def check_permissions(self, request):
+        result = None
+        if request.META.get("HTTP_AUTHORIZATION"):
+            # on a token cache miss it queries the user, off the loop
+            result = await sync_to_async(
+                self.authentication_class().authenticate
+            )(request._request)
+        if result is not None:
+            request.user, request.auth = result
+        if not self.permission_class().has_permission(request, self):
+            if result is None:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied()
+
+    def get_conditional_querysets(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    async def respond(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def render(self, data, status=200):
+        return HttpResponse(
+            self.renderer.render(data),
+            content_type=self.renderer.media_type,
+            status=status,
+        )
+
+    @staticmethod
+    async def get_or_404(queryset):
+        found = await queryset.afirst()
+        if found is None:
+            raise exceptions.NotFound()
+        return found
+
+
+class AsyncCategoryListView(AsyncReadView):
+    """All categories"""
+
+    def get_conditional_querysets(self, request, *args, **kwargs):
+        return [Category.objects.all()]
+
+    async def respond(self, request, *args, **kwargs):
+        categories = [category async for category in Category.objects.all()]
+        return self.render(CategorySerializer(categories, many=True).data)
+
+
+class AsyncCategoryDetailView(AsyncReadView):
+    """One category"""
+
+    def get_conditional_querysets(self, request, pk, *args, **kwargs):
+        return [Category.objects.filter(pk=pk)]
+
+    async def respond(self, request, pk, *args, **kwargs):
+        category = await self.get_or_404(Category.objects.filter(pk=pk))
+        return self.render(CategorySerializer(category).data)
+
+
+class AsyncBrandListView(AsyncReadView):
+    """All brands"""
+
+    def get_conditional_querysets(self, request, *args, **kwargs):
+        return [Brand.objects.all()]
+
+    async def respond(self, request, *args, **kwargs):
+        brands = [brand async for brand in Brand.objects.all()]
+        return self.render(BrandSerializer(brands, many=True).data)
+
+
+class AsyncBrandDetailView(AsyncReadView):
+    """One brand"""
+
+    def get_conditional_querysets(self, request, pk, *args, **kwargs):
+        return [Brand.objects.filter(pk=pk)]
+
+    async def respond(self, request, pk, *args, **kwargs):
+        brand = await self.get_or_404(Brand.objects.filter(pk=pk))
+        return self.render(BrandSerializer(brand).data)
+
+
+class AsyncProductReadView(AsyncReadView):
+    """Public product reads, from the read replica when configured"""
+
+    permission_class = permissions.AllowAny
+
+    async def get(self, request, *args, **kwargs):
+        with replica_reads():
+            return await super().get(request, *args, **kwargs)
+
+
+class AsyncProductListView(AsyncProductReadView):
+    """Filtered, keyset paginated products"""
+
+    def get_conditional_querysets(self, request, *args, **kwargs):
+        return [
+            Product.objects.all(),
+            Brand.objects.all(),
+            Category.objects.all(),
+            Carousel.objects.all(),
+            Variant.objects.all(),
+        ]
+
+    async def respond(self, request, *args, **kwargs):
+        filterset = ProductFilter(
+            request.query_params,
+            queryset=annotate_lead_image(Product.objects.all()),
+            request=request,
+        )
+        if not filterset.is_valid():
+            raise exceptions.ValidationError(filterset.errors)
+        queryset = plan_queryset(filterset.qs, ProductListSerializer)
+
+        paginator = ProductCursorPagination()
+        page = paginator.page_queryset(queryset, request)
+        rows = paginator.paginate_rows([product async for product in page])
+        serializer = ProductListSerializer(
+            rows, many=True, context={"request": request}
+        )
+        return self.render(paginator.get_paginated_data(serializer.data))
+
+
+class AsyncProductDetailView(AsyncProductReadView):
+    """One product, through the product detail cache"""
+
+    def get_conditional_querysets(self, request, pk, *args, **kwargs):
+        return [
+            Product.objects.filter(pk=pk),
+            Brand.objects.filter(products=pk),
+            Category.objects.filter(products=pk),
+            Variant.objects.filter(product=pk),
+            Image.objects.filter(variant_images__product=pk),
+            Specification.objects.filter(product=pk),
+            Compatibility.objects.filter(product=pk),
+            DeliveryTimeStatus.objects.filter(product=pk),
+            Faq.objects.filter(product=pk),
+            Carousel.objects.filter(product=pk),
+        ]
+
+    async def respond(self, request, pk, *args, **kwargs):
+        key = await product_detail_cache.akey(pk)
+        content = await product_detail_cache.aget(key)
+        if content is None:
+            # built from the primary, which bumped the version
+            with primary_reads():
+                product = await self.get_or_404(
+                    plan_queryset(
+                        Product.objects.filter(pk=pk), ProductDetailSerializer
+                    )
+                )
+            serializer = ProductDetailSerializer(
+                product, context={"request": request}
+            )
+            content = self.renderer.render(serializer.data)
+            await product_detail_cache.aset(key, content)
+            cached = "MISS"
+        else:
+            cached = "HIT"
+        response = HttpResponse(content, content_type=self.renderer.media_type)
+        response["X-Cache"] = cached
+        return response
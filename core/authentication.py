@@ -0,0 +1,194 @@
+"""
+Authentication classes for Core App endpoints
+
+``JWTAuthentication`` remembers the access tokens it has verified, keyed
+by the token's SHA-256 and dropped at the token's ``exp``, and the user
+row each one resolves to. A request presenting a token seen before skips
+the signature check, the claim decoding and the user query. User rows
+are forgotten when the user is saved or deleted (see ``core.signals``)
+and after ``JWT_USER_CACHE_TIMEOUT`` seconds, which bounds how long a
+queryset ``update()`` elsewhere, or in another process, goes unnoticed.
+"""
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt import authentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from core.metrics import CACHE_REQUESTS, JWT_AUTHENTICATIONS
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified tokens and the users they resolve to"""
+
+    def __init__(self, size=None, user_timeout=None):
+        self.size = size or getattr(settings, "JWT_TOKEN_CACHE_SIZE", 10000)
+        self.user_timeout = user_timeout or getattr(
+            settings, "JWT_USER_CACHE_TIMEOUT", 60
+        )
+        self._tokens = OrderedDict()
+        self._users = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(raw_token):
+        return hashlib.sha256(raw_token).digest()
+
+    def get_token(self, key):
+        """The verified token stored under ``key``, unless it expired"""
+
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is not None:
+                if entry[1] > time.time():
+                    self._tokens.move_to_end(key)
+                    return entry[0]
+                del self._tokens[key]
+        return None
+
+    def set_token(self, key, token):
+        with self._lock:
+            self._tokens[key] = (token, token["exp"])
+            self._tokens.move_to_end(key)
+            while len(self._tokens) > self.size:
+                self._tokens.popitem(last=False)
+
+    def forget_token(self, key):
+        with self._lock:
+            self._tokens.pop(key, None)
+
+    def get_user(self, user_id):
+        """A copy of the cached user row, requests may change theirs"""
+
+        entry = self._users.get(user_id)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return copy.copy(entry[0])
+
+    def set_user(self, user_id, user):
+        with self._lock:
+            self._users[user_id] = (user, time.monotonic() + self.user_timeout)
+            # expired rows are only swept when the dict is full
+            if len(self._users) > self.size:
+                now = time.monotonic()
+                for stale in [
+                    pk
+                    for pk, (_, expires) in self._users.items()
+                    if expires <= now
+                ]:
+                    del self._users[stale]
+                while len(self._users) > self.size:
+                    del self._users[next(iter(self._users))]
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+
+
+token_cache = VerifiedTokenCache()
+
+
+class JWTAuthentication(authentication.JWTAuthentication):
+    """simplejwt authentication that caches verified tokens and users"""
+
+    def authenticate(self, request):
+        try:
+            result = super().authenticate(request)
+        except InvalidToken:
+            JWT_AUTHENTICATIONS.inc(outcome="invalid_token")
+            raise
+        except AuthenticationFailed:
+            JWT_AUTHENTICATIONS.inc(outcome="failed")
+            raise
+        JWT_AUTHENTICATIONS.inc(
+            outcome="anonymous" if result is None else "success"
+        )
+        return result
+
+    def get_validated_token(self, raw_token):
+        key = token_cache.key(raw_token)
+        token = token_cache.get_token(key)
+        CACHE_REQUESTS.inc(
+            cache="jwt-token", result="miss" if token is None else "hit"
+        )
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            token_cache.set_token(key, token)
+        elif hasattr(token, "check_blacklist"):
+            # blacklisting happens after verification, check on every use
+            try:
+                token.check_blacklist()
+            except TokenError as error:
+                token_cache.forget_token(key)
+                raise InvalidToken(
+                    {
+                        "detail": _(
+                            "Given token not valid for any token type"
+                        ),
+                        "messages": [
+                            {
+                                "token_class": type(token).__name__,
+                                "token_type": token.token_type,
+                                "message": error.args[0],
+                            }
+                        ],
+                    }
+                ) from error
+        return token
+
+    def user_fields(self):
+        """The user columns cached, the hash only when tokens carry it"""
+
+        return [
+            field.attname
+            for field in self.user_model._meta.concrete_fields
+            if field.name != "password" or api_settings.CHECK_REVOKE_TOKEN
+        ]
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as error:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from error
+
+        user = token_cache.get_user(user_id)
+        CACHE_REQUESTS.inc(
+            cache="jwt-user", result="miss" if user is None else "hit"
+        )
+        if user is None:
+            try:
+                user = self.user_model.objects.only(*self.user_fields()).get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist as error:
+                raise AuthenticationFailed(
+                    _("User not found"), code="user_not_found"
+                ) from error
+            token_cache.set_user(user_id, copy.copy(user))
+
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."),
+                code="password_changed",
+            )
+        return user
@@ -0,0 +1,276 @@
+"""
+Refresh token blacklist
+
+Rotated refresh tokens are recorded by jti in ``BlacklistedToken``, a
+table indexed by jti and by expiry, until they would have expired
+anyway. Each process keeps a Bloom filter of the recorded jtis in front
+of the table: a jti the filter has not seen, which is nearly every token
+presented, is answered without a query, and a possible match costs one
+unique index lookup. Neither depends on how large the table grows.
+
+The filter is built from the table on a background thread, the first
+time it is needed in a process and when it fills past capacity, so no
+request waits on a scan of every unexpired jti. Until the first one is
+ready every check is answered by the index (with
+``TOKEN_BLACKLIST_BACKGROUND_LOAD = False`` the caller builds it).
+
+Rows other processes add reach the filter at most
+``TOKEN_BLACKLIST_SYNC_INTERVAL`` seconds later (0 syncs on every
+check). Expired rows are deleted in batches, one batch at most every
+``TOKEN_BLACKLIST_PRUNE_INTERVAL`` seconds as tokens are added, and all
+of them by the ``prune_token_blacklist`` command.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from core.models import BlacklistedToken
+
+logger = logging.getLogger(__name__)
+
+# rows committed out of created_at order still reach the filter
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+class BloomFilter:
+    """Set of strings answering "maybe" or "no" in a fixed bit array"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.size = math.ceil(
+            -self.capacity * math.log(error_rate) / math.log(2) ** 2
+        )
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # double hashing, k positions out of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return [
+            (first + index * step) % self.size for index in range(self.hashes)
+        ]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class TokenBlacklist:
+    """Blacklisted jtis, a per-process Bloom filter over the table"""
+
+    def __init__(self, capacity=None, error_rate=None):
+        self.capacity = capacity or getattr(
+            settings, "TOKEN_BLACKLIST_CAPACITY", 1000000
+        )
+        self.error_rate = error_rate or getattr(
+            settings, "TOKEN_BLACKLIST_ERROR_RATE", 0.01
+        )
+        self._filter = None
+        self._synced_at = None
+        self._next_sync = 0.0
+        self._next_prune = 0.0
+        # while a filter is built: the jtis added meanwhile, and a
+        # generation telling a build the filter was reset under it
+        self._loading = False
+        self._added = []
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def sync_interval(self):
+        return getattr(settings, "TOKEN_BLACKLIST_SYNC_INTERVAL", 1.0)
+
+    @property
+    def prune_interval(self):
+        return getattr(settings, "TOKEN_BLACKLIST_PRUNE_INTERVAL", 60)
+
+    @property
+    def background(self):
+        return getattr(settings, "TOKEN_BLACKLIST_BACKGROUND_LOAD", True)
+
+    def load(self):
+        """Build a filter from the unexpired rows and swap it in"""
+
+        with self._lock:
+            generation = self._generation
+        started = timezone.now()
+        rows = BlacklistedToken.objects.filter(expires_at__gt=started)
+        bloom = BloomFilter(
+            max(self.capacity, rows.count() * 2), self.error_rate
+        )
+        for jti in rows.values_list("jti", flat=True).iterator(
+            chunk_size=10000
+        ):
+            bloom.add(jti)
+        with self._lock:
+            if generation != self._generation:
+                return
+            for jti in self._added:
+                bloom.add(jti)
+            self._filter = bloom
+            self._synced_at = started
+            self._next_sync = time.monotonic() + self.sync_interval
+            self._loading = False
+            self._added = []
+
+    def _load_in_background(self):
+        try:
+            self.load()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Building the token blacklist filter failed")
+            with self._lock:
+                self._loading = False
+        finally:
+            # connections are per thread, do not leak this one's
+            connections.close_all()
+
+    def _sync(self):
+        """
+        The filter to check against, ``None`` while the first one is
+        built. Missing or past capacity, a filter is built off the
+        request path; past capacity the error rate climbs, so the full
+        filter keeps answering until the rebuilt one replaces it.
+        """
+
+        with self._lock:
+            bloom = self._filter
+            build = not self._loading and (
+                bloom is None or bloom.count > bloom.capacity
+            )
+            if build:
+                self._loading = True
+                self._added = []
+        if build:
+            if not self.background:
+                self.load()
+                return self._filter
+            threading.Thread(
+                target=self._load_in_background,
+                name="token-blacklist",
+                daemon=True,
+            ).start()
+        if bloom is not None and time.monotonic() >= self._next_sync:
+            self._catch_up(bloom)
+        return bloom
+
+    def _catch_up(self, bloom):
+        """Add the rows other processes wrote since the last sync"""
+
+        # one request syncs, the others go on with the filter as it is
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if bloom is not self._filter or (
+                time.monotonic() < self._next_sync
+            ):
+                return
+            since = self._synced_at - SYNC_OVERLAP
+            self._synced_at = timezone.now()
+            for jti in BlacklistedToken.objects.filter(
+                created_at__gte=since
+            ).values_list("jti", flat=True):
+                if jti not in bloom:
+                    bloom.add(jti)
+            self._next_sync = time.monotonic() + self.sync_interval
+        finally:
+            self._lock.release()
+
+    def __contains__(self, jti):
+        bloom = self._sync()
+        if bloom is not None and jti not in bloom:
+            return False
+        # a possible match, or no filter yet: the unique index decides
+        return BlacklistedToken.objects.filter(jti=jti).exists()
+
+    def add(self, jti, expires_at):
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(jti=jti, expires_at=expires_at)],
+            ignore_conflicts=True,
+        )
+        self._sync()
+        with self._lock:
+            if self._loading:
+                self._added.append(jti)
+            if self._filter is not None and jti not in self._filter:
+                self._filter.add(jti)
+            prune = time.monotonic() >= self._next_prune
+            if prune:
+                self._next_prune = time.monotonic() + self.prune_interval
+        if prune:
+            self.prune(batches=1)
+
+    def prune(self, batch_size=1000, batches=None):
+        """
+        Delete expired rows, ``batch_size`` per statement, and return how
+        many were deleted. ``batches`` stops after that many statements.
+        """
+
+        expired = BlacklistedToken.objects.filter(
+            expires_at__lte=timezone.now()
+        )
+        deleted = 0
+        while batches is None or batches > 0:
+            pks = list(
+                expired.order_by("expires_at").values_list("pk", flat=True)[
+                    :batch_size
+                ]
+            )
+            if not pks:
+                break
+            deleted += BlacklistedToken.objects.filter(pk__in=pks).delete()[0]
+            if batches is not None:
+                batches -= 1
+        return deleted
+
+    def reset(self):
+        """Forget the filter, the next check rebuilds it"""
+
+        with self._lock:
+            self._filter = None
+            self._loading = False
+            self._added = []
+            self._generation += 1
+            self._next_sync = self._next_prune = 0.0
+
+
+token_blacklist = TokenBlacklist()
+
+
+class RefreshToken(tokens.RefreshToken):
+    """Refresh token checked against, and rotated into, the blacklist"""
+
+    def verify(self, *args, **kwargs):
+        self.check_blacklist()
+        super().verify(*args, **kwargs)
+
+    def check_blacklist(self):
+        jti = self.payload.get(api_settings.JTI_CLAIM)
+        if jti and jti in token_blacklist:
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        token_blacklist.add(
+            self.payload[api_settings.JTI_CLAIM],
+            datetime_from_epoch(self.payload["exp"]),
+        )
@@ -0,0 +1,120 @@
+"""
+Versioned response cache for product detail pages
+
+Rendered JSON is stored under a key built from a per-product version
+token and a catalog-wide token. Writes never delete cached payloads;
+they bump a version (see ``core.signals``) so the old key simply stops
+being read and expires on its own.
+"""
+
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from core.metrics import CACHE_REQUESTS
+
+
+class ProductDetailCache:
+    """Rendered product detail payloads keyed by product version"""
+
+    key_prefix = "product-detail"
+
+    def __init__(self, alias=None, timeout=None):
+        self.alias = alias or getattr(
+            settings, "PRODUCT_DETAIL_CACHE_ALIAS", "default"
+        )
+        self.timeout = timeout or getattr(
+            settings, "PRODUCT_DETAIL_CACHE_TIMEOUT", 60 * 60
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _version_key(self, pk):
+        return f"{self.key_prefix}:version:{pk}"
+
+    @property
+    def _catalog_key(self):
+        return f"{self.key_prefix}:version:catalog"
+
+    @staticmethod
+    def _new_token():
+        # never reuse a token after eviction, so a lost version key can
+        # not resurrect a payload rendered before the last write
+        return time.time_ns()
+
+    def _versions(self, pk):
+        keys = [self._version_key(pk), self._catalog_key]
+        found = self.cache.get_many(keys)
+        for key in keys:
+            if key not in found:
+                self.cache.add(key, self._new_token(), timeout=None)
+                found[key] = self.cache.get(key)
+        return found[keys[0]], found[keys[1]]
+
+    def key(self, pk):
+        version, catalog = self._versions(pk)
+        return f"{self.key_prefix}:{pk}:{version}:{catalog}"
+
+    async def _aversions(self, pk):
+        keys = [self._version_key(pk), self._catalog_key]
+        found = await self.cache.aget_many(keys)
+        for key in keys:
+            if key not in found:
+                await self.cache.aadd(key, self._new_token(), timeout=None)
+                found[key] = await self.cache.aget(key)
+        return found[keys[0]], found[keys[1]]
+
+    async def akey(self, pk):
+        version, catalog = await self._aversions(pk)
+        return f"{self.key_prefix}:{pk}:{version}:{catalog}"
+
+    def get(self, key):
+        return self._count(self.cache.get(key))
+
+    async def aget(self, key):
+        return self._count(await self.cache.aget(key))
+
+    def _count(self, content):
+        with self._lock:
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        CACHE_REQUESTS.inc(
+            cache=self.key_prefix, result="miss" if content is None else "hit"
+        )
+        return content
+
+    def set(self, key, content):
+        self.cache.set(key, content, timeout=self.timeout)
+
+    async def aset(self, key, content):
+        await self.cache.aset(key, content, timeout=self.timeout)
+
+    def invalidate(self, *pks):
+        """Bump the version of each product in ``pks``"""
+
+        tokens = {self._version_key(pk): self._new_token() for pk in set(pks)}
+        if tokens:
+            self.cache.set_many(tokens, timeout=None)
+
+    def invalidate_all(self):
+        """Bump the catalog version, retiring every cached payload"""
+
+        self.cache.set(self._catalog_key, self._new_token(), timeout=None)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+product_detail_cache = ProductDetailCache()
@@ -0,0 +1,90 @@
+"""
+Cart operations
+
+Quantities are changed with single ``UPDATE`` statements (``F()``
+expressions) and rows are created through a savepoint guarded by the
+unique ``(cart, product_variant)`` constraint, so concurrent requests
+never lose an increment or insert a duplicate row.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce
+from core.db import retry_on_lock_conflict
+from core.models import Cart, CartItem
+
+LINE_TOTAL = ExpressionWrapper(
+    F("quantity") * F("product_variant__price"),
+    output_field=DecimalField(max_digits=12, decimal_places=2),
+)
+
+
+@retry_on_lock_conflict
+def get_cart(user):
+    """Return the user's cart, creating it on first use"""
+
+    cart, _ = Cart.objects.get_or_create(user=user)
+    return cart
+
+
+def cart_items(cart):
+    """Cart lines with their variant, product and line total"""
+
+    return (
+        cart.items.select_related("product_variant__product")
+        .annotate(line_total=LINE_TOTAL)
+        .order_by("id")
+    )
+
+
+def cart_total(cart):
+    """Sum of ``quantity * price`` over the cart in one query"""
+
+    return cart.items.aggregate(
+        total=Coalesce(
+            Sum(LINE_TOTAL), 0, output_field=LINE_TOTAL.output_field
+        )
+    )["total"]
+
+
+def _upsert(cart, variant, quantity, update):
+    """Set the line quantity to ``update``, inserting ``quantity`` if new"""
+
+    items = CartItem.objects.filter(cart=cart, product_variant=variant)
+    if items.update(quantity=update):
+        return
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(
+                cart=cart, product_variant=variant, quantity=quantity
+            )
+    except IntegrityError:
+        # a concurrent request inserted the line first
+        items.update(quantity=update)
+
+
+@retry_on_lock_conflict
+def add_item(cart, variant, quantity=1):
+    """Add ``quantity`` of ``variant``, incrementing an existing line"""
+
+    _upsert(cart, variant, quantity, F("quantity") + quantity)
+
+
+@retry_on_lock_conflict
+def set_quantity(cart, variant, quantity):
+    """Set the line quantity, removing the line when it reaches zero"""
+
+    if quantity <= 0:
+        remove_item(cart, variant)
+    else:
+        _upsert(cart, variant, quantity, quantity)
+
+
+@retry_on_lock_conflict
+def remove_item(cart, variant):
+    CartItem.objects.filter(cart=cart, product_variant=variant).delete()
+
+
+@retry_on_lock_conflict
+def clear(cart):
+    cart.items.all().delete()
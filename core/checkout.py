@@ -0,0 +1,137 @@
+"""
+Checkout: turn the user's cart into an order
+
+Everything happens in one transaction with a fixed number of queries,
+whatever the cart size:
+
+1. touch the cart row, serializing checkouts of the same cart and, on
+   SQLite, taking the write lock before anything is read;
+2. read the cart lines;
+3. lock the variants in primary key order (no-op on SQLite) and read
+   their prices as the order snapshot;
+4. decrement stock with one conditional ``UPDATE`` that only matches
+   variants with enough stock, so stock can never go negative;
+5. insert the order, ``bulk_create`` its items, and sum the total in
+   the database;
+6. clear the cart.
+
+A transaction that loses a lock conflict is retried, see
+``core.db.retry_on_lock_conflict``.
+"""
+
+from django.db import transaction
+from django.db.models import (
+    Case,
+    DecimalField,
+    F,
+    OuterRef,
+    PositiveIntegerField,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.utils import timezone
+from core.cache import product_detail_cache
+from core.db import retry_on_lock_conflict
+from core.models import Cart, CartItem, Order, OrderItem, Variant
+
+
+class CheckoutError(Exception):
+    """Base class for checkout failures"""
+
+
+class EmptyCartError(CheckoutError):
+    """The cart has no lines to order"""
+
+
+class InsufficientStockError(CheckoutError):
+    """Some variants do not have the requested quantity in stock"""
+
+    def __init__(self, variant_ids):
+        super().__init__(f"Insufficient stock for variants {variant_ids}")
+        self.variant_ids = variant_ids
+
+
+@retry_on_lock_conflict
+def checkout(user, shipping_address, payment_mode="qrcode"):
+    """Create an ``Order`` from ``user``'s cart and return it"""
+
+    now = timezone.now()
+    with transaction.atomic():
+        if not Cart.objects.filter(user=user).update(updated_at=now):
+            raise EmptyCartError("Cart is empty")
+        lines = dict(
+            CartItem.objects.filter(cart__user=user)
+            .order_by("product_variant_id")
+            .values_list("product_variant_id", "quantity")
+        )
+        if not lines:
+            raise EmptyCartError("Cart is empty")
+
+        variants = {
+            pk: (price, product_id)
+            for pk, price, product_id in Variant.objects.select_for_update()
+            .filter(pk__in=lines)
+            .order_by("pk")
+            .values_list("pk", "price", "product_id")
+        }
+        wanted = Case(
+            *[When(pk=pk, then=Value(qty)) for pk, qty in lines.items()],
+            output_field=PositiveIntegerField(),
+        )
+        reserved = Variant.objects.filter(
+            pk__in=lines, stock__gte=wanted
+        ).update(stock=F("stock") - wanted, updated_at=now)
+        if reserved != len(lines):
+            # raising rolls back the partial decrement
+            raise InsufficientStockError(
+                sorted(set(lines) - set(variants))
+                or list(
+                    Variant.objects.filter(pk__in=lines, stock__lt=wanted)
+                    .order_by("pk")
+                    .values_list("pk", flat=True)
+                )
+            )
+
+        order = Order.objects.create(
+            user=user,
+            total_amount=0,
+            shipping_address=shipping_address,
+            payment_mode=payment_mode,
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product_variant_id=pk,
+                    quantity=quantity,
+                    price=variants[pk][0],
+                )
+                for pk, quantity in lines.items()
+            ]
+        )
+        total = (
+            OrderItem.objects.filter(order=OuterRef("pk"))
+            .values("order")
+            .annotate(
+                total=Sum(
+                    F("quantity") * F("price"),
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                )
+            )
+            .values("total")
+        )
+        Order.objects.filter(pk=order.pk).update(total_amount=Subquery(total))
+        order.total_amount = Order.objects.values_list(
+            "total_amount", flat=True
+        ).get(pk=order.pk)
+        CartItem.objects.filter(cart__user=user).delete()
+
+        # stock is part of the cached product payloads
+        product_ids = {product_id for _, product_id in variants.values()}
+        transaction.on_commit(
+            lambda: product_detail_cache.invalidate(*product_ids)
+        )
+
+    return order
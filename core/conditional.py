@@ -0,0 +1,103 @@
+"""
+Conditional GET support for catalog views
+
+Validators are computed from ``COUNT(*)`` and ``MAX(updated_at)`` of the
+querysets a payload is built from, so a matching ``If-None-Match`` or
+``If-Modified-Since`` is answered with 304 before any serializer runs.
+"""
+
+import hashlib
+from functools import wraps
+from django.db.models import Count, Max, Value
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def _fingerprint_query(querysets):
+    parts = [
+        queryset.order_by()
+        .annotate(fingerprint_group=Value(index))
+        .values("fingerprint_group")
+        .annotate(count=Count("pk"), latest=Max("updated_at"))
+        .values_list("fingerprint_group", "count", "latest")
+        for index, queryset in enumerate(querysets)
+    ]
+    return parts[0].union(*parts[1:], all=True)
+
+
+def _fingerprint_rows(rows, size):
+    # an empty queryset yields no group row at all
+    return [rows.get(index, (0, None)) for index in range(size)]
+
+
+def fingerprint(*querysets):
+    """
+    Return ``(count, latest updated_at)`` for each queryset.
+
+    All aggregates are fetched in a single ``UNION ALL`` query.
+    """
+
+    rows = {
+        group: (count, latest)
+        for group, count, latest in _fingerprint_query(querysets)
+    }
+    return _fingerprint_rows(rows, len(querysets))
+
+
+async def afingerprint(*querysets):
+    """``fingerprint`` for async views"""
+
+    rows = {
+        group: (count, latest)
+        async for group, count, latest in _fingerprint_query(querysets)
+    }
+    return _fingerprint_rows(rows, len(querysets))
+
+
+def validators(request, media_type, rows):
+    """``(ETag, Last-Modified timestamp)`` of a fingerprinted payload"""
+
+    digest = hashlib.blake2b(
+        repr((request.get_full_path(), media_type, rows)).encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+    timestamps = [latest for _, latest in rows if latest is not None]
+    last_modified = int(max(timestamps).timestamp()) if timestamps else None
+    return quote_etag(digest), last_modified
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers.setdefault("ETag", etag)
+        if last_modified is not None:
+            response.headers.setdefault(
+                "Last-Modified", http_date(last_modified)
+            )
+    return response
+
+
+def conditional_get(view_method):
+    """
+    Answer conditional requests for a DRF view handler.
+
+    The view provides ``get_conditional_querysets(request, *args,
+    **kwargs)``; its fingerprint becomes a strong ``ETag`` and the most
+    recent ``updated_at`` becomes ``Last-Modified``.
+    """
+
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        rows = fingerprint(
+            *self.get_conditional_querysets(request, *args, **kwargs)
+        )
+        etag, last_modified = validators(
+            request, request.accepted_media_type, rows
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view_method(self, request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    return wrapper
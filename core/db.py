@@ -0,0 +1,166 @@
+"""
+Database helpers for Core App
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.db import OperationalError, connection, connections
+
+_replica_reads = ContextVar("replica_reads", default=False)
+_query_observers = ContextVar("query_observers", default=())
+
+# SQLite "database is locked" / "database table is locked", PostgreSQL
+# deadlock detection and serialization failures
+LOCK_CONFLICTS = ("locked", "deadlock", "could not serialize")
+
+
+def is_lock_conflict(exc):
+    message = str(exc).lower()
+    return any(conflict in message for conflict in LOCK_CONFLICTS)
+
+
+def retry_on_lock_conflict(func):
+    """
+    Retry ``func`` with jittered backoff when it loses a lock conflict.
+
+    ``func`` must be safe to rerun: a single transaction, or statements
+    that are each atomic. Inside a caller's transaction nothing is
+    retried, since the failed transaction must be rolled back first.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        retries = getattr(settings, "DATABASE_LOCK_RETRIES", 10)
+        if connection.in_atomic_block:
+            retries = 0
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if attempt >= retries or not is_lock_conflict(exc):
+                    raise
+                time.sleep(random.uniform(0, 0.005 * 2**attempt))
+                attempt += 1
+
+    return wrapper
+
+
+def apply_sqlite_pragmas(connection, pragmas=None):
+    """
+    Run ``SQLITE_PRAGMAS`` on a new SQLite connection.
+
+    Most of them (``synchronous``, ``cache_size``, ``mmap_size``,
+    ``busy_timeout``) are per connection, so they are applied on every
+    ``connection_created``; ``journal_mode=wal`` persists in the file.
+    In-memory databases ignore the file level ones.
+    """
+
+    if connection.vendor != "sqlite":
+        return
+    if pragmas is None:
+        pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def observe_query(execute, sql, params, many, context):
+    """
+    Execute wrapper on every connection, timing each statement for the
+    observers of the current context.
+    """
+
+    observers = _query_observers.get()
+    if not observers:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        for observer in observers:
+            observer(sql, elapsed)
+
+
+def install_query_observer(connection):
+    # first, since ``connection.execute_wrapper()`` blocks pop the last
+    if observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, observe_query)
+
+
+@contextmanager
+def observe_queries(observer):
+    """
+    Call ``observer(sql, seconds)`` for each statement run in this block.
+
+    Connections are per thread, so rather than wrapping the caller's
+    connections, the observer is bound to the context: statements run by
+    ``sync_to_async`` threads on behalf of an async view are seen too,
+    since they run in a copy of the caller's context.
+    """
+
+    for alias in connections:
+        install_query_observer(connections[alias])
+    token = _query_observers.set((*_query_observers.get(), observer))
+    try:
+        yield
+    finally:
+        _query_observers.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    """Route reads made in this block to the read replica, if any"""
+
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Keep reads made in this block on the primary, inside replica_reads()"""
+
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Send reads inside ``replica_reads()`` to ``REPLICA_DATABASE_ALIAS``.
+
+    Everything else, and any read made inside a transaction on the
+    primary, stays on the default database so writes are always read
+    back. The replica is never migrated; it is a copy of the primary.
+    """
+
+    @property
+    def alias(self):
+        alias = getattr(settings, "REPLICA_DATABASE_ALIAS", "replica")
+        return alias if alias in settings.DATABASES else None
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or connection.in_atomic_block:
+            return None
+        return self.alias
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == self.alias and db != "default":
+            return False
+        return None
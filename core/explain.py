@@ -0,0 +1,272 @@
+"""
+Query plan audit
+
+Runs the endpoints' real code paths against the current database,
+captures every statement they execute and asks SQLite for its
+``EXPLAIN QUERY PLAN``. A plan step that scans a whole table, rather
+than searching an index, is flagged unless the table is a small lookup
+table listed in ``LOOKUP_TABLES``. Everything runs in a transaction
+that is rolled back, so write paths (cart, checkout) can be audited
+too.
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenRefreshView
+from core import views
+from core.models import Brand, CartItem, Order, Product, Tag, Variant
+
+# bounded by the number of brands and categories, scanning is intended
+LOOKUP_TABLES = {"core_brand", "core_category"}
+
+# plan steps that read the whole of something other than a table
+NOT_TABLE_SCANS = (
+    "USING INDEX",
+    "USING COVERING INDEX",
+    "USING INTEGER PRIMARY KEY",
+    "USING ROWID",
+    "VIRTUAL TABLE",
+    "CONSTANT ROW",
+    "SUBQUERY",
+)
+
+
+class Endpoint:
+    """One request to audit"""
+
+    def __init__(
+        self, name, view, path, user=False, method="get", data=None, **kwargs
+    ):
+        self.name = name
+        self.view = view
+        self.path = path
+        self.user = user
+        self.method = method
+        self.data = data
+        # url kwargs handed to the view
+        self.kwargs = kwargs
+
+
+def endpoints(sample):
+    """The audited requests, for ids picked by ``sample_ids``"""
+
+    product_actions = {"get": "list"}
+    audited = [
+        Endpoint(
+            "product-list",
+            views.ProductAPIViewset.as_view(product_actions),
+            reverse("product-list"),
+        ),
+        Endpoint(
+            "product-list filtered",
+            views.ProductAPIViewset.as_view(product_actions),
+            f"{reverse('product-list')}?brand={sample['brand']}"
+            "&color=Black&size=M&min_price=10&in_stock=true",
+        ),
+        Endpoint(
+            "product-list by rating",
+            views.ProductAPIViewset.as_view(product_actions),
+            f"{reverse('product-list')}?ordering=rating",
+        ),
+        Endpoint(
+            "product-reviews",
+            views.ProductAPIViewset.as_view({"get": "reviews"}),
+            reverse("product-reviews", kwargs={"pk": sample["product"]}),
+            pk=sample["product"],
+        ),
+        Endpoint(
+            "product-detail",
+            views.ProductAPIViewset.as_view({"get": "retrieve"}),
+            reverse("product-detail", kwargs={"pk": sample["product"]}),
+            pk=sample["product"],
+        ),
+        Endpoint(
+            "product-search",
+            views.ProductAPIViewset.as_view({"get": "search"}),
+            f"{reverse('product-search')}?q=oak+table",
+        ),
+        Endpoint(
+            "product-facets",
+            views.ProductAPIViewset.as_view({"get": "facets"}),
+            f"{reverse('product-facets')}?color=Black",
+        ),
+        Endpoint(
+            "category-list",
+            views.CategoryListAPIView.as_view(),
+            reverse("category-list"),
+            user=True,
+        ),
+        Endpoint(
+            "brand-list",
+            views.BrandListAPIView.as_view(),
+            reverse("brand-list"),
+            user=True,
+        ),
+        Endpoint(
+            "tag-cloud", views.TagCloudView.as_view(), reverse("tag-cloud")
+        ),
+        (
+            Endpoint(
+                "tag-products",
+                views.TagProductListView.as_view(),
+                reverse("tag-products", kwargs={"slug": sample["tag"]}),
+                slug=sample["tag"],
+            )
+            # a catalog may have no tags yet
+            if sample["tag"] is not None
+            else None
+        ),
+        Endpoint("cart", views.CartView.as_view(), reverse("cart"), True),
+        Endpoint(
+            "cart-items",
+            views.CartItemListAPIView.as_view(),
+            reverse("cart-items"),
+            user=True,
+            method="post",
+            data={"variant": sample["variant"], "quantity": 1},
+        ),
+        Endpoint(
+            "checkout",
+            views.CheckoutView.as_view(),
+            reverse("checkout"),
+            user=True,
+            method="post",
+            data={"shipping_address": "1 Audit Street"},
+        ),
+        Endpoint(
+            "order-list",
+            views.OrderViewSet.as_view({"get": "list"}),
+            f"{reverse('order-list')}?status=delivered",
+            user=True,
+        ),
+        Endpoint(
+            "order-detail",
+            views.OrderViewSet.as_view({"get": "retrieve"}),
+            reverse("order-detail", kwargs={"pk": sample["order"]}),
+            user=True,
+            pk=sample["order"],
+        ),
+        Endpoint(
+            "token-refresh",
+            TokenRefreshView.as_view(),
+            reverse("token_refresh"),
+            method="post",
+            data={"refresh": str(RefreshToken.for_user(sample["user"]))},
+        ),
+    ]
+    return [endpoint for endpoint in audited if endpoint is not None]
+
+
+def sample_ids():
+    """
+    Ids of existing rows to request, or ``None`` for an empty catalog;
+    ``tag`` and ``variant`` are ``None`` when there are none.
+    """
+
+    order = Order.objects.order_by("id").first()
+    product = Product.objects.order_by("id").first()
+    if order is None or product is None:
+        return None
+    return {
+        "user": order.user,
+        "order": order.pk,
+        "product": product.pk,
+        "brand": Brand.objects.order_by("id").values_list("pk", flat=True)[0],
+        "tag": Tag.objects.order_by("id")
+        .values_list("slug", flat=True)
+        .first(),
+        "variant": Variant.objects.order_by("id")
+        .values_list("pk", flat=True)
+        .first(),
+    }
+
+
+def _host():
+    """A host name ``ALLOWED_HOSTS`` accepts"""
+
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+    return "localhost"
+
+
+def plan(sql, params):
+    """``EXPLAIN QUERY PLAN`` detail lines of one statement"""
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(details, allowed=LOOKUP_TABLES):
+    """Plan steps scanning a whole table that is not in ``allowed``"""
+
+    flagged = []
+    for detail in details:
+        if not detail.startswith("SCAN "):
+            continue
+        if any(marker in detail for marker in NOT_TABLE_SCANS):
+            continue
+        # "SCAN x" since SQLite 3.36, "SCAN TABLE x" before
+        words = detail.split()
+        table = words[2] if words[1] == "TABLE" else words[1]
+        # sqlite_master and friends, the schema catalogue
+        if table not in allowed and not table.startswith("sqlite_"):
+            flagged.append(detail)
+    return flagged
+
+
+def audit(sample):
+    """
+    Yield ``(endpoint, sql, plan, flagged)`` for each audited statement.
+
+    Needs ``sample_ids()``; the user's cart gets one line so checkout
+    has something to order.
+    """
+
+    factory = APIRequestFactory(SERVER_NAME=_host())
+    statements = []
+
+    def capture(execute, sql, params, many, context):
+        statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with transaction.atomic():
+        for endpoint in endpoints(sample):
+            request = getattr(factory, endpoint.method)(
+                endpoint.path,
+                endpoint.data,
+                format="json" if endpoint.data else None,
+                # skip the product detail cache
+                HTTP_ACCEPT="application/json; indent=2",
+            )
+            if endpoint.user:
+                force_authenticate(request, user=sample["user"])
+            if endpoint.name == "checkout":
+                CartItem.objects.filter(cart__user=sample["user"]).delete()
+                views.carts.add_item(
+                    views.carts.get_cart(sample["user"]),
+                    Variant.objects.filter(stock__gt=0).first(),
+                )
+            statements.clear()
+            with connection.execute_wrapper(capture):
+                response = endpoint.view(request, **endpoint.kwargs)
+                response.render()
+            if response.status_code >= 400:
+                raise RuntimeError(
+                    f"{endpoint.name} answered {response.status_code}: "
+                    f"{response.content[:200]!r}"
+                )
+            for sql, params in list(statements):
+                if (
+                    not sql.lstrip("( ")
+                    .upper()
+                    .startswith(("SELECT", "WITH", "UPDATE", "DELETE"))
+                ):
+                    continue
+                details = plan(sql, params)
+                yield endpoint, sql, details, full_scans(details)
+        transaction.set_rollback(True)
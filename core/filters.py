@@ -0,0 +1,165 @@
+"""
+Filter sets and facet counts for Core App list endpoints
+"""
+
+from django.db.models import Count, Exists, Max, Min, OuterRef
+from django_filters import rest_framework as filters
+from rest_framework import serializers
+from core.models import Order, Product, Variant
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """Comma separated numbers, ``?brand=1,2``"""
+
+
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    """Comma separated strings, ``?color=Black,Red``"""
+
+
+class ProductFilter(filters.FilterSet):
+    """
+    Filter products by catalog and variant attributes.
+
+    Variant conditions are matched by the same variant, so
+    ``?color=Black&size=M&in_stock=true`` finds products with a black,
+    medium variant in stock, and they are applied as one ``EXISTS``
+    subquery so no join duplicates products.
+    """
+
+    category = NumberInFilter(field_name="category", lookup_expr="in")
+    brand = NumberInFilter(field_name="brand", lookup_expr="in")
+    color = CharInFilter(method="filter_variants")
+    size = CharInFilter(method="filter_variants")
+    min_price = filters.NumberFilter(method="filter_variants")
+    max_price = filters.NumberFilter(method="filter_variants")
+    in_stock = filters.BooleanFilter(method="filter_variants")
+
+    variant_lookups = {
+        "color": "color__in",
+        "size": "size__in",
+        "min_price": "price__gte",
+        "max_price": "price__lte",
+    }
+
+    class Meta:
+        model = Product
+        fields = ["category", "brand"]
+
+    def filter_variants(self, queryset, name, value):
+        # collected by filter_queryset into a single EXISTS
+        return queryset
+
+    def variant_conditions(self, exclude=()):
+        """Lookups on ``Variant`` for the requested variant filters"""
+
+        conditions = {}
+        for name, lookup in self.variant_lookups.items():
+            value = self.form.cleaned_data.get(name)
+            if name not in exclude and value not in (None, []):
+                conditions[lookup] = value
+        return conditions
+
+    def matching_variants(self, exclude=(), **extra):
+        return Variant.objects.filter(
+            product=OuterRef("pk"), **self.variant_conditions(exclude), **extra
+        )
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        in_stock = self.form.cleaned_data.get("in_stock")
+        conditions = self.variant_conditions()
+        if in_stock is True:
+            queryset = queryset.filter(
+                Exists(self.matching_variants(stock__gt=0))
+            )
+        elif conditions:
+            queryset = queryset.filter(Exists(self.matching_variants()))
+        if in_stock is False:
+            queryset = queryset.exclude(
+                Exists(self.matching_variants(stock__gt=0))
+            )
+        return queryset
+
+
+class OrderFilter(filters.FilterSet):
+    """Filter orders by ``?status=pending,shipped``"""
+
+    status = CharInFilter(field_name="status", lookup_expr="in")
+
+    class Meta:
+        model = Order
+        fields = ["status"]
+
+
+def facet_counts(filterset):
+    """
+    Product counts per facet value for a bound ``ProductFilter``.
+
+    Each facet is counted with every filter applied except its own, so
+    choosing a color still lists the other colors, and each facet costs
+    one grouped query.
+    """
+
+    def without(*names):
+        data = filterset.data.copy()
+        for name in names:
+            data.pop(name, None)
+        other = type(filterset)(
+            data, queryset=filterset.queryset, request=filterset.request
+        )
+        other.is_valid()
+        return other.qs
+
+    def variants(*names):
+        return Variant.objects.filter(
+            product__in=without(*names).values("pk"),
+            **filterset.variant_conditions(exclude=names),
+        )
+
+    def grouped(queryset, field, counted="pk", label=None):
+        values = [field] + ([label] if label else [])
+        counts = (
+            queryset.order_by()
+            .values(*values)
+            .annotate(count=Count(counted, distinct=True))
+            .order_by("-count", field)
+        )
+        return [
+            {
+                "value": row[field],
+                **({"label": row[label]} if label else {}),
+                "count": row["count"],
+            }
+            for row in counts
+        ]
+
+    in_stock = without("in_stock").aggregate(
+        total=Count("pk"),
+        in_stock=Count(
+            "pk",
+            filter=Exists(filterset.matching_variants(stock__gt=0)),
+        ),
+    )
+    price_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+    price = {
+        bound: None if value is None else price_field.to_representation(value)
+        for bound, value in variants("min_price", "max_price")
+        .aggregate(min=Min("price"), max=Max("price"))
+        .items()
+    }
+    return {
+        "category": grouped(
+            without("category"), "category", label="category__name"
+        ),
+        "brand": grouped(without("brand"), "brand", label="brand__name"),
+        "color": grouped(variants("color"), "color", counted="product"),
+        "size": grouped(variants("size"), "size", counted="product"),
+        "in_stock": [
+            {"value": True, "count": in_stock["in_stock"]},
+            {
+                "value": False,
+                "count": in_stock["total"] - in_stock["in_stock"],
+            },
+        ],
+        "price": price,
+    }
@@ -0,0 +1,174 @@
+"""
+Readiness probes
+
+Each probe checks one dependency: database connectivity, unapplied
+migrations, cache reachability and free disk space next to SQLite
+files. Apps without migrations are listed rather than failed. Results
+are cached for ``HEALTH_PROBE_TTL`` seconds, so aggressive load balancer
+probing reads a dictionary, and expired probes run concurrently on a
+small thread pool. A probe that is already running is awaited rather
+than started again.
+"""
+
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.loader import MigrationLoader
+
+
+class ProbeFailed(Exception):
+    """A dependency is not usable"""
+
+
+def check_database():
+    for connection in connections.all():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    return {"databases": len(connections.all())}
+
+
+def check_migrations():
+    # apps without migrations (rest_framework, django_filters, ...) are
+    # skipped rather than failing the graph of the apps that have them
+    loader = MigrationLoader(
+        connections[DEFAULT_DB_ALIAS], ignore_no_migrations=True
+    )
+    graph = loader.graph
+    unapplied = {
+        node
+        for leaf in graph.leaf_nodes()
+        for node in graph.forwards_plan(leaf)
+        if node not in loader.applied_migrations
+    }
+    if unapplied:
+        raise ProbeFailed(f"{len(unapplied)} unapplied migrations")
+    unmigrated = loader.unmigrated_apps | {
+        app for app in loader.migrated_apps if not graph.leaf_nodes(app)
+    }
+    return {"unapplied": 0, "unmigrated": sorted(unmigrated)}
+
+
+def check_cache():
+    for alias in settings.CACHES:
+        key, value = f"health:{uuid.uuid4().hex}", uuid.uuid4().hex
+        cache = caches[alias]
+        cache.set(key, value, timeout=10)
+        if cache.get(key) != value:
+            raise ProbeFailed(f"cache {alias!r} did not return the value")
+        cache.delete(key)
+    return {"caches": len(settings.CACHES)}
+
+
+def check_disk():
+    minimum = getattr(settings, "HEALTH_MIN_FREE_DISK_BYTES", 100 * 2**20)
+    free = {}
+    for connection in connections.all():
+        name = str(connection.settings_dict["NAME"])
+        if connection.vendor != "sqlite" or connection.is_in_memory_db():
+            continue
+        free[connection.alias] = shutil.disk_usage(
+            Path(name).resolve().parent
+        ).free
+        if free[connection.alias] < minimum:
+            raise ProbeFailed(
+                f"{free[connection.alias]} bytes free for {connection.alias}"
+            )
+    return {"free_bytes": free}
+
+
+PROBES = {
+    "database": check_database,
+    "migrations": check_migrations,
+    "cache": check_cache,
+    "disk": check_disk,
+}
+
+
+class HealthChecker:
+    """Run probes concurrently and cache their results"""
+
+    def __init__(self, probes, ttl=None, timeout=None):
+        self.probes = probes
+        self._ttl = ttl
+        self._timeout = timeout
+        self._results = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(probes), thread_name_prefix="health"
+        )
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, "HEALTH_PROBE_TTL", 5.0)
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+        return getattr(settings, "HEALTH_PROBE_TIMEOUT", 2.0)
+
+    def _probe(self, name):
+        started = time.perf_counter()
+        try:
+            result = {"status": "ok", **self.probes[name]()}
+        except Exception as exc:  # pylint: disable=broad-except
+            result = {
+                "status": "fail",
+                "error": f"{type(exc).__name__}: {exc}",
+            }
+        finally:
+            # connections are per thread, do not leak the pool's
+            connections.close_all()
+        result["duration_ms"] = round(
+            (time.perf_counter() - started) * 1000, 3
+        )
+        with self._lock:
+            self._results[name] = (time.monotonic() + self.ttl, result)
+            self._pending.pop(name, None)
+        return result
+
+    def run(self):
+        """``(healthy, {probe: result})``, probing only expired results"""
+
+        now = time.monotonic()
+        futures = {}
+        with self._lock:
+            for name in self.probes:
+                cached = self._results.get(name)
+                if cached is not None and cached[0] > now:
+                    continue
+                if name not in self._pending:
+                    self._pending[name] = self._executor.submit(
+                        self._probe, name
+                    )
+                futures[name] = self._pending[name]
+        if futures:
+            wait(futures.values(), timeout=self.timeout)
+
+        results = {}
+        for name in self.probes:
+            future = futures.get(name)
+            if future is not None and not future.done():
+                results[name] = {"status": "fail", "error": "timed out"}
+            elif future is not None:
+                results[name] = future.result()
+            else:
+                results[name] = self._results[name][1]
+        healthy = all(result["status"] == "ok" for result in results.values())
+        return healthy, results
+
+    def reset(self):
+        with self._lock:
+            self._results.clear()
+
+
+health_checker = HealthChecker(PROBES)
@@ -0,0 +1,183 @@
+"""
+Content-addressed image registry
+
+An ``Image`` is identified by ``url_hash``, the SHA-256 of its
+normalized URL, which is unique. Writers go through ``upsert_images``
+so a URL seen again, in any spelling that normalizes the same, resolves
+to the existing row instead of inserting another one.
+
+Rows written before the hash existed are registered, and their
+duplicates merged, by ``dedupe_images``; images nothing links to any
+more are removed by ``collect_garbage``.
+"""
+
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from core.cache import product_detail_cache
+from core.models import Image, Variant
+
+
+def upsert_images(urls):
+    """
+    Return ``({url: image id}, inserted)`` for ``urls``, registering the
+    images not known yet.
+    """
+
+    hashes = {url: Image.hash_url(url) for url in dict.fromkeys(urls) if url}
+    found = dict(
+        Image.objects.filter(url_hash__in=set(hashes.values())).values_list(
+            "url_hash", "pk"
+        )
+    )
+    missing = {
+        digest: Image.normalize_url(url)
+        for url, digest in hashes.items()
+        if digest not in found
+    }
+    if missing:
+        # a concurrent writer may register the same hashes first
+        Image.objects.bulk_create(
+            [
+                Image(url=url, url_hash=digest)
+                for digest, url in missing.items()
+            ],
+            ignore_conflicts=True,
+        )
+        found.update(
+            Image.objects.filter(url_hash__in=list(missing)).values_list(
+                "url_hash", "pk"
+            )
+        )
+    ids = {url: found[digest] for url, digest in hashes.items()}
+    return ids, len(missing)
+
+
+def image_relations():
+    """``(through model, owner column)`` of every many-to-many to Image"""
+
+    return [
+        (relation.through, relation.field.m2m_field_name())
+        for relation in Image._meta.get_fields()
+        if relation.many_to_many and relation.auto_created
+    ]
+
+
+def merge_images(replace):
+    """
+    Point the through rows of the duplicate images in ``replace``
+    (``{duplicate id: kept id}``) at the kept images, then delete the
+    duplicates. Links both images already had are kept once.
+    """
+
+    if not replace:
+        return
+    duplicates = list(replace)
+    product_ids = set(
+        Variant.objects.filter(images__in=duplicates).values_list(
+            "product_id", flat=True
+        )
+    )
+    # once the relinked rows are visible, not before
+    transaction.on_commit(
+        lambda: product_detail_cache.invalidate(*product_ids)
+    )
+    for through, owner in image_relations():
+        links = through.objects.filter(image__in=duplicates).values_list(
+            f"{owner}_id", "image_id"
+        )
+        through.objects.bulk_create(
+            [
+                through(**{f"{owner}_id": owner_id, "image_id": replace[pk]})
+                for owner_id, pk in links
+            ],
+            ignore_conflicts=True,
+        )
+        through.objects.filter(image__in=duplicates).delete()
+    Image.objects.filter(pk__in=duplicates).delete()
+
+
+def dedupe_images(batch_size=1000):
+    """
+    Register images written before ``url_hash`` existed, merging those
+    whose normalized URL is already registered. Returns ``(registered,
+    merged)``.
+    """
+
+    registered = merged = 0
+    unhashed = (
+        Image.objects.filter(url_hash__isnull=True)
+        .exclude(url=None)
+        .order_by("pk")
+    )
+    last = 0
+    while True:
+        batch = list(
+            unhashed.filter(pk__gt=last).values_list("pk", "url")[:batch_size]
+        )
+        if not batch:
+            return registered, merged
+        last = batch[-1][0]
+        digests = {pk: Image.hash_url(url) for pk, url in batch}
+        kept = dict(
+            Image.objects.filter(
+                url_hash__in=set(digests.values())
+            ).values_list("url_hash", "pk")
+        )
+        replace, fresh = {}, []
+        for pk, url in batch:
+            digest = digests[pk]
+            if digest in kept:
+                replace[pk] = kept[digest]
+            else:
+                kept[digest] = pk
+                fresh.append(
+                    Image(pk=pk, url=Image.normalize_url(url), url_hash=digest)
+                )
+        with transaction.atomic():
+            Image.objects.bulk_update(fresh, ["url", "url_hash"])
+            merge_images(replace)
+        registered += len(fresh)
+        merged += len(replace)
+
+
+def orphaned_images(older_than):
+    """Images no variant or review shows, created over ``older_than`` ago"""
+
+    orphans = Image.objects.filter(
+        created_at__lt=timezone.now() - timedelta(seconds=older_than)
+    )
+    for through, _ in image_relations():
+        orphans = orphans.exclude(
+            Exists(through.objects.filter(image=OuterRef("pk")))
+        )
+    return orphans
+
+
+def collect_garbage(older_than=3600, batch_size=1000, dry_run=False):
+    """
+    Delete orphaned images in batches and return how many were deleted,
+    or would be with ``dry_run``. The grace period leaves alone images a
+    running import has registered but not linked yet.
+    """
+
+    orphans = orphaned_images(older_than).order_by("pk")
+    deleted = last = 0
+    while True:
+        pks = list(
+            orphans.filter(pk__gt=last).values_list("pk", flat=True)[
+                :batch_size
+            ]
+        )
+        if not pks:
+            return deleted
+        last = pks[-1]
+        if dry_run:
+            deleted += len(pks)
+            continue
+        # the orphan conditions are checked again on locked rows, so an
+        # image linked since the batch was listed survives
+        with transaction.atomic():
+            _, counts = orphans.filter(pk__in=pks).select_for_update().delete()
+        deleted += counts.get(Image._meta.label, 0)
@@ -0,0 +1,239 @@
+"""
+Bulk catalog import
+
+Products are read one record at a time from JSON Lines or CSV and
+written in chunks, each chunk in its own transaction with one
+``bulk_create`` per table. Brands and categories are deduplicated by
+name against an in-memory map loaded once; images are deduplicated by
+URL through a bounded LRU map backed by a lookup of unseen URLs, so
+memory stays flat however large the file is.
+"""
+
+import csv
+import json
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from core import search
+from core.models import (
+    Brand,
+    Category,
+    Product,
+    Variant,
+    Specification,
+    Compatibility,
+    DeliveryTimeStatus,
+    Faq,
+    Carousel,
+)
+from core.images import upsert_images
+from core.tags import link_tags
+
+# CSV columns holding JSON encoded nested records
+NESTED_FIELDS = (
+    "variants",
+    "specifications",
+    "compatibility",
+    "delivery_time_status",
+    "faqs",
+    "carousel",
+    "tags",
+)
+
+
+class CatalogImportError(ValueError):
+    """A record that can not be imported"""
+
+
+def read_jsonl(stream):
+    """Yield one product record per non-empty line"""
+
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise CatalogImportError(f"line {number}: {exc}") from exc
+
+
+def read_csv(stream):
+    """Yield product records, decoding JSON in the nested columns"""
+
+    for number, row in enumerate(csv.DictReader(stream), start=2):
+        try:
+            for field in NESTED_FIELDS:
+                if row.get(field):
+                    row[field] = json.loads(row[field])
+        except json.JSONDecodeError as exc:
+            raise CatalogImportError(f"line {number}, {field}: {exc}") from exc
+        yield row
+
+
+def _named(value):
+    """Accept ``"Name"`` or ``{"name": ..., "description": ...}``"""
+
+    if isinstance(value, dict):
+        return value["name"], value.get("description") or ""
+    return value, ""
+
+
+class CatalogImporter:
+    """Write product records in chunked, bulk transactions"""
+
+    def __init__(self, batch_size=1000, image_cache_size=100_000):
+        self.batch_size = batch_size
+        self.image_cache_size = image_cache_size
+        self.brands = dict(Brand.objects.values_list("name", "pk"))
+        self.categories = dict(Category.objects.values_list("name", "pk"))
+        self.images = OrderedDict()
+        self.counts = {"products": 0, "variants": 0, "images": 0}
+        self.started = time.perf_counter()
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.counts["products"] / elapsed if elapsed else 0.0
+
+    def run(self, records):
+        """Import ``records``, yielding the counts after every chunk"""
+
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.batch_size))
+            if not chunk:
+                return
+            try:
+                with transaction.atomic():
+                    self.write(chunk)
+            except (KeyError, TypeError, ValueError, InvalidOperation) as exc:
+                first = self.counts["products"] + 1
+                raise CatalogImportError(
+                    f"records {first}-{first + len(chunk) - 1}: "
+                    f"{type(exc).__name__}: {exc}"
+                ) from exc
+            yield dict(self.counts)
+
+    def _resolve_named(self, model, known, values):
+        missing = {}
+        for value in values:
+            if value is None:
+                continue
+            name, description = _named(value)
+            if name not in known:
+                missing.setdefault(name, description)
+        if missing:
+            created = model.objects.bulk_create(
+                [
+                    model(name=name, description=description)
+                    for name, description in missing.items()
+                ]
+            )
+            known.update((obj.name, obj.pk) for obj in created)
+
+    def resolve_images(self, urls):
+        """Return ``{url: image id}``, creating images for unseen URLs"""
+
+        resolved, unseen = {}, []
+        for url in dict.fromkeys(urls):
+            if url in self.images:
+                self.images.move_to_end(url)
+                resolved[url] = self.images[url]
+            else:
+                unseen.append(url)
+        if unseen:
+            found, created = upsert_images(unseen)
+            self.counts["images"] += created
+            for url in unseen:
+                self.images[url] = found[url]
+            resolved.update(found)
+        while len(self.images) > self.image_cache_size:
+            self.images.popitem(last=False)
+        return resolved
+
+    def write(self, records):
+        self._resolve_named(
+            Brand, self.brands, [record["brand"] for record in records]
+        )
+        self._resolve_named(
+            Category,
+            self.categories,
+            [record.get("category") for record in records],
+        )
+
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    base_name=record["base_name"],
+                    description=record.get("description") or "",
+                    base_price=Decimal(str(record["base_price"])),
+                    brand_id=self.brands[_named(record["brand"])[0]],
+                    category_id=(
+                        self.categories[_named(record["category"])[0]]
+                        if record.get("category")
+                        else None
+                    ),
+                )
+                for record in records
+            ]
+        )
+
+        variant_rows, variant_images = [], []
+        children = {
+            Specification: [],
+            Compatibility: [],
+            DeliveryTimeStatus: [],
+            Faq: [],
+            Carousel: [],
+        }
+        tags = []
+        for product, record in zip(products, records):
+            for variant in record.get("variants") or []:
+                variant = dict(variant)
+                variant_images.append(variant.pop("images", None) or [])
+                variant["price"] = Decimal(str(variant["price"]))
+                variant_rows.append(Variant(product=product, **variant))
+            for spec in record.get("specifications") or []:
+                children[Specification].append(
+                    Specification(product=product, **spec)
+                )
+            for item in record.get("compatibility") or []:
+                children[Compatibility].append(
+                    Compatibility(product=product, **item)
+                )
+            if record.get("delivery_time_status"):
+                children[DeliveryTimeStatus].append(
+                    DeliveryTimeStatus(
+                        product=product, **record["delivery_time_status"]
+                    )
+                )
+            for faq in record.get("faqs") or []:
+                children[Faq].append(Faq(product=product, **faq))
+            for slide in record.get("carousel") or []:
+                children[Carousel].append(Carousel(product=product, **slide))
+            for tag in record.get("tags") or []:
+                tags.append((product.pk, tag))
+
+        variants = Variant.objects.bulk_create(variant_rows)
+        image_ids = self.resolve_images(
+            url for urls in variant_images for url in urls
+        )
+        Variant.images.through.objects.bulk_create(
+            [
+                Variant.images.through(
+                    variant_id=variant.pk, image_id=image_ids[url]
+                )
+                for variant, urls in zip(variants, variant_images)
+                for url in dict.fromkeys(urls)
+            ]
+        )
+        for model, rows in children.items():
+            model.objects.bulk_create(rows)
+        link_tags(tags)
+
+        # bulk_create skips the signal handlers that maintain the index
+        search.reindex_products([product.pk for product in products])
+        self.counts["products"] += len(products)
+        self.counts["variants"] += len(variants)
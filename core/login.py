@@ -0,0 +1,176 @@
+"""
+Login password checks and throttling
+
+Password hashing is the most expensive work the API does, so it runs in
+a bounded pool of ``LOGIN_HASH_WORKERS`` threads: PBKDF2 and friends
+release the GIL and the pool caps how many cores logins can take at
+once. ``check`` waits for the pool in the calling thread, as the sync
+DRF login view must; ``acheck`` awaits it, so an async caller's event
+loop keeps serving other requests meanwhile.
+
+An unknown username is checked against a dummy hash, so it costs the same
+as a wrong password and response times do not reveal which usernames
+exist. A correct password stored with an outdated hasher or iteration
+count is rehashed with the preferred one.
+
+Attempts are limited per username and per client address by in-memory
+token buckets, at the ``LOGIN_THROTTLE_RATES`` given in DRF's
+``"<count>/<period>"`` format. Buckets are per process.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.utils.crypto import get_random_string
+
+DURATIONS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """``(count, seconds)`` of a DRF style rate such as ``"10/min"``"""
+
+    count, period = rate.split("/")
+    return int(count), DURATIONS[period[0]]
+
+
+class TokenBuckets:
+    """Token buckets per key, each refilling ``count`` tokens a period"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, count, period):
+        """
+        Take a token from ``key``'s bucket; return 0 when one was left,
+        else the seconds until the next one.
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.get(key, (count, now))
+            tokens = min(count, tokens + (now - stamp) * count / period)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) * period / count
+            if len(self._buckets) > self.max_keys:
+                self._sweep(now, count, period)
+        return wait
+
+    def _sweep(self, now, count, period):
+        # a bucket that has refilled is the same as no bucket
+        for key in [
+            key
+            for key, (tokens, stamp) in self._buckets.items()
+            if tokens + (now - stamp) * count / period >= count
+        ]:
+            del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+login_buckets = TokenBuckets()
+
+
+def throttle_wait(username, address):
+    """Seconds the login must wait, 0 when it may go ahead"""
+
+    rates = getattr(
+        settings,
+        "LOGIN_THROTTLE_RATES",
+        {"username": "10/min", "address": "60/min"},
+    )
+    wait = 0.0
+    for scope, key in (("username", username), ("address", address)):
+        if rates.get(scope) and key:
+            count, period = parse_rate(rates[scope])
+            wait = max(
+                wait, login_buckets.take(f"{scope}:{key}", count, period)
+            )
+    return wait
+
+
+class PasswordChecker:
+    """Password hashing on a bounded thread pool"""
+
+    def __init__(self, workers=None):
+        self._workers = workers
+        self._executor = None
+        self._dummy = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers
+                    or getattr(settings, "LOGIN_HASH_WORKERS", None)
+                    or os.cpu_count()
+                    or 1,
+                    thread_name_prefix="login",
+                )
+            return self._executor
+
+    def dummy_hash(self):
+        """A hash with the preferred hasher no password matches"""
+
+        if self._dummy is None:
+            self._dummy = make_password(get_random_string(32))
+        return self._dummy
+
+    def submit(self, user, password):
+        """
+        Future of ``(valid, rehash)`` for ``user``'s password, ``user``
+        may be ``None``.
+        """
+
+        encoded = user.password if user is not None else None
+        return self.executor.submit(self._check, password, encoded)
+
+    def _check(self, password, encoded):
+        # on the pool, so even the one-off dummy hash is off the caller
+        if encoded is None:
+            encoded = self.dummy_hash()
+        outdated = []
+        valid = check_password(password, encoded, setter=outdated.append)
+        return valid, bool(outdated)
+
+    def check(self, user, password):
+        """Whether ``password`` is ``user``'s, rehashing it when outdated"""
+
+        valid, rehash = self.submit(user, password).result()
+        if user is None or not valid:
+            return False
+        if rehash:
+            user.password = self.executor.submit(
+                make_password, password
+            ).result()
+            user.save(update_fields=["password"])
+        return True
+
+    async def acheck(self, user, password):
+        """``check`` for async callers, awaiting the pool"""
+
+        valid, rehash = await asyncio.wrap_future(self.submit(user, password))
+        if user is None or not valid:
+            return False
+        if rehash:
+            user.password = await asyncio.wrap_future(
+                self.executor.submit(make_password, password)
+            )
+            await user.asave(update_fields=["password"])
+        return True
+
+
+password_checker = PasswordChecker()
@@ -0,0 +1,120 @@
+"""
+compare concurrent SQLite throughput with and without the production pragmas
+"""
+
+import random
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Avg, F
+from core.models import Product, Variant
+
+PROFILES = {
+    # what a default configured db.sqlite3 does
+    "default": {"journal_mode": "delete", "synchronous": "full"},
+    "production": None,
+}
+
+
+class Command(BaseCommand):
+    """Custom command to measure concurrent read/write throughput"""
+
+    help = (
+        "Run catalog reads and stock writes from several threads against "
+        "the configured SQLite file, once with SQLite defaults and once "
+        "with PRODUCTION_SQLITE_PRAGMAS"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument(
+            "--duration", type=float, default=5.0, help="Seconds per profile"
+        )
+
+    def handle(self, *args, **options):
+        """command handler method"""
+        if connection.vendor != "sqlite" or connection.is_in_memory_db():
+            raise CommandError("Needs a file based SQLite database")
+        variant_ids = list(Variant.objects.values_list("pk", flat=True))
+        if not variant_ids:
+            raise CommandError(
+                "The catalog is empty, run populate_db --products 10000"
+            )
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+
+        configured = settings.SQLITE_PRAGMAS
+        try:
+            for name, pragmas in PROFILES.items():
+                settings.SQLITE_PRAGMAS = (
+                    pragmas or settings.PRODUCTION_SQLITE_PRAGMAS
+                )
+                connections.close_all()
+                result = self.measure(variant_ids, options)
+                self.stdout.write(
+                    f"{name:>10}: {result['reads']:8.0f} reads/s "
+                    f"{result['writes']:8.0f} writes/s "
+                    f"{result['errors']:5d} lock errors"
+                )
+        finally:
+            settings.SQLITE_PRAGMAS = configured
+            connections.close_all()
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+
+    def measure(self, variant_ids, options):
+        deadline = time.monotonic() + options["duration"]
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+
+        def count(name):
+            with lock:
+                counts[name] += 1
+
+        def reader():
+            try:
+                while time.monotonic() < deadline:
+                    list(
+                        Product.objects.select_related(
+                            "brand", "category"
+                        ).order_by("-created_at", "-id")[:24]
+                    )
+                    Variant.objects.filter(
+                        pk__in=random.sample(variant_ids, 10)
+                    ).aggregate(Avg("price"))
+                    count("reads")
+            finally:
+                connections.close_all()
+
+        def writer():
+            try:
+                while time.monotonic() < deadline:
+                    try:
+                        with transaction.atomic():
+                            Variant.objects.filter(
+                                pk=random.choice(variant_ids)
+                            ).update(stock=F("stock") + 1)
+                        count("writes")
+                    except OperationalError:
+                        count("errors")
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=reader) for _ in range(options["readers"])
+        ] + [
+            threading.Thread(target=writer) for _ in range(options["writers"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {
+            "reads": counts["reads"] / options["duration"],
+            "writes": counts["writes"] / options["duration"],
+            "errors": counts["errors"],
+        }
@@ -0,0 +1,33 @@
+"""
+register legacy images by url hash and merge their duplicates
+"""
+
+from django.core.management.base import BaseCommand
+from core.images import dedupe_images
+
+
+class Command(BaseCommand):
+    """Custom command to backfill Image.url_hash and merge duplicates"""
+
+    help = (
+        "Hash the normalized url of every image without url_hash, point "
+        "the variant and review links of duplicates at one image and "
+        "delete the rest, in batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Images hashed per transaction",
+        )
+
+    def handle(self, *args, **options):
+        """command handler method"""
+        registered, merged = dedupe_images(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{registered} images registered, {merged} duplicates merged"
+            )
+        )
@@ -0,0 +1,57 @@
+"""
+audit the query plans of the API endpoints for full table scans
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.explain import LOOKUP_TABLES, audit, sample_ids
+
+
+class Command(BaseCommand):
+    """Custom command to EXPLAIN QUERY PLAN every endpoint query"""
+
+    help = (
+        "Request the catalog, cart, checkout and order endpoints, run "
+        "EXPLAIN QUERY PLAN on each statement they execute and fail when "
+        "one scans a whole table"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--allow",
+            action="append",
+            default=[],
+            metavar="TABLE",
+            help="Another table that may be scanned, can be repeated",
+        )
+
+    def handle(self, *args, **options):
+        """command handler method"""
+        if connection.vendor != "sqlite":
+            raise CommandError("EXPLAIN QUERY PLAN needs SQLite")
+        sample = sample_ids()
+        if sample is None:
+            raise CommandError(
+                "Needs products and orders, run populate_db --products 1000"
+            )
+        allowed = LOOKUP_TABLES | set(options["allow"])
+
+        statements = flagged = 0
+        for endpoint, sql, details, scans in audit(sample):
+            statements += 1
+            scans = [scan for scan in scans if scan.split()[1] not in allowed]
+            if scans:
+                flagged += 1
+                self.stderr.write(f"{endpoint.name}: {', '.join(scans)}")
+            if scans or options["verbosity"] > 1:
+                self.stdout.write(f"{endpoint.name}: {sql}")
+                for detail in details:
+                    self.stdout.write(f"    {detail}")
+
+        if flagged:
+            raise CommandError(
+                f"{flagged} of {statements} statements scan a whole table"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"{statements} statements use indexes")
+        )
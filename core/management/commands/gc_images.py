@@ -0,0 +1,47 @@
+"""
+delete images no variant or review links to
+"""
+
+from django.core.management.base import BaseCommand
+from core.images import collect_garbage
+
+
+class Command(BaseCommand):
+    """Custom command to garbage collect orphaned images"""
+
+    help = (
+        "Delete images that no variant or review links to and that are "
+        "older than the grace period, in batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=3600,
+            metavar="SECONDS",
+            help="Grace period for images not linked yet",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Images deleted per statement",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the orphaned images",
+        )
+
+    def handle(self, *args, **options):
+        """command handler method"""
+        deleted = collect_garbage(
+            older_than=options["older_than"],
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+        )
+        verb = "would be deleted" if options["dry_run"] else "deleted"
+        self.stdout.write(
+            self.style.SUCCESS(f"{deleted} orphaned images {verb}")
+        )
@@ -0,0 +1,85 @@
+"""
+import products from a JSON Lines or CSV catalog file
+"""
+
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from core.importer import (
+    CatalogImporter,
+    CatalogImportError,
+    read_csv,
+    read_jsonl,
+)
+
+
+class Command(BaseCommand):
+    """Custom command to bulk import a product catalog"""
+
+    help = (
+        "Stream products with nested variants, specifications, "
+        "compatibility, FAQs, carousel and images into the database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Catalog file, or - for stdin")
+        parser.add_argument(
+            "--format",
+            choices=("jsonl", "csv"),
+            help="File format, guessed from the extension by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Products written per transaction",
+        )
+        parser.add_argument(
+            "--image-cache-size",
+            type=int,
+            default=100_000,
+            help="Image URLs remembered for deduplication",
+        )
+
+    def handle(self, *args, **options):
+        """command handler method"""
+        path = options["path"]
+        file_format = options["format"] or (
+            "csv" if path.endswith(".csv") else "jsonl"
+        )
+        reader = read_csv if file_format == "csv" else read_jsonl
+        importer = CatalogImporter(
+            batch_size=options["batch_size"],
+            image_cache_size=options["image_cache_size"],
+        )
+
+        stream = (
+            sys.stdin
+            if path == "-"
+            else open(path, encoding="utf-8", newline="")
+        )
+        try:
+            for counts in importer.run(reader(stream)):
+                if options["verbosity"] >= 1:
+                    self.stdout.write(
+                        f"{counts['products']} products, "
+                        f"{counts['variants']} variants, "
+                        f"{counts['images']} new images "
+                        f"({importer.rate:.0f} products/s)"
+                    )
+        except CatalogImportError as exc:
+            raise CommandError(str(exc)) from exc
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        if options["verbosity"] < 1:
+            return
+        counts = importer.counts
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {counts['products']} products, "
+                f"{counts['variants']} variants and "
+                f"{counts['images']} new images "
+                f"at {importer.rate:.0f} products/s"
+            )
+        )
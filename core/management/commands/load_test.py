@@ -0,0 +1,177 @@
+"""
+load test running servers side by side, e.g. WSGI against ASGI
+"""
+
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Target:
+    """One named URL and the latencies measured against it"""
+
+    def __init__(self, spec):
+        name, _, url = spec.partition("=")
+        if not url:
+            raise CommandError(f"Expected NAME=URL, got {spec!r}")
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise CommandError(f"Only http:// URLs are supported: {url}")
+        self.name = name
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path or "/"
+        if parts.query:
+            self.path = f"{self.path}?{parts.query}"
+        self.latencies = []
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def request(self, headers):
+        lines = [
+            f"GET {self.path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Accept: application/json",
+            *(f"{name}: {value}" for name, value in headers.items()),
+        ]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response, return ``(status, keep alive)``"""
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("connection", "").lower() != "close"
+
+
+async def client(target, payload, deadline):
+    """Send requests over one keep-alive connection until ``deadline``"""
+
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(
+                    target.host, target.port
+                )
+            writer.write(payload)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            target.errors += 1
+            writer = None
+            # a refusing server would otherwise be hammered in a loop
+            await asyncio.sleep(0.01)
+            continue
+        target.latencies.append((time.perf_counter() - started) * 1000)
+        if status >= 400:
+            target.errors += 1
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(target, concurrency, duration, headers):
+    payload = target.request(headers)
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(
+        *(client(target, payload, deadline) for _ in range(concurrency))
+    )
+    target.elapsed = time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    """Custom command to compare servers under concurrent clients"""
+
+    help = (
+        "Hit each target URL with concurrent keep-alive clients for a "
+        "while, one target after the other, and print requests per second "
+        "and latency percentiles side by side. Start the servers first, "
+        "e.g. gunicorn -w 4 eshop_backend.wsgi on :8000 and uvicorn "
+        "--workers 4 eshop_backend.asgi:application on :8001, then run "
+        "load_test --target wsgi=http://127.0.0.1:8000/api/v1/products/ "
+        "--target asgi=http://127.0.0.1:8001/api/v1/async/products/"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            action="append",
+            required=True,
+            metavar="NAME=URL",
+            help="A URL to load, can be repeated",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=50,
+            help="Concurrent clients per target",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=10.0,
+            help="Seconds each target is loaded",
+        )
+        parser.add_argument(
+            "--token",
+            help="JWT access token sent as a Bearer authorization",
+        )
+
+    def handle(self, *args, **options):
+        """command handler method"""
+        targets = [Target(spec) for spec in options["target"]]
+        headers = {}
+        if options["token"]:
+            headers["Authorization"] = f"Bearer {options['token']}"
+
+        for target in targets:
+            asyncio.run(
+                run(
+                    target,
+                    options["concurrency"],
+                    options["duration"],
+                    headers,
+                )
+            )
+
+        self.stdout.write(
+            f"{'target':<12}{'requests':>10}{'errors':>8}{'req/s':>10}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        )
+        for target in targets:
+            latencies = target.latencies
+            if len(latencies) < 2:
+                self.stderr.write(f"{target.name}: no responses")
+                continue
+            percentiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f"{target.name:<12}{len(latencies):>10}{target.errors:>8}"
+                f"{len(latencies) / target.elapsed:>10.1f}"
+                f"{percentiles[49]:>10.2f}{percentiles[94]:>10.2f}"
+                f"{percentiles[98]:>10.2f}{max(latencies):>10.2f}"
+            )
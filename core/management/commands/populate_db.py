@@ -2,6 +2,7 @@
 populate database models with data
 """
 
+import time
 from django.db import transaction
 from django.core.management.base import BaseCommand
 from core.models import (
@@ -15,14 +16,82 @@ from core.models import (
     Faq,
     Carousel,
 )
+from core.synthetic import SyntheticCatalog
 
 
 class Command(BaseCommand):
     """Custom command to populate db models"""
 
-    @transaction.atomic
-    def handle(self, *args, **kwargs):
+    help = (
+        "Create the sample product, or with --products a deterministic "
+        "synthetic catalog for benchmarking"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--products",
+            type=int,
+            help="Generate this many synthetic products",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed, the same seed generates the same catalog",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Products written per transaction",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            help="Synthetic shoppers, one per 20 products by default",
+        )
+        parser.add_argument(
+            "--orders-per-product",
+            type=float,
+            default=0.5,
+            help="Orders generated per product",
+        )
+
+    def handle(self, *args, **options):
         """command handler method"""
+        if options.get("products") is None:
+            self.populate_sample()
+            return
+
+        catalog = SyntheticCatalog(
+            options["products"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            users=options["users"],
+            orders_per_product=options["orders_per_product"],
+        )
+        started = time.perf_counter()
+        for counts in catalog.run():
+            if options["verbosity"] >= 2:
+                self.stdout.write(
+                    ", ".join(
+                        f"{count} {name}" for name, count in counts.items()
+                    )
+                )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Generated "
+                + ", ".join(
+                    f"{count} {name}" for name, count in catalog.counts.items()
+                )
+                + f" in {elapsed:.1f}s"
+            )
+        )
+
+    @transaction.atomic
+    def populate_sample(self):
+        """Create the single hand written sample product"""
         # category
         category = Category.objects.create(
             name="Table Organizers", description="Organize things on table"
@@ -0,0 +1,30 @@
+"""
+delete blacklisted refresh tokens that have expired
+"""
+
+from django.core.management.base import BaseCommand
+from core.blacklist import token_blacklist
+
+
+class Command(BaseCommand):
+    """Custom command to prune expired rows from the token blacklist"""
+
+    help = (
+        "Delete blacklisted refresh tokens past their expiry, in batches; "
+        "run it periodically, e.g. hourly from cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows deleted per statement",
+        )
+
+    def handle(self, *args, **options):
+        """command handler method"""
+        deleted = token_blacklist.prune(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"{deleted} expired tokens pruned")
+        )
@@ -0,0 +1,36 @@
+"""
+rebuild the product full-text search index
+"""
+
+import time
+from django.db import transaction
+from django.core.management.base import BaseCommand
+from core import search
+
+
+class Command(BaseCommand):
+    """Custom command to rebuild the product search index"""
+
+    help = "Rebuild the product search index from the catalog tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Products indexed per batch",
+        )
+
+    def handle(self, *args, **options):
+        """command handler method"""
+        started = time.perf_counter()
+        with transaction.atomic():
+            total = search.rebuild_index(batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+        backend = type(search.get_backend()).__name__
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {total} products with {backend} "
+                f"in {elapsed:.2f}s"
+            )
+        )
@@ -0,0 +1,40 @@
+"""
+recompute the denormalized review aggregates of products
+"""
+
+from django.core.management.base import BaseCommand
+from core.reviews import recompute_ratings
+
+
+class Command(BaseCommand):
+    """Custom command to rebuild product rating aggregates from reviews"""
+
+    help = (
+        "Recompute rating_count, rating_sum, rating_average and the star "
+        "histogram of every product from its reviews, in batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--product",
+            type=int,
+            action="append",
+            dest="products",
+            metavar="ID",
+            help="Only this product, can be repeated",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Products recomputed per query",
+        )
+
+    def handle(self, *args, **options):
+        """command handler method"""
+        changed = recompute_ratings(
+            options["products"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"{changed} products had stale ratings")
+        )
@@ -0,0 +1,429 @@
+"""
+In-process metrics in the Prometheus text exposition format
+
+Counters, gauges and fixed-bucket histograms live in a ``Registry``.
+With a single process the registry is simply read at ``/metrics/``.
+Under a pre-forking server (gunicorn with several workers) set
+``METRICS_DIR`` to a directory shared by the workers: every process
+writes a snapshot of its own values there (at most every
+``METRICS_FLUSH_INTERVAL`` seconds and at exit) and the worker that
+serves ``/metrics/`` merges the snapshots of all the others with its own
+live values. Counters and histograms are summed, including those of
+exited workers; gauges are combined per metric and dropped once their
+process has exited. The snapshots of exited workers are folded into one
+``retired.json`` and deleted, so restarts do not grow the directory.
+"""
+
+import atexit
+import fcntl
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from django.conf import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Metric:
+    """Base class, values are kept per tuple of label values"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, "
+                f"got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return {
+                key: list(value) if isinstance(value, list) else value
+                for key, value in self.values.items()
+            }
+
+
+class Counter(Metric):
+    """A value that only goes up"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down.
+
+    ``aggregate`` decides how the values of several processes are
+    combined: ``"sum"``, ``"max"``, ``"min"`` or ``"all"`` (one sample
+    per process with a ``pid`` label).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, *args, aggregate="sum", **kwargs):
+        if aggregate not in ("sum", "max", "min", "all"):
+            raise ValueError(f"Unknown gauge aggregate {aggregate!r}")
+        self.aggregate = aggregate
+        super().__init__(*args, **kwargs)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Observations counted in fixed buckets, with their sum"""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets=LATENCY_BUCKETS, **kwargs):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(*args, **kwargs)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # [count per bucket..., count above the last bucket, sum]
+            row = self.values.get(key)
+            if row is None:
+                row = self.values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    break
+            else:
+                index = len(self.buckets)
+            row[index] += 1
+            row[-1] += value
+
+
+class Registry:
+    """The metrics of a process, and of its siblings when shared"""
+
+    def __init__(self, directory=None, flush_interval=None):
+        self.metrics = {}
+        self._directory = directory
+        self._flush_interval = flush_interval
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Duplicate metric {metric.name}")
+            self.metrics[metric.name] = metric
+
+    @property
+    def directory(self):
+        directory = self._directory or getattr(settings, "METRICS_DIR", None)
+        return Path(directory) if directory else None
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, "METRICS_FLUSH_INTERVAL", 1.0)
+
+    def snapshot(self):
+        return {
+            name: {"kind": metric.kind, "samples": metric.samples()}
+            for name, metric in self.metrics.items()
+        }
+
+    def flush(self, force=False):
+        """Write this process's values for the other workers to read"""
+
+        directory = self.directory
+        if directory is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        payload = {
+            name: [
+                [list(key), value] for key, value in data["samples"].items()
+            ]
+            for name, data in self.snapshot().items()
+        }
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{os.getpid()}.json"
+        temporary = path.with_suffix(f".{threading.get_ident()}.tmp")
+        temporary.write_text(json.dumps(payload))
+        os.replace(temporary, path)
+
+    def _retire(self, directory):
+        """
+        Fold the counters and histograms of exited workers into
+        ``retired.json`` and delete their snapshots.
+        """
+
+        dead = [
+            path
+            for path in directory.glob("*.json")
+            if path.stem.isdigit()
+            and int(path.stem) != os.getpid()
+            and not _alive(int(path.stem))
+        ]
+        if not dead:
+            return
+        retired_path = directory / "retired.json"
+        with open(directory / "retired.lock", "a") as lock:
+            # every worker serving /metrics/ may be retiring the same pids
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                retired = json.loads(retired_path.read_text())
+            except FileNotFoundError:
+                retired = {}
+            for path in dead:
+                try:
+                    payload = json.loads(path.read_text())
+                except FileNotFoundError:
+                    # retired by another worker while this one waited
+                    continue
+                except ValueError:
+                    payload = {}
+                for name, samples in payload.items():
+                    metric = self.metrics.get(name)
+                    if metric is None or metric.kind == "gauge":
+                        continue
+                    folded = {
+                        tuple(key): value
+                        for key, value in retired.get(name, [])
+                    }
+                    for key, value in samples:
+                        key = tuple(key)
+                        if key not in folded:
+                            folded[key] = value
+                        elif metric.kind == "histogram":
+                            folded[key] = [
+                                a + b for a, b in zip(folded[key], value)
+                            ]
+                        else:
+                            folded[key] += value
+                    retired[name] = [
+                        [list(key), value] for key, value in folded.items()
+                    ]
+            temporary = retired_path.with_suffix(f".{os.getpid()}.tmp")
+            temporary.write_text(json.dumps(retired))
+            os.replace(temporary, retired_path)
+            for path in dead:
+                path.unlink(missing_ok=True)
+
+    def _siblings(self):
+        """``(pid, alive, samples)`` of every other process's snapshot"""
+
+        directory = self.directory
+        if directory is None or not directory.is_dir():
+            return
+        self._retire(directory)
+        payloads = []
+        with open(directory / "retired.lock", "a") as lock:
+            # a retirement moves samples between files, read either side
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            for path in directory.glob("*.json"):
+                if path.stem == "retired":
+                    pid = None
+                elif not path.stem.isdigit() or int(path.stem) == os.getpid():
+                    continue
+                else:
+                    pid = int(path.stem)
+                try:
+                    payloads.append((pid, json.loads(path.read_text())))
+                except (OSError, ValueError):
+                    # removed or replaced while reading
+                    continue
+        for pid, payload in payloads:
+            yield pid, pid is not None and _alive(pid), {
+                name: {tuple(key): value for key, value in samples}
+                for name, samples in payload.items()
+            }
+
+    def collect(self):
+        """Merged samples per metric: ``{name: {labels: value}}``"""
+
+        own = {name: data["samples"] for name, data in self.snapshot().items()}
+        merged = {}
+        for name, metric in self.metrics.items():
+            if metric.kind == "gauge" and metric.aggregate == "all":
+                merged[name] = {
+                    key + (str(os.getpid()),): value
+                    for key, value in own[name].items()
+                }
+            else:
+                merged[name] = dict(own[name])
+        for pid, alive, samples in self._siblings():
+            for name, values in samples.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                target = merged[name]
+                for key, value in values.items():
+                    if metric.kind == "gauge":
+                        if not alive:
+                            continue
+                        if metric.aggregate == "all":
+                            target[key + (str(pid),)] = value
+                        elif key not in target:
+                            target[key] = value
+                        elif metric.aggregate == "sum":
+                            target[key] += value
+                        else:
+                            pick = max if metric.aggregate == "max" else min
+                            target[key] = pick(target[key], value)
+                    elif metric.kind == "histogram":
+                        if key in target:
+                            target[key] = [
+                                a + b for a, b in zip(target[key], value)
+                            ]
+                        else:
+                            target[key] = list(value)
+                    else:
+                        target[key] = target.get(key, 0) + value
+        return merged
+
+    def expose(self):
+        """The merged metrics in the text exposition format"""
+
+        lines = []
+        collected = self.collect()
+        for name in sorted(self.metrics):
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            labelnames = metric.labelnames
+            if metric.kind == "gauge" and metric.aggregate == "all":
+                labelnames += ("pid",)
+            for key, value in sorted(collected[name].items()):
+                labels = list(zip(labelnames, key))
+                if metric.kind != "histogram":
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                bounds = metric.buckets + (math.inf,)
+                for bound, count in zip(bounds, value):
+                    cumulative += count
+                    bucket = labels + [("le", _number(float(bound)))]
+                    lines.append(
+                        f"{name}_bucket{_labels(bucket)} {cumulative}"
+                    )
+                lines.append(
+                    f"{name}_sum{_labels(labels)} {_number(value[-1])}"
+                )
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape_help(text):
+    return text.replace("\\", r"\\").replace("\n", r"\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        (
+            name,
+            value.replace("\\", r"\\")
+            .replace('"', r"\"")
+            .replace("\n", r"\n"),
+        )
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value)) if isinstance(value, int) else f"{value:.1f}"
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+atexit.register(REGISTRY.flush, force=True)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route, method and status code",
+    ("route", "method", "status"),
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests",
+    ("route", "method"),
+)
+HTTP_QUERIES = Histogram(
+    "http_request_queries",
+    "Database queries per HTTP request",
+    ("route",),
+    buckets=QUERY_BUCKETS,
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being handled",
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result",
+    ("cache", "result"),
+)
+JWT_AUTHENTICATIONS = Counter(
+    "jwt_authentications_total",
+    "JWT authentication attempts by outcome",
+    ("outcome",),
+)
@@ -0,0 +1,246 @@
+"""
+Per-request performance instrumentation
+
+``MetricsMiddleware`` records request counts, latency and query counts
+per route in the ``core.metrics`` registry.
+
+``RequestTimingMiddleware`` times every query through
+``core.db.observe_queries``, the top level DRF serializer ``.data``
+and the response rendering, and reports them in a ``Server-Timing``
+header. Requests slower than ``SLOW_REQUEST_THRESHOLD_MS`` are logged to
+``core.performance`` with the statements that ran more than once, the
+usual sign of an N+1.
+
+It is off unless ``REQUEST_INSTRUMENTATION`` is set, in which case
+Django drops it from the middleware chain at startup, so a disabled
+instrumentation costs nothing per request.
+
+Both run sync or async, whichever the handler chain is, so they do not
+force the async views under ASGI onto a thread. Queries are observed
+through the request's context rather than its thread's connections, so
+those an async view runs through ``sync_to_async`` are counted too.
+"""
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import SimpleNamespace
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.serializers import BaseSerializer
+from core.db import observe_queries
+from core.metrics import (
+    HTTP_IN_PROGRESS,
+    HTTP_LATENCY,
+    HTTP_QUERIES,
+    HTTP_REQUESTS,
+    REGISTRY,
+)
+
+logger = logging.getLogger("core.performance")
+
+current_metrics = ContextVar("current_metrics", default=None)
+
+
+class RequestMetrics:
+    """Timings collected while one request is handled"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.serializing = False
+        # sql -> [executions, seconds]
+        self.statements = {}
+
+    def observe(self, sql, elapsed):
+        """``observe_queries`` hook recording each statement"""
+
+        self.query_count += 1
+        self.db_time += elapsed
+        entry = self.statements.setdefault(sql, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def duplicates(self, limit=5):
+        """Statements executed more than once, most repeated first"""
+
+        repeated = sorted(
+            (
+                (count, seconds, sql)
+                for sql, (count, seconds) in self.statements.items()
+                if count > 1
+            ),
+            reverse=True,
+        )
+        return [
+            {"sql": sql, "count": count, "duration_ms": _ms(seconds)}
+            for count, seconds, sql in repeated[:limit]
+        ]
+
+    def server_timing(self, total):
+        return ", ".join(
+            (
+                f"db;dur={_ms(self.db_time)};"
+                f'desc="{self.query_count} queries"',
+                f"serialize;dur={_ms(self.serialize_time)}",
+                f"render;dur={_ms(self.render_time)}",
+                f"total;dur={_ms(total)}",
+            )
+        )
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def instrument_serializers():
+    """Time the outermost ``serializer.data`` of each request"""
+
+    original = BaseSerializer.data
+    if getattr(original.fget, "instrumented", False):
+        return
+
+    def data(self):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.serializing:
+            return original.fget(self)
+        metrics.serializing = True
+        started = time.perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            metrics.serializing = False
+            metrics.serialize_time += time.perf_counter() - started
+
+    data.instrumented = True
+    BaseSerializer.data = property(data)
+
+
+class HybridMiddleware:
+    """
+    Middleware running in the mode of the handler chain, so an async
+    view under ASGI is not pushed onto a thread to pass through it.
+    Subclasses implement ``measure(request)``, a context manager that
+    yields an object whose ``response`` is set before it exits.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.measure(request) as measured:
+            measured.response = self.get_response(request)
+        return measured.response
+
+    async def __acall__(self, request):
+        with self.measure(request) as measured:
+            measured.response = await self.get_response(request)
+        return measured.response
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Count requests, their latency and queries per route"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    @contextmanager
+    def measure(self, request):
+        measured = SimpleNamespace(response=None)
+        queries = 0
+
+        def count(sql, elapsed):
+            nonlocal queries
+            queries += 1
+
+        HTTP_IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            with observe_queries(count):
+                yield measured
+        finally:
+            HTTP_IN_PROGRESS.dec()
+        elapsed = time.perf_counter() - started
+
+        # view names keep the label set small, unlike raw paths
+        response = measured.response
+        match = request.resolver_match
+        route = match.view_name if match else "unmatched"
+        HTTP_REQUESTS.inc(
+            route=route, method=request.method, status=response.status_code
+        )
+        HTTP_LATENCY.observe(elapsed, route=route, method=request.method)
+        HTTP_QUERIES.observe(queries, route=route)
+        REGISTRY.flush()
+
+
+class RequestTimingMiddleware(HybridMiddleware):
+    """Add ``Server-Timing`` to responses and log slow requests"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_INSTRUMENTATION", False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.threshold = getattr(settings, "SLOW_REQUEST_THRESHOLD_MS", 500)
+        self.top_queries = getattr(settings, "SLOW_REQUEST_TOP_QUERIES", 5)
+        instrument_serializers()
+
+    @contextmanager
+    def measure(self, request):
+        measured = SimpleNamespace(response=None)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with observe_queries(metrics.observe):
+                yield measured
+        finally:
+            current_metrics.reset(token)
+
+        response = measured.response
+        total = metrics.elapsed()
+        response["Server-Timing"] = metrics.server_timing(total)
+        if total * 1000 >= self.threshold:
+            self.log(request, response, metrics, total)
+
+    def process_template_response(self, request, response):
+        # called right before Django renders the response
+        metrics = current_metrics.get()
+        started = time.perf_counter()
+
+        def rendered(response):
+            metrics.render_time += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def log(self, request, response, metrics, total):
+        record = {
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "duration_ms": _ms(total),
+            "db_ms": _ms(metrics.db_time),
+            "queries": metrics.query_count,
+            "serialize_ms": _ms(metrics.serialize_time),
+            "render_ms": _ms(metrics.render_time),
+            "duplicated": metrics.duplicates(self.top_queries),
+        }
+        logger.warning(json.dumps(record), extra={"request_metrics": record})
@@ -0,0 +1,265 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:25
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BlacklistedToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("jti", models.CharField(max_length=255, unique=True)),
+                ("expires_at", models.DateTimeField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProductTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Tag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("key", models.CharField(editable=False, max_length=255, unique=True)),
+                (
+                    "slug",
+                    models.SlugField(allow_unicode=True, max_length=255, unique=True),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name="variant",
+            options={"ordering": ["id"]},
+        ),
+        migrations.AddField(
+            model_name="deliverytimestatus",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="deliverytimestatus",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="image",
+            name="url_hash",
+            field=models.CharField(
+                editable=False, max_length=64, null=True, unique=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_1_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_2_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_3_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_4_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_5_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_average",
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="review",
+            name="rating",
+            field=models.PositiveIntegerField(
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(5),
+                ]
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="carousel",
+            index=models.Index(
+                fields=["product", "order", "id"], name="carousel_product_order_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="carousel",
+            index=models.Index(fields=["updated_at"], name="carousel_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "created_at", "id"], name="order_user_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "status", "created_at"], name="order_user_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="orderitem",
+            index=models.Index(
+                fields=["order", "quantity"], name="orderitem_order_qty_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["created_at", "id"], name="product_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "brand"], name="product_category_brand_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["updated_at"], name="product_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["rating_average", "rating_count", "id"],
+                name="product_rating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["product", "created_at", "id"],
+                name="review_product_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="variant",
+            index=models.Index(
+                fields=["product", "color", "size"],
+                name="variant_product_color_size_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="variant",
+            index=models.Index(
+                fields=["product", "price"], name="variant_product_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="variant",
+            index=models.Index(
+                fields=["product", "stock"], name="variant_product_stock_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="variant",
+            index=models.Index(fields=["updated_at"], name="variant_updated_idx"),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="products",
+            field=models.ManyToManyField(
+                related_name="tags", through="core.ProductTag", to="core.product"
+            ),
+        ),
+        migrations.AddField(
+            model_name="producttag",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="product_tags",
+                to="core.product",
+            ),
+        ),
+        migrations.AddField(
+            model_name="producttag",
+            name="tag",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="product_tags",
+                to="core.tag",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="blacklistedtoken",
+            index=models.Index(fields=["expires_at"], name="blacklist_expires_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="blacklistedtoken",
+            index=models.Index(fields=["created_at"], name="blacklist_created_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="producttag",
+            constraint=models.UniqueConstraint(
+                fields=("tag", "product"), name="unique_tag_product"
+            ),
+        ),
+    ]
@@ -0,0 +1,108 @@
+"""
+Move the per-product ``Tags`` rows into shared ``Tag`` rows linked to their
+products through ``ProductTag``, then drop ``Tags``.
+
+Names are merged on their casefolded, whitespace collapsed form and a tag
+repeated on a product is linked once, as ``core.tags.link_tags`` does. The
+key and slug rules of ``Tag`` are copied here so that later changes to the
+model leave this migration as it ran.
+"""
+
+import unicodedata
+from django.db import migrations
+from django.utils.text import slugify
+
+BATCH_SIZE = 5000
+
+
+def normalize_name(name):
+    return " ".join(str(name).split())[:255]
+
+
+def key_for(name):
+    return unicodedata.normalize("NFKC", name).casefold()[:255]
+
+
+def slug_for(name, number):
+    slug = slugify(name, allow_unicode=True) or "tag"
+    if number == 1:
+        return slug[:255]
+    suffix = f"-{number}"
+    return slug[: 255 - len(suffix)] + suffix
+
+
+def copy_legacy_tags(apps, schema_editor):
+    Tags = apps.get_model("core", "Tags")
+    Tag = apps.get_model("core", "Tag")
+    ProductTag = apps.get_model("core", "ProductTag")
+    db = schema_editor.connection.alias
+
+    tags = dict(Tag.objects.using(db).values_list("key", "pk"))
+    taken = set(Tag.objects.using(db).values_list("slug", flat=True))
+    last = 0
+    while True:
+        batch = list(
+            Tags.objects.using(db)
+            .filter(pk__gt=last)
+            .order_by("pk")
+            .values_list("pk", "product_id", "tag_name")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last = batch[-1][0]
+
+        links, new = set(), {}
+        for _, product_id, name in batch:
+            name = normalize_name(name)
+            if not name:
+                continue
+            key = key_for(name)
+            links.add((product_id, key))
+            if key in tags or key in new:
+                continue
+            number = 1
+            while slug_for(name, number) in taken:
+                number += 1
+            taken.add(slug_for(name, number))
+            new[key] = Tag(name=name, key=key, slug=slug_for(name, number))
+        Tag.objects.using(db).bulk_create(new.values())
+        created = Tag.objects.using(db).in_bulk(list(new), field_name="key")
+        tags.update((key, tag.pk) for key, tag in created.items())
+        ProductTag.objects.using(db).bulk_create(
+            [
+                ProductTag(product_id=product_id, tag_id=tags[key])
+                for product_id, key in sorted(links)
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def restore_legacy_tags(apps, schema_editor):
+    Tags = apps.get_model("core", "Tags")
+    ProductTag = apps.get_model("core", "ProductTag")
+    db = schema_editor.connection.alias
+
+    Tags.objects.using(db).bulk_create(
+        (
+            Tags(product_id=product_id, tag_name=name)
+            for product_id, name in ProductTag.objects.using(db)
+            .order_by("pk")
+            .values_list("product_id", "tag__name")
+            .iterator()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_catalog_schema"),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_legacy_tags, restore_legacy_tags),
+        migrations.DeleteModel(
+            name="Tags",
+        ),
+    ]
@@ -0,0 +1,47 @@
+"""
+Merge the cart lines repeating a variant in the same cart into their
+oldest line, summing the quantities, then make ``(cart, product_variant)``
+unique so the cart API can upsert lines.
+"""
+
+from django.db import migrations, models
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    CartItem = apps.get_model("core", "CartItem")
+    items = CartItem.objects.using(schema_editor.connection.alias)
+
+    duplicates = (
+        items.values("cart_id", "product_variant_id")
+        .annotate(
+            lines=models.Count("id"),
+            keep=models.Min("id"),
+            quantity=models.Sum("quantity"),
+        )
+        .filter(lines__gt=1)
+        .order_by()
+    )
+    for line in list(duplicates):
+        same = items.filter(
+            cart_id=line["cart_id"],
+            product_variant_id=line["product_variant_id"],
+        )
+        same.exclude(pk=line["keep"]).delete()
+        same.filter(pk=line["keep"]).update(quantity=line["quantity"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_copy_legacy_tags"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="cartitem",
+            constraint=models.UniqueConstraint(
+                fields=("cart", "product_variant"), name="unique_cart_variant"
+            ),
+        ),
+    ]
@@ -1,9 +1,16 @@
 """Database models for Core App"""
 
+import hashlib
 import re
+import unicodedata
+from urllib.parse import urlsplit, urlunsplit
 from django.db import models
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.utils.text import slugify
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
 
 
 class User(AbstractUser):
@@ -39,12 +46,48 @@ class Category(models.Model):
 
 
 class Image(models.Model):
-    """Image model"""
+    """Image model, registered under the hash of its normalized url"""
 
     url = models.URLField(max_length=999, null=True)
+    url_hash = models.CharField(
+        max_length=64, unique=True, null=True, editable=False
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @staticmethod
+    def normalize_url(url):
+        """
+        Lower-case the scheme and host, drop the default port and the
+        fragment; the path and query are case sensitive and kept.
+        """
+
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or "").lower()
+        if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+            host = f"{host}:{parts.port}"
+        if parts.username:
+            credentials = parts.username
+            if parts.password:
+                credentials = f"{credentials}:{parts.password}"
+            host = f"{credentials}@{host}"
+        return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+    @classmethod
+    def hash_url(cls, url):
+        """Hex SHA-256 of the normalized ``url``"""
+
+        return hashlib.sha256(
+            cls.normalize_url(url).encode("utf-8")
+        ).hexdigest()
+
+    def save(self, *args, **kwargs):
+        if self.url:
+            self.url = self.normalize_url(self.url)
+        self.url_hash = self.hash_url(self.url) if self.url else None
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.url}"
 
@@ -61,9 +104,37 @@ class Product(models.Model):
     base_name = models.CharField(max_length=255)
     description = models.TextField()
     base_price = models.DecimalField(max_digits=10, decimal_places=2)
+    # review aggregates, kept in step by core.reviews
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_average = models.FloatField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination of the product list
+            models.Index(
+                fields=["created_at", "id"], name="product_created_id_idx"
+            ),
+            # ?category=&brand= filters and their facet counts
+            models.Index(
+                fields=["category", "brand"], name="product_category_brand_idx"
+            ),
+            # COUNT/MAX(updated_at) of the list ETag, read from the index
+            models.Index(fields=["updated_at"], name="product_updated_idx"),
+            # keyset pagination of ?ordering=rating
+            models.Index(
+                fields=["rating_average", "rating_count", "id"],
+                name="product_rating_idx",
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"{self.base_name} | {self.category.name}"
 
@@ -86,6 +157,23 @@ class Variant(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        ordering = ["id"]
+        # variant filters run as EXISTS subqueries correlated on product
+        indexes = [
+            models.Index(
+                fields=["product", "color", "size"],
+                name="variant_product_color_size_idx",
+            ),
+            models.Index(
+                fields=["product", "price"], name="variant_product_price_idx"
+            ),
+            models.Index(
+                fields=["product", "stock"], name="variant_product_stock_idx"
+            ),
+            models.Index(fields=["updated_at"], name="variant_updated_idx"),
+        ]
+
 
 class Specification(models.Model):
     """Product specifications"""
@@ -120,6 +208,8 @@ class DeliveryTimeStatus(models.Model):
     shipping_cost = models.DecimalField(max_digits=10, decimal_places=2)
     estimated_delivery_time = models.CharField(max_length=100)
     additional_info = models.TextField(max_length=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 class Faq(models.Model):
@@ -150,6 +240,16 @@ class Carousel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # the lead image of each product in the list
+            models.Index(
+                fields=["product", "order", "id"],
+                name="carousel_product_order_idx",
+            ),
+            models.Index(fields=["updated_at"], name="carousel_updated_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.product.base_name} - {self.image}"
 
@@ -165,26 +265,129 @@ class Review(models.Model):
     )
     images = models.ManyToManyField(Image, related_name="images")
     comment = models.TextField()
-    rating = models.PositiveIntegerField()
+    rating = models.PositiveIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(5)]
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # a product's reviews, newest first
+        indexes = [
+            models.Index(
+                fields=["product", "created_at", "id"],
+                name="review_product_created_idx",
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"{self.product.base_name} - {self.reviewer}"
 
 
-class Tags(models.Model):
-    """Product tags"""
+class Tag(models.Model):
+    """
+    A tag shared by every product carrying it, one per ``key``: the name
+    casefolded with its whitespace collapsed, so "Café" and " café" are
+    one tag while "C", "C#" and "C++" are three, slugged "c", "c-2" and
+    "c-3" in the order they were created.
+    """
 
-    product = models.ForeignKey(
-        Product, related_name="tags", on_delete=models.CASCADE
+    name = models.CharField(max_length=255)
+    key = models.CharField(max_length=255, unique=True, editable=False)
+    slug = models.SlugField(max_length=255, unique=True, allow_unicode=True)
+    products = models.ManyToManyField(
+        Product, through="ProductTag", related_name="tags"
     )
-    tag_name = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @staticmethod
+    def normalize_name(name):
+        """Collapse whitespace, the displayed form of a tag name"""
+
+        return " ".join(str(name).split())[:255]
+
+    @classmethod
+    def key_for(cls, name):
+        """The identity of a tag named ``name``"""
+
+        name = unicodedata.normalize("NFKC", cls.normalize_name(name))
+        return name.casefold()[:255]
+
+    @staticmethod
+    def slug_for(name, number=1):
+        """The ``number``th candidate slug of ``name``"""
+
+        slug = slugify(name, allow_unicode=True) or "tag"
+        if number == 1:
+            return slug[:255]
+        suffix = f"-{number}"
+        return slug[: 255 - len(suffix)] + suffix
+
+    @classmethod
+    def free_slugs(cls, names):
+        """
+        Map each key of ``names`` (``{key: name}``) to the first candidate
+        slug of its name no tag has taken, one query per suffix tried.
+        """
+
+        slugs, numbers = {}, dict.fromkeys(names, 1)
+        while len(slugs) < len(names):
+            candidates = {
+                key: cls.slug_for(names[key], numbers[key])
+                for key in names
+                if key not in slugs
+            }
+            taken = set(
+                cls.objects.filter(slug__in=candidates.values()).values_list(
+                    "slug", flat=True
+                )
+            )
+            taken.update(slugs.values())
+            for key, slug in candidates.items():
+                if slug in taken:
+                    numbers[key] += 1
+                else:
+                    slugs[key] = slug
+                    taken.add(slug)
+        return slugs
+
+    def save(self, *args, **kwargs):
+        self.name = self.normalize_name(self.name)
+        self.key = self.key_for(self.name)
+        if not self.slug:
+            self.slug = self.free_slugs({self.key: self.name})[self.key]
+        super().save(*args, **kwargs)
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class ProductTag(models.Model):
+    """A tag on a product"""
+
+    product = models.ForeignKey(
+        Product, related_name="product_tags", on_delete=models.CASCADE
+    )
+    # indexed by the unique constraint, which starts with tag
+    tag = models.ForeignKey(
+        Tag,
+        related_name="product_tags",
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # tag first: its index walks a tag's products in id order
+            models.UniqueConstraint(
+                fields=["tag", "product"], name="unique_tag_product"
+            ),
+        ]
+
     def __str__(self) -> str:
-        return f"{self.product.base_name} - {self.tag_name}"
+        return f"{self.product.base_name} - {self.tag.name}"
 
 
 class Cart(models.Model):
@@ -209,6 +412,13 @@ class CartItem(models.Model):
     product_variant = models.ForeignKey(Variant, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart", "product_variant"], name="unique_cart_variant"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.product_variant.name} x {self.quantity}"
 
@@ -248,6 +458,19 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # order history, newest first, optionally by status
+            models.Index(
+                fields=["user", "created_at", "id"],
+                name="order_user_created_idx",
+            ),
+            models.Index(
+                fields=["user", "status", "created_at"],
+                name="order_user_status_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Order {self.status} - {self.user}"
 
@@ -262,5 +485,31 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        # covers the item count summed per order in the order list
+        indexes = [
+            models.Index(
+                fields=["order", "quantity"], name="orderitem_order_qty_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.product_variant.name} x {self.quantity}"
+
+
+class BlacklistedToken(models.Model):
+    """A revoked refresh token, kept until it would have expired anyway"""
+
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # pruning walks the expired rows, filter sync the new ones
+            models.Index(fields=["expires_at"], name="blacklist_expires_idx"),
+            models.Index(fields=["created_at"], name="blacklist_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.jti}"
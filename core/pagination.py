@@ -0,0 +1,235 @@
+"""
+Pagination classes for Core App list endpoints
+"""
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique, multi-column ordering.
+
+    The cursor stores the ordering values of the last row seen, so every
+    page is a single range scan on the ordering index no matter how deep
+    the client has paged.
+
+    Subclasses may offer alternative orderings in ``orderings``, picked
+    by name with ``?ordering=``; each needs its own index.
+    """
+
+    ordering = ("-created_at", "-id")
+    orderings = {}
+    # annotations in the ordering, by the model field parsing their values
+    cursor_fields = {}
+    ordering_query_param = "ordering"
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_rows(list(self.page_queryset(queryset, request)))
+
+    def page_queryset(self, queryset, request):
+        """
+        The query for the requested page plus one row, telling whether
+        there is another page; async views evaluate it themselves and
+        hand the rows to ``paginate_rows``.
+        """
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        self.position, self.reverse = self.decode_cursor(
+            request, queryset.model
+        )
+
+        ordering = self.reversed_ordering() if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.after(self.position, ordering))
+        return queryset[: self.page_size + 1]
+
+    def paginate_rows(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        started = self.position is not None
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = started, has_more
+        else:
+            self.has_next, self.has_previous = has_more, started
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, request):
+        name = request.query_params.get(self.ordering_query_param)
+        if not name or not self.orderings:
+            return self.ordering
+        if name not in self.orderings:
+            raise serializers.ValidationError(
+                {
+                    self.ordering_query_param: (
+                        f"Choose one of {', '.join(sorted(self.orderings))}"
+                    )
+                }
+            )
+        return self.orderings[name]
+
+    def reversed_ordering(self):
+        return tuple(
+            name[1:] if name.startswith("-") else f"-{name}"
+            for name in self.ordering
+        )
+
+    @staticmethod
+    def after(position, ordering):
+        """Return the filter selecting rows strictly after ``position``"""
+
+        clauses = []
+        for index, name in enumerate(ordering):
+            field = name.lstrip("-")
+            operator = "lt" if name.startswith("-") else "gt"
+            equal = {
+                other.lstrip("-"): value
+                for other, value in zip(ordering[:index], position)
+            }
+            clauses.append(
+                Q(**equal, **{f"{field}__{operator}": position[index]})
+            )
+        return reduce(lambda left, right: left | right, clauses)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            values = payload["p"]
+            # orderings are over non null columns, so a position is a list
+            # of scalars; a null would reach ``after`` as a lookup on None
+            if (
+                not isinstance(values, list)
+                or len(values) != len(self.ordering)
+                or not all(isinstance(v, (str, int, float)) for v in values)
+            ):
+                raise ValueError(values)
+            position = [
+                model._meta.get_field(
+                    self.cursor_fields.get(name.lstrip("-"), name.lstrip("-"))
+                ).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+            return position, bool(payload.get("r"))
+        except (TypeError, ValueError, KeyError, ValidationError) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+
+    def encode_cursor(self, instance, reverse):
+        values = [
+            getattr(instance, name.lstrip("-")) for name in self.ordering
+        ]
+        payload = {
+            "p": [
+                value.isoformat() if hasattr(value, "isoformat") else value
+                for value in values
+            ],
+            "r": int(reverse),
+        }
+        encoded = urlsafe_b64encode(
+            json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        ).decode("ascii")
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_data(self, data):
+        return {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {
+                    "type": "string",
+                    "nullable": True,
+                    "format": "uri",
+                },
+                "results": schema,
+            },
+        }
+
+
+class ProductCursorPagination(KeysetPagination):
+    """
+    Newest products first, keyed on ``(created_at, id)``, or best rated
+    first with ``?ordering=rating``
+    """
+
+    page_size = 24
+    orderings = {
+        "newest": ("-created_at", "-id"),
+        "rating": ("-rating_average", "-rating_count", "-id"),
+    }
+
+
+class ReviewCursorPagination(KeysetPagination):
+    """Newest reviews of a product first, keyed on ``(created_at, id)``"""
+
+    page_size = 20
+
+
+class TagProductCursorPagination(KeysetPagination):
+    """
+    Products of a tag, newest first by id. The view annotates the id as
+    seen in the ``(tag, product)`` index, so SQLite reads pages straight
+    from that index instead of sorting every product of the tag.
+    """
+
+    ordering = ("-tagged_product_id",)
+    cursor_fields = {"tagged_product_id": "id"}
+    page_size = 24
+
+
+class OrderCursorPagination(KeysetPagination):
+    """Newest orders first, keyed on ``(created_at, id)``"""
+
+    page_size = 20
@@ -0,0 +1,53 @@
+"""
+Fast JSON parsing for the API
+
+``JSONParser`` reads the whole body and parses the bytes with orjson when
+it is installed, else with ``json.loads``, instead of DRF's decode as a
+stream then parse. Bodies in a charset other than UTF-8 and non strict
+parsing (``STRICT_JSON = False``) are left to DRF's parser.
+
+orjson reads integers wider than 64 bits as floats, so bodies holding a
+run of 19 or more digits, rare in this API, are parsed by ``json.loads``,
+which keeps them exact.
+"""
+
+import codecs
+import re
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import json
+from core.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# long enough to fall outside orjson's 64 bit integers
+LONG_NUMBER = re.compile(rb"\d{19}")
+
+
+def loads(content):
+    """The data of a UTF-8 JSON document, ``NaN`` and infinities refused"""
+
+    if orjson is not None and not LONG_NUMBER.search(content):
+        return orjson.loads(content)
+    return json.loads(content, parse_constant=json.strict_constant)
+
+
+class JSONParser(parsers.JSONParser):
+    """DRF's JSON parser through ``loads``"""
+
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            "encoding", settings.DEFAULT_CHARSET
+        )
+        if not self.strict or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f"JSON parse error - {exc}") from exc
@@ -0,0 +1,128 @@
+"""
+Queryset planning for nested serializers
+
+Walks a serializer tree and derives the ``select_related`` and
+``prefetch_related`` lookups needed to serialize a queryset without
+issuing per-row queries.
+"""
+
+from functools import lru_cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, OuterRef, Prefetch, Subquery
+from rest_framework import serializers
+from core.models import Carousel
+
+
+class QueryPlan:
+    """Relations to join and prefetch for a serializer class"""
+
+    def __init__(self, model, select_related=(), prefetch_related=()):
+        self.model = model
+        self.select_related = tuple(select_related)
+        # (lookup, QueryPlan of the related serializer)
+        self.prefetch_related = tuple(prefetch_related)
+
+    def apply(self, queryset):
+        """Return ``queryset`` with the planned relations attached"""
+
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetches())
+        return queryset
+
+    def prefetches(self):
+        """Build fresh ``Prefetch`` objects, one per planned lookup"""
+
+        return [
+            Prefetch(lookup, queryset=plan.apply(plan.model.objects.all()))
+            for lookup, plan in self.prefetch_related
+        ]
+
+
+def _walk(model, serializer, prefix, select_related, prefetch_related):
+    """Collect lookups for ``serializer`` fields rooted at ``prefix``"""
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == "*":
+            continue
+        if "." in field.source:
+            _walk_dotted(model, field.source, prefix, select_related)
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            # properties, methods and annotations have no relation to plan
+            continue
+        if not model_field.is_relation:
+            continue
+
+        lookup = f"{prefix}{field.source}"
+        if isinstance(field, serializers.ListSerializer):
+            child = field.child
+            if isinstance(child, serializers.ModelSerializer):
+                plan = plan_for(type(child))
+            else:
+                plan = QueryPlan(model_field.related_model)
+            prefetch_related.append((lookup, plan))
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch_related.append(
+                (lookup, QueryPlan(model_field.related_model))
+            )
+        elif isinstance(field, serializers.ModelSerializer):
+            if model_field.many_to_many or model_field.one_to_many:
+                prefetch_related.append((lookup, plan_for(type(field))))
+                continue
+            # forward FK, forward and reverse one-to-one: join in place
+            select_related.append(lookup)
+            _walk(
+                model_field.related_model,
+                field,
+                f"{lookup}__",
+                select_related,
+                prefetch_related,
+            )
+
+
+def _walk_dotted(model, source, prefix, select_related):
+    """Join the single-valued relations along a dotted ``source``"""
+
+    for attname in source.split(".")[:-1]:
+        try:
+            model_field = model._meta.get_field(attname)
+        except FieldDoesNotExist:
+            return
+        if not (model_field.many_to_one or model_field.one_to_one):
+            return
+        prefix = f"{prefix}{attname}"
+        if prefix not in select_related:
+            select_related.append(prefix)
+        prefix = f"{prefix}__"
+        model = model_field.related_model
+
+
+@lru_cache(maxsize=None)
+def plan_for(serializer_class):
+    """Return the cached ``QueryPlan`` for a ``ModelSerializer`` class"""
+
+    select_related, prefetch_related = [], []
+    model = serializer_class.Meta.model
+    _walk(model, serializer_class(), "", select_related, prefetch_related)
+    return QueryPlan(model, select_related, prefetch_related)
+
+
+def plan_queryset(queryset, serializer_class):
+    """Attach the joins and prefetches ``serializer_class`` needs"""
+
+    return plan_for(serializer_class).apply(queryset)
+
+
+def annotate_lead_image(queryset):
+    """Add each product's first carousel image as ``lead_image``"""
+
+    lead_image = Carousel.objects.filter(product=OuterRef("pk")).order_by(
+        F("order").asc(nulls_last=True), "id"
+    )
+    return queryset.annotate(
+        lead_image=Subquery(lead_image.values("image")[:1])
+    )
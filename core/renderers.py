@@ -0,0 +1,114 @@
+"""
+Fast JSON rendering for the API
+
+``JSONRenderer`` renders with orjson when it is installed, which writes
+dicts, lists, strings, numbers, datetimes, dates, times and UUIDs in Rust
+without calling back into Python. Without orjson it falls back to one
+stdlib encoder built per process instead of one per response.
+
+Either way the few types neither handles, ``Decimal`` values that did not
+go through a serializer field, lazy translations, timedeltas, go through
+a single type keyed lookup instead of DRF's chain of ``isinstance``
+checks, and render as DRF's encoder renders them. Output is the same
+compact UTF-8 JSON as DRF's renderer with ``U+2028``/``U+2029`` escaped.
+
+Pretty printing (``Accept: application/json; indent=2``) and non default
+``UNICODE_JSON``/``COMPACT_JSON`` settings are left to DRF's renderer.
+orjson writes ``NaN`` and infinities as ``null`` where the stdlib encoder
+refuses them under ``STRICT_JSON``.
+"""
+
+import datetime
+import decimal
+import json
+import uuid
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ESCAPES = (("\u2028", "\\u2028"), ("\u2029", "\\u2029"))
+
+
+def _datetime(value):
+    representation = value.isoformat()
+    if representation.endswith("+00:00"):
+        representation = representation[:-6] + "Z"
+    return representation
+
+
+CONVERTERS = {
+    decimal.Decimal: float,
+    datetime.datetime: _datetime,
+    datetime.date: datetime.date.isoformat,
+    datetime.timedelta: lambda value: str(value.total_seconds()),
+    uuid.UUID: str,
+}
+
+
+def default(value):
+    """JSON friendly form of a value the encoder has no type for"""
+
+    converter = CONVERTERS.get(type(value))
+    if converter is not None:
+        return converter(value)
+    if isinstance(value, Promise):
+        return force_str(value)
+    # subclasses, times, querysets, generators and the rest
+    return DRF_ENCODER.default(value)
+
+
+DRF_ENCODER = encoders.JSONEncoder()
+STDLIB_ENCODER = json.JSONEncoder(
+    ensure_ascii=False,
+    allow_nan=not renderers.JSONRenderer.strict,
+    separators=(",", ":"),
+    default=default,
+)
+
+
+def dumps(data):
+    """Compact UTF-8 JSON of ``data``"""
+
+    if orjson is not None:
+        try:
+            content = orjson.dumps(
+                data, default=default, option=orjson.OPT_UTC_Z
+            )
+        except orjson.JSONEncodeError:
+            # integers past 64 bits, non string keys: the stdlib copes
+            pass
+        else:
+            if b"\xe2\x80\xa8" in content or b"\xe2\x80\xa9" in content:
+                content = content.decode()
+                for character, escaped in ESCAPES:
+                    content = content.replace(character, escaped)
+                content = content.encode()
+            return content
+
+    content = STDLIB_ENCODER.encode(data)
+    for character, escaped in ESCAPES:
+        if character in content:
+            content = content.replace(character, escaped)
+    return content.encode()
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """DRF's JSON renderer through ``dumps``"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if (
+            self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+            is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
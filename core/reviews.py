@@ -0,0 +1,187 @@
+"""
+Review operations
+
+Every product carries its review aggregates: ``rating_count``,
+``rating_sum``, ``rating_average`` and one ``rating_<n>_count`` per star.
+Creating, editing or deleting a review changes them with a single
+``UPDATE`` of ``F()`` expressions in the same transaction as the review
+row, so concurrent reviews never lose a count and pages read the
+aggregates without touching the review table.
+
+Bulk writes (``bulk_create``, the admin, fixtures) bypass this module;
+``recompute_ratings`` rebuilds the aggregates from the review rows.
+"""
+
+import operator
+from collections import Counter
+from functools import reduce
+from django.db import transaction
+from django.db.models import (
+    Count,
+    F,
+    FloatField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+from core.cache import product_detail_cache
+from core.images import upsert_images
+from core.models import Product, Review
+
+RATINGS = range(1, 6)
+RATING_FIELDS = (
+    "rating_count",
+    "rating_sum",
+    "rating_average",
+    *(f"rating_{rating}_count" for rating in RATINGS),
+)
+
+
+def _adjust(product_id, added=(), removed=()):
+    """Apply added and removed ratings to the product's aggregates"""
+
+    count = len(added) - len(removed)
+    total = sum(added) - sum(removed)
+    stars = Counter(added)
+    stars.subtract(removed)
+    # the right hand side reads the row before the update
+    average = Coalesce(
+        Cast(F("rating_sum") + total, FloatField())
+        / NullIf(F("rating_count") + count, 0),
+        0.0,
+        output_field=FloatField(),
+    )
+    Product.objects.filter(pk=product_id).update(
+        rating_count=F("rating_count") + count,
+        rating_sum=F("rating_sum") + total,
+        rating_average=average,
+        **{
+            f"rating_{rating}_count": F(f"rating_{rating}_count") + delta
+            for rating, delta in stars.items()
+            if delta
+        },
+        updated_at=timezone.now(),
+    )
+    # a read before the commit would cache the old row under a new version
+    transaction.on_commit(lambda: product_detail_cache.invalidate(product_id))
+
+
+@transaction.atomic
+def create_review(product, reviewer, rating, comment, images=()):
+    """Add a review, with image urls, and count it in the aggregates"""
+
+    review = Review.objects.create(
+        product=product, reviewer=reviewer, rating=rating, comment=comment
+    )
+    if images:
+        review.images.set(upsert_images(images)[0].values())
+    _adjust(product.pk, added=[rating])
+    return review
+
+
+@transaction.atomic
+def update_review(review, **changes):
+    """Change a review, moving its rating between histogram buckets"""
+
+    # the stored rating, the instance may be stale
+    previous = (
+        Review.objects.select_for_update()
+        .values_list("rating", flat=True)
+        .get(pk=review.pk)
+    )
+    images = changes.pop("images", None)
+    for name, value in changes.items():
+        setattr(review, name, value)
+    review.save()
+    if images is not None:
+        review.images.set(upsert_images(images)[0].values())
+    if review.rating != previous:
+        _adjust(review.product_id, added=[review.rating], removed=[previous])
+    return review
+
+
+@transaction.atomic
+def delete_review(review):
+    """Delete a review and remove it from the product's aggregates"""
+
+    rating = (
+        Review.objects.select_for_update()
+        .filter(pk=review.pk)
+        .values_list("rating", flat=True)
+        .first()
+    )
+    if rating is None:
+        return
+    review.delete()
+    _adjust(review.product_id, removed=[rating])
+
+
+def _review_aggregate(expression):
+    """``expression`` over the reviews of the outer product row"""
+
+    reviews = (
+        Review.objects.filter(product=OuterRef("pk"))
+        .order_by()
+        .values("product")
+        .annotate(value=expression)
+        .values("value")
+    )
+    return Coalesce(Subquery(reviews), 0)
+
+
+def recompute_ratings(product_ids=None, batch_size=1000):
+    """
+    Rebuild the aggregates of ``product_ids`` (all products by default)
+    from their reviews and return how many products had drifted.
+
+    Each batch is rewritten by one ``UPDATE`` whose values are subqueries
+    over the review table, so a review written concurrently is either
+    counted by the statement or applies its ``F()`` change after it,
+    never lost in between.
+    """
+
+    products = Product.objects.order_by("pk").values_list("pk", flat=True)
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    count = _review_aggregate(Count("pk"))
+    total = _review_aggregate(Sum("rating"))
+    values = {
+        "rating_count": count,
+        "rating_sum": total,
+        "rating_average": Coalesce(
+            Cast(total, FloatField()) / NullIf(count, 0),
+            0.0,
+            output_field=FloatField(),
+        ),
+        **{
+            f"rating_{rating}_count": _review_aggregate(
+                Count("pk", filter=Q(rating=rating))
+            )
+            for rating in RATINGS
+        },
+    }
+    drifted = reduce(
+        operator.or_, (~Q(**{name: value}) for name, value in values.items())
+    )
+
+    changed = 0
+    last = 0
+    while True:
+        batch = list(products.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            return changed
+        last = batch[-1]
+        stale = list(
+            Product.objects.filter(drifted, pk__in=batch).values_list(
+                "pk", flat=True
+            )
+        )
+        if stale:
+            Product.objects.filter(pk__in=stale).update(
+                **values, updated_at=timezone.now()
+            )
+            product_detail_cache.invalidate(*stale)
+        changed += len(stale)
@@ -0,0 +1,368 @@
+"""
+Full-text product search
+
+Products are indexed over their name, description, tags, specifications,
+brand and category names and ranked with BM25. On SQLite builds with
+FTS5 the index is a virtual table (created on ``migrate``) that shares
+the transaction with the catalog write. Elsewhere a pure-Python inverted
+index is built per process on first use and kept current by the signal
+handlers in ``core.signals``; as those only run in the writing process,
+each process also rebuilds its index when the counts and latest
+``updated_at`` of the indexed tables no longer match the ones it was
+built from, checked at most every ``SEARCH_INDEX_CHECK_INTERVAL`` seconds.
+"""
+
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import F
+from core.conditional import fingerprint
+from core.models import (
+    Brand,
+    Category,
+    Product,
+    ProductTag,
+    Specification,
+    Tag,
+)
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+# BM25 column weights, in index column order
+FIELD_WEIGHTS = {
+    "name": 10.0,
+    "description": 1.0,
+    "tags": 4.0,
+    "specifications": 2.0,
+    "brand": 3.0,
+    "category": 3.0,
+}
+
+
+def tokenize(text):
+    """Lower-cased alphanumeric tokens, matching FTS5's unicode61"""
+
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def iter_documents(product_ids=None, batch_size=1000):
+    """
+    Yield ``(product_id, {field: text})`` for indexing.
+
+    Documents are built from ``values_list`` queries, three per batch,
+    without instantiating models.
+    """
+
+    products = Product.objects.order_by("pk")
+    if product_ids is not None:
+        products = products.filter(pk__in=list(product_ids))
+    rows = products.values_list(
+        "pk", "base_name", "description", "brand__name", "category__name"
+    )
+    last_pk = 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        last_pk = batch[-1][0]
+        pks = [row[0] for row in batch]
+        tags, specs = defaultdict(list), defaultdict(list)
+        for pk, tag in ProductTag.objects.filter(product__in=pks).values_list(
+            "product_id", "tag__name"
+        ):
+            tags[pk].append(tag)
+        for pk, name, value in Specification.objects.filter(
+            product__in=pks
+        ).values_list("product_id", "name", "value"):
+            specs[pk].append(f"{name} {value}")
+        for pk, name, description, brand, category in batch:
+            yield pk, {
+                "name": name,
+                "description": description,
+                "tags": " ".join(tags[pk]),
+                "specifications": " ".join(specs[pk]),
+                "brand": brand or "",
+                "category": category or "",
+            }
+
+
+def catalog_version():
+    """
+    Counts and latest ``updated_at`` of every table search documents are
+    built from, in one query; a change in any of them changes the result.
+    """
+
+    return fingerprint(
+        Product.objects.all(),
+        Specification.objects.all(),
+        Tag.objects.all(),
+        # links are never updated, only added and removed
+        ProductTag.objects.annotate(updated_at=F("created_at")),
+        Brand.objects.all(),
+        Category.objects.all(),
+    )
+
+
+class FTS5SearchBackend:
+    """BM25 search over an SQLite FTS5 table keyed by product rowid"""
+
+    table = "core_product_search"
+
+    def ensure_schema(self, using_connection=None):
+        with (using_connection or connection).cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                f"USING fts5({', '.join(FIELD_WEIGHTS)})"
+            )
+
+    def index(self, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        fields = list(FIELD_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE rowid = %s",
+                [(pk,) for pk, _ in documents],
+            )
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, {', '.join(fields)}) "
+                f"VALUES (%s, {', '.join(['%s'] * len(fields))})",
+                [
+                    (pk, *(document[field] for field in fields))
+                    for pk, document in documents
+                ],
+            )
+
+    def remove(self, product_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE rowid = %s",
+                [(pk,) for pk in product_ids],
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def search(self, query, limit=20):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # quoted terms keep user input out of the FTS5 query syntax
+        match = " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+        weights = ", ".join(str(weight) for weight in FIELD_WEIGHTS.values())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, bm25({self.table}, {weights}) AS rank "
+                f"FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY rank LIMIT %s",
+                [match, limit],
+            )
+            return [(pk, -rank) for pk, rank in cursor.fetchall()]
+
+
+class InMemorySearchBackend:
+    """BM25F over a per-process inverted index, built on first search"""
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.built = False
+        self.version = None
+        self.checked = 0.0
+        self.postings = defaultdict(dict)
+        self.terms = {}
+        self.lengths = {}
+        self.total_length = 0.0
+
+    def _add(self, pk, document):
+        frequencies = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(document[field]):
+                frequencies[term] += weight
+        for term, frequency in frequencies.items():
+            self.postings[term][pk] = frequency
+        self.terms[pk] = set(frequencies)
+        length = sum(frequencies.values())
+        self.lengths[pk] = length
+        self.total_length += length
+
+    def _remove(self, pk):
+        length = self.lengths.pop(pk, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.terms.pop(pk):
+            del self.postings[term][pk]
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def build(self, documents=None):
+        if documents is None:
+            documents = iter_documents()
+        with self._lock:
+            # taken first, so writes made during the build show as stale
+            self.version = catalog_version()
+            self.checked = time.monotonic()
+            self.postings.clear()
+            self.terms.clear()
+            self.lengths.clear()
+            self.total_length = 0.0
+            for pk, document in documents:
+                self._add(pk, document)
+            self.built = True
+
+    def index(self, documents):
+        with self._lock:
+            # not built yet: the first search loads everything anyway
+            if not self.built:
+                return
+            for pk, document in documents:
+                self._remove(pk)
+                self._add(pk, document)
+
+    def remove(self, product_ids):
+        with self._lock:
+            for pk in product_ids:
+                self._remove(pk)
+
+    def clear(self):
+        self.build(documents=[])
+
+    def is_stale(self):
+        """Whether other processes changed the catalog since the build"""
+
+        interval = getattr(settings, "SEARCH_INDEX_CHECK_INTERVAL", 5.0)
+        now = time.monotonic()
+        if now - self.checked < interval:
+            return False
+        self.checked = now
+        return catalog_version() != self.version
+
+    def search(self, query, limit=20):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            if not self.built or self.is_stale():
+                self.build()
+            total = len(self.lengths)
+            if not total:
+                return []
+            average = self.total_length / total
+            scores = Counter()
+            for term in terms:
+                documents = self.postings.get(term)
+                if not documents:
+                    continue
+                idf = math.log(
+                    1 + (total - len(documents) + 0.5) / (len(documents) + 0.5)
+                )
+                for pk, frequency in documents.items():
+                    norm = self.k1 * (
+                        1 - self.b + self.b * self.lengths[pk] / average
+                    )
+                    scores[pk] += (
+                        idf * frequency * (self.k1 + 1) / (frequency + norm)
+                    )
+        return scores.most_common(limit)
+
+
+fts5_backend = FTS5SearchBackend()
+in_memory_backend = InMemorySearchBackend()
+
+# database NAME -> whether its FTS5 table exists, checked once per process
+_fts5_databases = {}
+
+
+def _has_fts5_table(using_connection):
+    if using_connection.vendor != "sqlite":
+        return False
+    name = str(using_connection.settings_dict["NAME"])
+    if name not in _fts5_databases:
+        with using_connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = %s",
+                [fts5_backend.table],
+            )
+            _fts5_databases[name] = cursor.fetchone() is not None
+    return _fts5_databases[name]
+
+
+def get_backend():
+    """Return the FTS5 backend when its table exists, else the fallback"""
+
+    if _has_fts5_table(connection):
+        return fts5_backend
+    return in_memory_backend
+
+
+def create_search_schema(using_connection):
+    """Create the FTS5 table where SQLite supports it"""
+
+    if using_connection.vendor != "sqlite":
+        return
+    name = str(using_connection.settings_dict["NAME"])
+    try:
+        fts5_backend.ensure_schema(using_connection)
+    except DatabaseError:
+        # SQLite built without FTS5: the in-memory index takes over
+        _fts5_databases[name] = False
+    else:
+        _fts5_databases[name] = True
+
+
+def reindex_products(product_ids):
+    """Refresh the search documents of ``product_ids``"""
+
+    product_ids = list(product_ids)
+    if product_ids:
+        get_backend().index(iter_documents(product_ids))
+
+
+def reindex_catalog(batch_size=1000, **filters):
+    """
+    Refresh the search documents of the products matching ``filters``,
+    ``batch_size`` products at a time.
+    """
+
+    backend = get_backend()
+    product_ids = (
+        Product.objects.filter(**filters)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    last_pk = 0
+    while True:
+        batch = list(product_ids.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        last_pk = batch[-1]
+        backend.index(iter_documents(batch, batch_size=batch_size))
+
+
+def rebuild_index(batch_size=1000):
+    """Rebuild the whole index, returning the number of products"""
+
+    backend = get_backend()
+    if backend is in_memory_backend:
+        backend.build()
+        return len(backend.lengths)
+    backend.clear()
+    total, batch = 0, []
+    for document in iter_documents(batch_size=batch_size):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            backend.index(batch)
+            total += len(batch)
+            batch = []
+    backend.index(batch)
+    return total + len(batch)
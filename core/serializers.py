@@ -2,8 +2,13 @@
 Serializers for Core App Models
 """
 
-from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework import exceptions, serializers
+from rest_framework.throttling import BaseThrottle
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
+from core import blacklist, login
+from core.images import upsert_images
 from .models import (
     User,
     Product,
@@ -16,9 +21,35 @@ from .models import (
     Faq,
     Carousel,
     Image,
+    CartItem,
+    Order,
+    OrderItem,
+    Review,
 )
 
 
+class SparseFieldsetMixin:
+    """
+    Restrict serialized fields with a ``?fields=a,b`` query parameter.
+
+    Unknown names are ignored; without the parameter every field is kept.
+    """
+
+    fields_query_param = "fields"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None:
+            return
+        requested = request.query_params.get(self.fields_query_param)
+        if not requested:
+            return
+        keep = {name.strip() for name in requested.split(",")}
+        for name in set(self.fields) - keep:
+            self.fields.pop(name)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -47,27 +78,57 @@ class RegisterSerializer(serializers.ModelSerializer):
 class TokenObtainSerializer(serializers.Serializer):
     """Request model for returning access token information"""
 
+    # the user columns the login reads, served by the username index
+    user_fields = ("id", "username", "email", "is_admin", "is_active")
+
     username = serializers.CharField()
-    password = serializers.CharField()
+    password = serializers.CharField(write_only=True)
+
+    def client_address(self):
+        # X-Forwarded-For behind NUM_PROXIES proxies, like DRF throttles
+        request = self.context.get("request")
+        return BaseThrottle().get_ident(request) if request else None
+
+    def validate(self, attrs):
+        username = attrs["username"]
+        wait = login.throttle_wait(username, self.client_address())
+        if wait:
+            raise exceptions.Throttled(wait=wait)
+
+        user = (
+            User.objects.only(*self.user_fields, "password")
+            .filter(username=username)
+            .first()
+        )
+        # unknown users pay for a dummy hash, see core.login
+        valid = login.password_checker.check(user, attrs["password"])
+        if not valid or not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                "Invalid username or password", code="no_active_account"
+            )
+        refresh = RefreshToken.for_user(user)
+        return {
+            "refresh": str(refresh),
+            "access": str(refresh.access_token),
+            "user": UserSerializer(user).data,
+        }
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """Refresh that refuses, and after rotation records, blacklisted jtis"""
+
+    token_class = blacklist.RefreshToken
+
+
+class TokenVerifySerializer(jwt_serializers.TokenVerifySerializer):
+    """Verify that also reports blacklisted tokens as invalid"""
 
     def validate(self, attrs):
-        username = attrs.get("username")
-        password = attrs.get("password")
-
-        print("password: ", password)
-        user = User.objects.filter(username=username).first()
-        print("User password: ", user.password)
-        print(user)
-        print("Checking password", user.check_password(password))
-        if user and user.check_password(password):
-            refresh = RefreshToken.for_user(user)
-            return {
-                "refresh": str(refresh),
-                "access": str(refresh.access_token),
-                "user": UserSerializer(user).data,
-            }
-        else:
-            raise serializers.ValidationError("Invalid username or password")
+        token = UntypedToken(attrs["token"])
+        jti = token.get(jwt_settings.JTI_CLAIM)
+        if jti and jti in blacklist.token_blacklist:
+            raise serializers.ValidationError("Token is blacklisted")
+        return {}
 
 
 class BrandSerializer(serializers.ModelSerializer):
@@ -87,12 +148,16 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class ImageSerializer(serializers.ModelSerializer):
-    """Response model for Image"""
+    """Response model for Image, writes reuse the registered image"""
 
     class Meta:
         model = Image
         fields = ("url",)
 
+    def create(self, validated_data):
+        ids, _ = upsert_images([validated_data["url"]])
+        return Image.objects.get(pk=ids[validated_data["url"]])
+
 
 class ProductSerializer(serializers.ModelSerializer):
     """Response model for Product"""
@@ -227,6 +292,29 @@ class ProductCarouselSerializer(serializers.ModelSerializer):
         fields = ("image", "title", "description")
 
 
+class ProductListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Response model for a product in the product list view."""
+
+    brand_name = serializers.CharField(source="brand.name", read_only=True)
+    category_name = serializers.CharField(
+        source="category.name", read_only=True, default=None
+    )
+    lead_image = serializers.URLField(read_only=True, default=None)
+
+    class Meta:
+        model = Product
+        fields = (
+            "id",
+            "base_name",
+            "base_price",
+            "brand_name",
+            "category_name",
+            "lead_image",
+            "rating_average",
+            "rating_count",
+        )
+
+
 class ProductDetailSerializer(serializers.ModelSerializer):
     """Response model for ProductDetail"""
 
@@ -242,3 +330,157 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = "__all__"
+
+
+# reviews
+
+
+class ReviewSerializer(serializers.ModelSerializer):
+    """Response model for a product review."""
+
+    reviewer = serializers.CharField(
+        source="reviewer.username", read_only=True
+    )
+    images = ImageSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Review
+        fields = (
+            "id",
+            "reviewer",
+            "rating",
+            "comment",
+            "images",
+            "created_at",
+            "updated_at",
+        )
+
+
+class ReviewWriteSerializer(serializers.Serializer):
+    """Request body to write a review, images are given by url"""
+
+    rating = serializers.IntegerField(min_value=1, max_value=5)
+    comment = serializers.CharField(max_length=5000)
+    images = serializers.ListField(
+        child=serializers.URLField(max_length=999),
+        max_length=10,
+        required=False,
+    )
+
+
+# cart
+
+
+class CartVariantSerializer(serializers.ModelSerializer):
+    """Response model for the variant of a cart line."""
+
+    product_id = serializers.IntegerField(read_only=True)
+    product_name = serializers.CharField(
+        source="product.base_name", read_only=True
+    )
+
+    class Meta:
+        model = Variant
+        fields = (
+            "id",
+            "name",
+            "price",
+            "color",
+            "size",
+            "product_id",
+            "product_name",
+        )
+
+
+class CartItemSerializer(serializers.ModelSerializer):
+    """Response model for a cart line."""
+
+    variant = CartVariantSerializer(source="product_variant", read_only=True)
+    line_total = serializers.DecimalField(
+        max_digits=12, decimal_places=2, read_only=True
+    )
+
+    class Meta:
+        model = CartItem
+        fields = ("id", "variant", "quantity", "line_total")
+
+
+class CartSerializer(serializers.Serializer):
+    """Response model for a cart with its computed total."""
+
+    id = serializers.IntegerField()
+    items = CartItemSerializer(many=True)
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class CartItemCreateSerializer(serializers.Serializer):
+    """Request body to add a variant to the cart"""
+
+    variant = serializers.PrimaryKeyRelatedField(
+        queryset=Variant.objects.all()
+    )
+    quantity = serializers.IntegerField(min_value=1, max_value=999, default=1)
+
+
+class CartItemQuantitySerializer(serializers.Serializer):
+    """Request body to set a cart line quantity, 0 removes the line"""
+
+    quantity = serializers.IntegerField(min_value=0, max_value=999)
+
+
+# orders
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    """Response model for an order line, priced when ordered."""
+
+    variant = CartVariantSerializer(source="product_variant", read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ("id", "variant", "quantity", "price")
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    """Response model for an order with its lines."""
+
+    items = OrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = (
+            "id",
+            "status",
+            "total_amount",
+            "shipping_address",
+            "payment_status",
+            "payment_mode",
+            "created_at",
+            "items",
+        )
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Response model for an order in the order history list."""
+
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = (
+            "id",
+            "status",
+            "total_amount",
+            "payment_status",
+            "item_count",
+            "created_at",
+        )
+
+
+class CheckoutSerializer(serializers.Serializer):
+    """Request body to place an order from the cart"""
+
+    shipping_address = serializers.CharField()
+    payment_mode = serializers.ChoiceField(
+        choices=Order.PAYMENT_MODES, default="qrcode"
+    )
@@ -0,0 +1,221 @@
+"""
+Model signal handlers for Core App
+
+Keeps derived state (cached product payloads, the search index, the tag
+cloud, cached JWT users) in step with writes.
+Queryset ``update()`` and ``bulk_create()`` bypass these handlers;
+callers using them must invalidate explicitly.
+"""
+
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from core import search
+from core.authentication import token_cache
+from core.db import apply_sqlite_pragmas, install_query_observer
+from core.cache import product_detail_cache
+from core.models import (
+    Brand,
+    Category,
+    Product,
+    Variant,
+    Image,
+    Specification,
+    Compatibility,
+    DeliveryTimeStatus,
+    Faq,
+    Carousel,
+    ProductTag,
+    Tag,
+    User,
+)
+from core.tags import invalidate_tag_cloud
+
+PRODUCT_CHILDREN = (
+    Variant,
+    Specification,
+    Compatibility,
+    DeliveryTimeStatus,
+    Faq,
+    Carousel,
+)
+
+
+def image_product_ids(image_pks):
+    """Return ids of products whose variants show any of ``image_pks``"""
+
+    return Variant.objects.filter(images__in=image_pks).values_list(
+        "product_id", flat=True
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product(sender, instance, **kwargs):
+    product_detail_cache.invalidate(instance.pk)
+
+
+def invalidate_product_child(sender, instance, **kwargs):
+    product_detail_cache.invalidate(instance.product_id)
+
+
+for child in PRODUCT_CHILDREN:
+    post_save.connect(
+        invalidate_product_child,
+        sender=child,
+        dispatch_uid=f"product_detail_cache_save_{child.__name__}",
+    )
+    post_delete.connect(
+        invalidate_product_child,
+        sender=child,
+        dispatch_uid=f"product_detail_cache_delete_{child.__name__}",
+    )
+
+
+@receiver(post_save, sender=Image)
+def invalidate_image(sender, instance, created, **kwargs):
+    if not created:
+        product_detail_cache.invalidate(*image_product_ids([instance.pk]))
+
+
+@receiver(pre_delete, sender=Image)
+def invalidate_deleted_image(sender, instance, **kwargs):
+    # through rows are gone by post_delete, so resolve products first
+    product_detail_cache.invalidate(*image_product_ids([instance.pk]))
+
+
+@receiver(m2m_changed, sender=Variant.images.through)
+def invalidate_variant_images(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if reverse:
+        # instance is an Image, pk_set holds Variant ids
+        if action in ("post_add", "post_remove"):
+            product_detail_cache.invalidate(
+                *Variant.objects.filter(pk__in=pk_set).values_list(
+                    "product_id", flat=True
+                )
+            )
+        elif action == "pre_clear":
+            product_detail_cache.invalidate(*image_product_ids([instance.pk]))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        product_detail_cache.invalidate(instance.product_id)
+
+
+@receiver(m2m_changed, sender=Variant.images.through)
+def touch_variant_images(sender, instance, action, reverse, pk_set, **kwargs):
+    # the product detail ETag reads MAX(updated_at) of the variants and
+    # their images, which swapping one linked image for another may leave
+    # as it was, so a change of links is a change of the variant
+    if not reverse:
+        if action not in ("post_add", "post_remove", "post_clear"):
+            return
+        variants = Variant.objects.filter(pk=instance.pk)
+    elif action in ("post_add", "post_remove"):
+        variants = Variant.objects.filter(pk__in=pk_set)
+    elif action == "pre_clear":
+        variants = Variant.objects.filter(images=instance.pk)
+    else:
+        return
+    variants.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog(sender, instance, **kwargs):
+    # brand and category are nested in every product of theirs; one
+    # catalog-wide bump is cheaper than touching each product
+    product_detail_cache.invalidate_all()
+
+
+@receiver(connection_created)
+def tune_connection(sender, connection, **kwargs):
+    apply_sqlite_pragmas(connection)
+    install_query_observer(connection)
+
+
+@receiver(post_migrate)
+def create_search_schema(sender, using, **kwargs):
+    if sender.name == "core":
+        search.create_search_schema(connections[using])
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search.reindex_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.get_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Specification)
+@receiver(post_delete, sender=Specification)
+def index_product_text(sender, instance, **kwargs):
+    search.reindex_products([instance.product_id])
+
+
+@receiver(post_save, sender=ProductTag)
+@receiver(post_delete, sender=ProductTag)
+def retag_product(sender, instance, **kwargs):
+    search.reindex_products([instance.product_id])
+    invalidate_tag_cloud()
+
+
+@receiver(m2m_changed, sender=ProductTag)
+def retag_products(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # instance is a Product, pk_set holds Tag ids
+        if action in ("post_add", "post_remove", "post_clear"):
+            search.reindex_products([instance.pk])
+            invalidate_tag_cloud()
+        return
+    if action == "pre_clear":
+        # the links are gone by post_clear, so remember the products
+        instance._cleared_products = list(
+            instance.products.values_list("pk", flat=True)
+        )
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if action == "post_clear":
+            pk_set = instance.__dict__.pop("_cleared_products", [])
+        search.reindex_products(pk_set)
+        invalidate_tag_cloud()
+
+
+@receiver(post_save, sender=Tag)
+def rename_tag(sender, instance, created, **kwargs):
+    if not created:
+        search.reindex_products(instance.products.values_list("pk", flat=True))
+        invalidate_tag_cloud()
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+def index_catalog_products(
+    sender, instance, created, update_fields=None, **kwargs
+):
+    if created or (update_fields is not None and "name" not in update_fields):
+        return
+    # every product of the brand or category, batched once the edit commits
+    field = "brand" if sender is Brand else "category"
+    transaction.on_commit(
+        lambda: search.reindex_catalog(**{field: instance.pk})
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user(sender, instance, **kwargs):
+    token_cache.invalidate_user(getattr(instance, jwt_settings.USER_ID_FIELD))
@@ -0,0 +1,485 @@
+"""
+Synthetic catalog generator
+
+Builds a deterministic catalog of any size for local benchmarking: the
+same seed always produces the same rows. Products are written in
+chunks, each in its own transaction with one ``bulk_create`` per table
+(including the many-to-many through tables), so a million-row catalog
+fits in constant memory.
+
+Distributions are skewed the way a real shop is: a few brands,
+categories and tags account for most products, most products have a
+handful of reviews while a few have hundreds, ratings lean positive and
+a fifth of variants are out of stock.
+"""
+
+import random
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from core import search
+from core.models import (
+    User,
+    Brand,
+    Category,
+    Product,
+    Variant,
+    Specification,
+    Compatibility,
+    DeliveryTimeStatus,
+    Faq,
+    Carousel,
+    Review,
+    Cart,
+    CartItem,
+    Order,
+    OrderItem,
+)
+from core.images import upsert_images
+from core.reviews import recompute_ratings
+from core.tags import link_tags
+
+ADJECTIVES = (
+    "Classic",
+    "Compact",
+    "Deluxe",
+    "Ergonomic",
+    "Foldable",
+    "Heavy Duty",
+    "Minimal",
+    "Modern",
+    "Portable",
+    "Rustic",
+    "Slim",
+    "Vintage",
+)
+MATERIALS = (
+    "Oak",
+    "Walnut",
+    "Teak",
+    "Bamboo",
+    "Steel",
+    "Aluminium",
+    "Leather",
+    "Glass",
+    "Marble",
+    "Polymer",
+)
+NOUNS = (
+    "Table",
+    "Desk",
+    "Chair",
+    "Stool",
+    "Shelf",
+    "Cabinet",
+    "Lamp",
+    "Organizer",
+    "Drawer",
+    "Stand",
+    "Bench",
+    "Rack",
+)
+COLORS = (
+    "Black",
+    "White",
+    "Grey",
+    "Brown",
+    "Natural",
+    "Red",
+    "Blue",
+    "Green",
+)
+SIZES = ("XS", "S", "M", "L", "XL")
+SPECIFICATIONS = {
+    "Material": MATERIALS,
+    "Finish": ("Matte", "Gloss", "Satin", "Oiled"),
+    "Weight": ("500g", "1.2kg", "3kg", "7.5kg", "12kg"),
+    "Warranty": ("6 months", "1 year", "2 years", "5 years"),
+    "Assembly": ("Required", "Not required"),
+    "Origin": ("India", "Vietnam", "Italy", "Germany", "Mexico"),
+}
+TAGS = (
+    "bestseller",
+    "new",
+    "sale",
+    "eco",
+    "premium",
+    "gift",
+    "office",
+    "home",
+    "kids",
+    "outdoor",
+    "handmade",
+    "limited",
+    "clearance",
+    "bundle",
+    "trending",
+)
+DELIVERY_TIMES = ("1-2 days", "3-5 days", "5-7 days", "2 weeks")
+ORDER_STATUSES = [status for status, _ in Order.STATUS_CHOICES]
+ORDER_STATUS_WEIGHTS = (10, 5, 10, 70, 5)
+RATING_WEIGHTS = (4, 4, 10, 30, 52)
+IMAGE_HOST = "https://images.example.com"
+
+
+def zipf_weights(count, exponent=1.1):
+    """Weights for ``count`` items where the n-th is ~1/n^s as likely"""
+
+    return [1 / rank**exponent for rank in range(1, count + 1)]
+
+
+class SyntheticCatalog:
+    """Generate ``products`` products and their related rows"""
+
+    def __init__(
+        self,
+        products,
+        seed=0,
+        batch_size=1000,
+        users=None,
+        orders_per_product=0.5,
+        cart_ratio=0.3,
+    ):
+        self.total = products
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.batch_size = batch_size
+        self.user_count = users or max(1, products // 20)
+        self.orders_per_product = orders_per_product
+        self.cart_ratio = cart_ratio
+        self.counts = dict.fromkeys(
+            (
+                "products",
+                "variants",
+                "images",
+                "reviews",
+                "orders",
+                "cart_items",
+            ),
+            0,
+        )
+        # uniform sample of variants seen so far, for filling carts
+        self.variant_sample = []
+        self.variants_seen = 0
+
+    def run(self):
+        """Write the catalog, yielding the counts after every chunk"""
+
+        with transaction.atomic():
+            self.create_users()
+            self.create_taxonomy()
+        done = 0
+        while done < self.total:
+            size = min(self.batch_size, self.total - done)
+            with transaction.atomic():
+                self.write_chunk(done, size)
+            done += size
+            yield dict(self.counts)
+        with transaction.atomic():
+            self.create_carts()
+        yield dict(self.counts)
+
+    def create_users(self):
+        # hashing is deliberately slow, so every shopper shares one hash
+        password = make_password(f"shopper-{self.seed}")
+        names = [f"shopper{index}" for index in range(self.user_count)]
+        User.objects.bulk_create(
+            [
+                User(
+                    username=name,
+                    email=f"{name}@example.com",
+                    password=password,
+                )
+                for name in names
+            ],
+            ignore_conflicts=True,
+        )
+        by_name = dict(
+            User.objects.filter(username__in=names).values_list(
+                "username", "pk"
+            )
+        )
+        self.users = [by_name[name] for name in names]
+
+    def create_taxonomy(self):
+        rng = self.rng
+        category_count = min(60, max(5, self.total // 2000))
+        brand_count = min(500, max(10, self.total // 200))
+        self.categories = [
+            category.pk
+            for category in Category.objects.bulk_create(
+                [
+                    Category(
+                        name=f"{rng.choice(MATERIALS)} {noun}s {index}",
+                        description=f"All kinds of {noun.lower()}s",
+                    )
+                    for index, noun in enumerate(
+                        NOUNS * (category_count // len(NOUNS) + 1)
+                    )
+                    if index < category_count
+                ]
+            )
+        ]
+        self.brands = [
+            brand.pk
+            for brand in Brand.objects.bulk_create(
+                [
+                    Brand(
+                        name=f"{rng.choice(MATERIALS)}works {index}",
+                        description="Synthetic brand",
+                    )
+                    for index in range(brand_count)
+                ]
+            )
+        ]
+        self.category_weights = zipf_weights(category_count)
+        self.brand_weights = zipf_weights(brand_count)
+        self.tag_weights = zipf_weights(len(TAGS))
+
+    def price(self, low=5, high=2000):
+        value = min(max(self.rng.lognormvariate(4, 0.9), low), high)
+        return Decimal(int(value)) + Decimal("0.99")
+
+    def write_chunk(self, start, size):
+        rng = self.rng
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    base_name=" ".join(
+                        (
+                            rng.choice(ADJECTIVES),
+                            rng.choice(MATERIALS),
+                            rng.choice(NOUNS),
+                        )
+                    ),
+                    description=(
+                        f"{rng.choice(ADJECTIVES)} piece in "
+                        f"{rng.choice(MATERIALS).lower()}, "
+                        f"item {start + index}"
+                    ),
+                    base_price=self.price(),
+                    category_id=rng.choices(
+                        self.categories, self.category_weights
+                    )[0],
+                    brand_id=rng.choices(self.brands, self.brand_weights)[0],
+                )
+                for index in range(size)
+            ]
+        )
+
+        images, variants, variant_images = [], [], []
+        children = {
+            Specification: [],
+            Compatibility: [],
+            DeliveryTimeStatus: [],
+            Faq: [],
+            Carousel: [],
+        }
+        tags = []
+        reviews, review_images = [], []
+        for index, product in enumerate(products, start=start):
+            urls = [
+                f"{IMAGE_HOST}/{self.seed}/p{index}-{number}.jpg"
+                for number in range(
+                    rng.choices((1, 2, 3, 4, 5), (25, 30, 25, 12, 8))[0]
+                )
+            ]
+            images.extend(urls)
+            count = rng.choices((1, 2, 3, 4, 5, 6), (30, 25, 20, 12, 8, 5))[0]
+            for color, size_name in rng.sample(
+                [(c, s) for c in COLORS for s in SIZES], count
+            ):
+                variants.append(
+                    Variant(
+                        product=product,
+                        name=f"{color} {size_name}",
+                        price=max(
+                            Decimal("1.99"),
+                            product.base_price + Decimal(rng.randint(-20, 20)),
+                        ),
+                        color=color,
+                        size=size_name,
+                        stock=(
+                            0 if rng.random() < 0.2 else rng.randint(1, 200)
+                        ),
+                    )
+                )
+                variant_images.append(
+                    rng.sample(urls, rng.randint(1, len(urls)))
+                )
+            for name in rng.sample(sorted(SPECIFICATIONS), rng.randint(2, 6)):
+                children[Specification].append(
+                    Specification(
+                        product=product,
+                        name=name,
+                        value=rng.choice(SPECIFICATIONS[name]),
+                    )
+                )
+            for noun in rng.sample(NOUNS, rng.randint(0, 3)):
+                children[Compatibility].append(
+                    Compatibility(
+                        product=product,
+                        name=product.base_name.split()[0],
+                        product_type=noun,
+                    )
+                )
+            children[DeliveryTimeStatus].append(
+                DeliveryTimeStatus(
+                    product=product,
+                    shipping_cost=Decimal(rng.choice((0, 2, 5, 10)))
+                    + Decimal("0.99"),
+                    estimated_delivery_time=rng.choice(DELIVERY_TIMES),
+                    additional_info="Standard shipping",
+                )
+            )
+            for number in range(rng.randint(0, 3)):
+                children[Faq].append(
+                    Faq(
+                        product=product,
+                        question=f"Question {number} about item {index}?",
+                        answer="Yes, it does.",
+                    )
+                )
+            for order, url in enumerate(urls[: rng.randint(1, 3)], 1):
+                children[Carousel].append(
+                    Carousel(
+                        product=product,
+                        image=url,
+                        title=product.base_name,
+                        order=order,
+                    )
+                )
+            for tag in sorted(
+                set(rng.choices(TAGS, self.tag_weights, k=rng.randint(1, 5)))
+            ):
+                tags.append((product.pk, tag))
+            # Pareto: mostly a few reviews, occasionally hundreds
+            for _ in range(min(int(rng.paretovariate(1.2)) - 1, 300)):
+                reviews.append(
+                    Review(
+                        product=product,
+                        reviewer_id=rng.choice(self.users),
+                        comment=f"Review of item {index}",
+                        rating=rng.choices((1, 2, 3, 4, 5), RATING_WEIGHTS)[0],
+                    )
+                )
+                review_images.append(urls[0] if rng.random() < 0.1 else None)
+
+        image_ids, _ = upsert_images(images)
+        variants = Variant.objects.bulk_create(variants)
+        Variant.images.through.objects.bulk_create(
+            [
+                Variant.images.through(
+                    variant_id=variant.pk, image_id=image_ids[url]
+                )
+                for variant, urls in zip(variants, variant_images)
+                for url in urls
+            ]
+        )
+        for model, rows in children.items():
+            model.objects.bulk_create(rows)
+        link_tags(tags)
+        reviews = Review.objects.bulk_create(reviews)
+        Review.images.through.objects.bulk_create(
+            [
+                Review.images.through(
+                    review_id=review.pk, image_id=image_ids[url]
+                )
+                for review, url in zip(reviews, review_images)
+                if url
+            ]
+        )
+        recompute_ratings([product.pk for product in products])
+        self.write_orders(variants, start, size)
+
+        for variant in variants:
+            self.sample_variant(variant)
+        search.reindex_products([product.pk for product in products])
+        self.counts["products"] += len(products)
+        self.counts["variants"] += len(variants)
+        self.counts["images"] += len(image_ids)
+        self.counts["reviews"] += len(reviews)
+
+    def sample_variant(self, variant, capacity=10_000):
+        """Reservoir sampling keeps a uniform sample of bounded size"""
+
+        self.variants_seen += 1
+        entry = (variant.pk, variant.price)
+        if len(self.variant_sample) < capacity:
+            self.variant_sample.append(entry)
+        else:
+            slot = self.rng.randrange(self.variants_seen)
+            if slot < capacity:
+                self.variant_sample[slot] = entry
+
+    def write_orders(self, variants, start, size):
+        rng = self.rng
+        # rounded on the running total so chunking does not drift
+        count = round((start + size) * self.orders_per_product) - round(
+            start * self.orders_per_product
+        )
+        if not count or not variants:
+            return
+        lines = []
+        for _ in range(count):
+            chosen = rng.sample(
+                variants, min(len(variants), rng.randint(1, 4))
+            )
+            lines.append([(variant, rng.randint(1, 3)) for variant in chosen])
+        orders = Order.objects.bulk_create(
+            [
+                Order(
+                    user_id=rng.choice(self.users),
+                    status=rng.choices(ORDER_STATUSES, ORDER_STATUS_WEIGHTS)[
+                        0
+                    ],
+                    total_amount=sum(
+                        variant.price * quantity for variant, quantity in items
+                    ),
+                    shipping_address=f"{rng.randint(1, 999)} Example Street",
+                    payment_status=rng.random() < 0.8,
+                    payment_mode=rng.choice(("cod", "qrcode")),
+                )
+                for items in lines
+            ]
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product_variant=variant,
+                    quantity=quantity,
+                    price=variant.price,
+                )
+                for order, items in zip(orders, lines)
+                for variant, quantity in items
+            ]
+        )
+        self.counts["orders"] += len(orders)
+
+    def create_carts(self):
+        rng = self.rng
+        if not self.variant_sample:
+            return
+        shoppers = rng.sample(
+            self.users, round(len(self.users) * self.cart_ratio)
+        )
+        Cart.objects.bulk_create(
+            [Cart(user_id=user) for user in shoppers], ignore_conflicts=True
+        )
+        carts = Cart.objects.filter(user__in=shoppers).values_list(
+            "pk", flat=True
+        )
+        items = [
+            CartItem(cart_id=cart, product_variant_id=pk, quantity=quantity)
+            for cart in sorted(carts)
+            for pk, quantity in (
+                (pk, rng.randint(1, 3))
+                for pk, _ in rng.sample(
+                    self.variant_sample,
+                    min(len(self.variant_sample), rng.randint(1, 5)),
+                )
+            )
+        ]
+        CartItem.objects.bulk_create(items, ignore_conflicts=True)
+        self.counts["cart_items"] += len(items)
@@ -0,0 +1,102 @@
+"""
+Tag operations
+
+A tag is one ``Tag`` row linked to its products through ``ProductTag``.
+Names are matched on their casefolded, whitespace collapsed form (see
+``Tag.key_for``), so "Ergonomic" and " ergonomic" are the same tag. The
+tag cloud (product counts per tag) is computed with one ``GROUP BY`` and
+cached until a link changes (see ``core.signals``).
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count
+from core.metrics import CACHE_REQUESTS
+from core.models import ProductTag, Tag
+
+TAG_CLOUD_KEY = "tag-cloud"
+# most used tags kept in the cached cloud
+TAG_CLOUD_SIZE = 200
+
+
+def resolve_tags(names):
+    """Return ``{key: Tag}`` for ``names``, creating the missing tags"""
+
+    wanted = {}
+    for name in names:
+        name = Tag.normalize_name(name)
+        if name:
+            wanted.setdefault(Tag.key_for(name), name)
+    if not wanted:
+        return {}
+    found = Tag.objects.in_bulk(list(wanted), field_name="key")
+    missing = [key for key in wanted if key not in found]
+    while missing:
+        # a concurrent import may create the same keys or take the slugs
+        slugs = Tag.free_slugs({key: wanted[key] for key in missing})
+        Tag.objects.bulk_create(
+            [
+                Tag(name=wanted[key], key=key, slug=slugs[key])
+                for key in missing
+            ],
+            ignore_conflicts=True,
+        )
+        found.update(Tag.objects.in_bulk(missing, field_name="key"))
+        missing = [key for key in missing if key not in found]
+    return found
+
+
+def link_tags(pairs):
+    """
+    Tag products from ``(product_id, name)`` pairs, skipping links that
+    already exist. Returns the number of distinct links asked for.
+    """
+
+    pairs = [
+        (product_id, Tag.normalize_name(name)) for product_id, name in pairs
+    ]
+    tags = resolve_tags(name for _, name in pairs)
+    links = {
+        (product_id, tags[Tag.key_for(name)].pk)
+        for product_id, name in pairs
+        if name
+    }
+    ProductTag.objects.bulk_create(
+        [
+            ProductTag(product_id=product_id, tag_id=tag_id)
+            for product_id, tag_id in sorted(links)
+        ],
+        ignore_conflicts=True,
+    )
+    invalidate_tag_cloud()
+    return len(links)
+
+
+def _cache():
+    return caches[getattr(settings, "TAG_CLOUD_CACHE_ALIAS", "default")]
+
+
+def tag_cloud(limit=None):
+    """The most used tags with their product counts, most used first"""
+
+    cloud = _cache().get(TAG_CLOUD_KEY)
+    CACHE_REQUESTS.inc(
+        cache="tag-cloud", result="miss" if cloud is None else "hit"
+    )
+    if cloud is None:
+        cloud = list(
+            Tag.objects.annotate(count=Count("product_tags"))
+            .filter(count__gt=0)
+            .order_by("-count", "slug")
+            .values("name", "slug", "count")[:TAG_CLOUD_SIZE]
+        )
+        _cache().set(
+            TAG_CLOUD_KEY,
+            cloud,
+            timeout=getattr(settings, "TAG_CLOUD_CACHE_TIMEOUT", 60 * 60),
+        )
+    return cloud[:limit]
+
+
+def invalidate_tag_cloud():
+    _cache().delete(TAG_CLOUD_KEY)
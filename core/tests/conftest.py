@@ -4,7 +4,12 @@ Database fixtures and API Client rquests
 
 import pytest
 
+from django.core.cache import caches
 from rest_framework.test import APIClient
+from core.authentication import token_cache
+from core.blacklist import token_blacklist
+from core.cache import product_detail_cache
+from core.login import login_buckets
 from core.models import (
     User,
     Brand,
@@ -27,6 +32,13 @@ def api_client():
     return APIClient()
 
 
+@pytest.fixture
+def auth_client(api_client, user):
+    """API client authenticated as ``user``"""
+    api_client.force_authenticate(user=user)
+    return api_client
+
+
 @pytest.fixture
 def user():
     """Create and return user instance"""
@@ -233,3 +245,22 @@ def product_detail_obj(product):
     )
 
     return product
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start each test with empty caches, as test databases reuse ids"""
+
+    for cache in caches.all():
+        cache.clear()
+    product_detail_cache.reset_stats()
+    token_cache.clear()
+    token_blacklist.reset()
+    login_buckets.clear()
+
+
+@pytest.fixture(autouse=True)
+def inline_blacklist_load(settings):
+    """Build the blacklist filter inline, inside the test's transaction"""
+
+    settings.TOKEN_BLACKLIST_BACKGROUND_LOAD = False
@@ -0,0 +1,160 @@
+"""
+Test the async catalog reads, /async/..., against their DRF counterparts,
+through the WSGI test client and through ``AsyncClient`` (ASGI)
+"""
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from core.metrics import HTTP_QUERIES
+from core.models import Product
+from core.tests.test_middleware import timings
+
+
+@pytest.fixture
+def products(category, brand):
+    """Five products, oldest first"""
+
+    return [
+        Product.objects.create(
+            base_name=f"product {index}",
+            description="listed product",
+            base_price=index + 1,
+            category=category,
+            brand=brand,
+        )
+        for index in range(5)
+    ]
+
+
+@pytest.mark.django_db
+def test_category_and_brand_reads_need_a_token(api_client, user, brand):
+    """Test catalog lookups answer like the DRF views, for users only"""
+
+    url = reverse("async-brand-list")
+    response = api_client.get(url)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response["WWW-Authenticate"].startswith("Bearer")
+
+    api_client.credentials(
+        HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+    )
+    assert (
+        api_client.get(url).json()
+        == api_client.get(reverse("brand-list")).json()
+    )
+    detail = reverse("async-category-detail", kwargs={"pk": brand.pk + 100})
+    assert api_client.get(detail).status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_product_list_pages_match(api_client, products):
+    """Test the async list filters and pages like the DRF one"""
+
+    query = f"?page_size=2&brand={products[0].brand_id}"
+    expected = api_client.get(reverse("product-list") + query).json()
+    response = api_client.get(reverse("async-product-list") + query)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["results"] == expected["results"]
+    following = api_client.get(response.json()["next"]).json()
+    assert [item["id"] for item in following["results"]] == [
+        products[2].pk,
+        products[1].pk,
+    ]
+    response = api_client.get(reverse("async-product-list") + "?brand=x")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_product_detail_shares_the_cache(api_client, product_detail_obj):
+    """Test the async detail reads what the DRF view cached, and 304s"""
+
+    pk = product_detail_obj.pk
+    url = reverse("async-product-detail", kwargs={"pk": pk})
+    response = api_client.get(url)
+    cached = api_client.get(reverse("product-detail", kwargs={"pk": pk}))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response["X-Cache"] == "MISS"
+    assert cached["X-Cache"] == "HIT"
+    assert response.content == cached.content
+    assert api_client.get(url)["X-Cache"] == "HIT"
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    missing = reverse("async-product-detail", kwargs={"pk": pk + 100})
+    assert api_client.get(missing).status_code == status.HTTP_404_NOT_FOUND
+
+
+def queries_sum(route):
+    """Total queries the metrics middleware recorded for ``route``"""
+
+    return HTTP_QUERIES.samples().get((route,), [0])[-1]
+
+
+@pytest.mark.django_db
+def test_asgi_reads(settings, user, products):
+    """Test auth, pages, cache, 304s and query counts under ASGI"""
+
+    settings.REQUEST_INSTRUMENTATION = True
+    token = f"Bearer {AccessToken.for_user(user)}"
+    list_url = reverse("async-product-list")
+    detail_url = reverse("async-product-detail", kwargs={"pk": products[0].pk})
+    counted = queries_sum("async-product-list")
+
+    async def requests():
+        client = AsyncClient()
+        brands = reverse("async-brand-list")
+        anonymous = await client.get(brands)
+        authenticated = await client.get(
+            brands, headers={"authorization": token}
+        )
+        first = await client.get(f"{list_url}?page_size=2")
+        second = await client.get(first.json()["next"])
+        miss = await client.get(detail_url)
+        hit = await client.get(detail_url)
+        not_modified = await client.get(
+            detail_url, headers={"if-none-match": miss["ETag"]}
+        )
+        return (
+            anonymous,
+            authenticated,
+            first,
+            second,
+            miss,
+            hit,
+            not_modified,
+        )
+
+    (
+        anonymous,
+        authenticated,
+        first,
+        second,
+        miss,
+        hit,
+        not_modified,
+    ) = async_to_sync(requests)()
+
+    assert anonymous.status_code == status.HTTP_401_UNAUTHORIZED
+    assert authenticated.status_code == status.HTTP_200_OK
+    assert [item["id"] for item in first.json()["results"]] == [
+        products[4].pk,
+        products[3].pk,
+    ]
+    assert [item["id"] for item in second.json()["results"]] == [
+        products[2].pk,
+        products[1].pk,
+    ]
+    assert (miss["X-Cache"], hit["X-Cache"]) == ("MISS", "HIT")
+    assert hit.content == miss.content
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # queries run on sync_to_async threads, not the event loop's
+    assert timings(first)["db"][1] != '"0 queries"'
+    assert timings(miss)["db"][0] > 0
+    assert queries_sum("async-product-list") - counted >= 2
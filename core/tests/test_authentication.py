@@ -0,0 +1,61 @@
+"""
+Test the caching JWT authentication class
+"""
+
+import time
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from core.authentication import VerifiedTokenCache
+
+
+def test_token_cache_is_bounded_and_expires():
+    """Test the least recently used and the expired tokens are dropped"""
+
+    cache = VerifiedTokenCache(size=2)
+    later = time.time() + 60
+    for key in (b"a", b"b"):
+        cache.set_token(key, {"exp": later})
+    assert cache.get_token(b"a")
+    cache.set_token(b"c", {"exp": later})
+    assert cache.get_token(b"b") is None
+    assert cache.get_token(b"a") and cache.get_token(b"c")
+
+    cache.set_token(b"d", {"exp": time.time() - 1})
+    assert cache.get_token(b"d") is None
+
+
+@pytest.mark.django_db
+def test_repeated_token_skips_user_query(api_client, user):
+    """Test a token seen before authenticates without a query"""
+
+    api_client.credentials(
+        HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+    )
+    with CaptureQueriesContext(connection) as first:
+        assert api_client.get(reverse("user-profile")).status_code == 200
+    with CaptureQueriesContext(connection) as second:
+        response = api_client.get(reverse("user-profile"))
+
+    assert len(first) == 1
+    assert len(second) == 0
+    assert response.json()["username"] == user.username
+
+
+@pytest.mark.django_db
+def test_saved_user_is_reloaded(api_client, user):
+    """Test a deactivated user is refused although the token is cached"""
+
+    api_client.credentials(
+        HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+    )
+    assert api_client.get(reverse("user-profile")).status_code == 200
+
+    user.is_active = False
+    user.save()
+    assert api_client.get(reverse("user-profile")).status_code == 401
+
+    user.delete()
+    assert api_client.get(reverse("user-profile")).status_code == 401
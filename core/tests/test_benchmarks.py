@@ -0,0 +1,444 @@
+"""
+Endpoint benchmarks
+
+Every route in ``core/urls.py`` and the JWT token views is driven
+through the test client against a generated catalog, recording p50/p95
+latency, the query count and the response size. Each route is compared
+with ``benchmark_baseline.json`` and fails when it exceeds the budget:
+
+    pytest core/tests/test_benchmarks.py --benchmark
+    pytest core/tests/test_benchmarks.py --benchmark-update
+
+Query counts and sizes are deterministic, latency depends on the
+machine, so its budget is relative to the baseline with a floor.
+
+JWT authentication is also timed on its own, the caching class against
+simplejwt's, since the per-request saving is too small to gate through
+the endpoint latency budget, and so is the JSON renderer against DRF's on
+the product detail payload of 1,000 products.
+"""
+
+import gc
+import json
+import statistics
+import time
+from itertools import count
+from pathlib import Path
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from rest_framework import renderers as drf_renderers
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt import authentication as simplejwt
+from rest_framework_simplejwt.tokens import RefreshToken
+from core import authentication
+from core import cart as carts
+from core import renderers
+from core import reviews
+from core import search
+from core import tags
+from core import urls as core_urls
+from core.models import Brand, Category, Order, Product, User, Variant
+from core.querysets import plan_queryset
+from core.serializers import ProductDetailSerializer
+from core.synthetic import SyntheticCatalog
+
+BASELINE = Path(__file__).with_name("benchmark_baseline.json")
+CATALOG_SIZE = 300
+WARMUP = 2
+ROUNDS = 30
+DEFAULT_BUDGET = {
+    # extra queries allowed over the baseline
+    "queries": 0,
+    # allowed relative growth of the response
+    "bytes": 0.1,
+    # allowed relative growth of p95, plus an absolute floor
+    "p95": 1.0,
+    "p95_floor_ms": 10.0,
+}
+JSON_PRODUCTS = 1000
+JWT_ROUTES = {"token_obtain_pair", "token_refresh", "token_verify"}
+
+
+class Route:
+    """How to call one named route"""
+
+    def __init__(
+        self,
+        name,
+        method="get",
+        kwargs=None,
+        query="",
+        data=None,
+        auth=False,
+        setup=None,
+    ):
+        self.name = name
+        self.method = method
+        self.kwargs = kwargs or (lambda ctx: {})
+        self.query = query
+        self.data = data or (lambda ctx, extra: None)
+        self.auth = auth
+        self.setup = setup
+
+    def __repr__(self):
+        return self.name
+
+
+def checkout_setup(ctx):
+    Variant.objects.filter(pk=ctx["variant"]).update(stock=1000)
+    cart = carts.get_cart(ctx["user"])
+    carts.add_item(cart, Variant.objects.get(pk=ctx["variant"]))
+    return {}
+
+
+def refresh_setup(ctx):
+    return {"refresh": str(RefreshToken.for_user(ctx["user"]))}
+
+
+usernames = count()
+
+ROUTES = [
+    Route("api-root", auth=True),
+    Route("health-check"),
+    Route("liveness"),
+    Route("readiness"),
+    Route(
+        "register",
+        "post",
+        data=lambda ctx, extra: {
+            "username": f"bench{next(usernames)}",
+            "email": "bench@example.com",
+            "password": "benchmark-password",
+        },
+    ),
+    Route("user-profile", auth=True),
+    Route("category-list", auth=True),
+    Route(
+        "category-detail",
+        kwargs=lambda ctx: {"pk": ctx["category"]},
+        auth=True,
+    ),
+    Route("brand-list", auth=True),
+    Route("brand-detail", kwargs=lambda ctx: {"pk": ctx["brand"]}, auth=True),
+    Route(
+        "partial-update-brand",
+        "put",
+        kwargs=lambda ctx: {"pk": ctx["brand"]},
+        data=lambda ctx, extra: {"description": "Benchmarked brand"},
+        auth=True,
+    ),
+    Route("product-list"),
+    Route("product-list", query="color=Black&in_stock=true"),
+    Route("product-detail", kwargs=lambda ctx: {"pk": ctx["product"]}),
+    Route("product-search", query="q=oak+table"),
+    Route("product-facets", query="color=Black"),
+    Route("product-list", query="ordering=rating"),
+    Route("product-reviews", kwargs=lambda ctx: {"pk": ctx["product"]}),
+    Route(
+        "product-reviews",
+        "post",
+        kwargs=lambda ctx: {"pk": ctx["product"]},
+        data=lambda ctx, extra: {"rating": 4, "comment": "Benchmarked"},
+        auth=True,
+    ),
+    Route(
+        "review-detail",
+        "patch",
+        kwargs=lambda ctx: {"pk": ctx["review"]},
+        data=lambda ctx, extra: {"rating": 5},
+        auth=True,
+    ),
+    Route("tag-cloud"),
+    Route("tag-products", kwargs=lambda ctx: {"slug": ctx["tag"]}),
+    Route("cart", auth=True),
+    Route(
+        "cart-items",
+        "post",
+        data=lambda ctx, extra: {"variant": ctx["variant"], "quantity": 1},
+        auth=True,
+    ),
+    Route(
+        "cart-item-detail",
+        "put",
+        kwargs=lambda ctx: {"variant_id": ctx["variant"]},
+        data=lambda ctx, extra: {"quantity": 2},
+        auth=True,
+    ),
+    Route(
+        "checkout",
+        "post",
+        data=lambda ctx, extra: {"shipping_address": "1 Bench Street"},
+        auth=True,
+        setup=checkout_setup,
+    ),
+    Route("order-list", auth=True),
+    Route("order-detail", kwargs=lambda ctx: {"pk": ctx["order"]}, auth=True),
+    Route("async-category-list", auth=True),
+    Route(
+        "async-category-detail",
+        kwargs=lambda ctx: {"pk": ctx["category"]},
+        auth=True,
+    ),
+    Route("async-brand-list", auth=True),
+    Route(
+        "async-brand-detail",
+        kwargs=lambda ctx: {"pk": ctx["brand"]},
+        auth=True,
+    ),
+    Route("async-product-list"),
+    Route("async-product-list", query="color=Black&in_stock=true"),
+    Route("async-product-detail", kwargs=lambda ctx: {"pk": ctx["product"]}),
+    Route(
+        "token_obtain_pair",
+        "post",
+        data=lambda ctx, extra: {
+            "username": ctx["user"].username,
+            "password": ctx["password"],
+        },
+    ),
+    Route(
+        "token_refresh",
+        "post",
+        data=lambda ctx, extra: extra,
+        setup=refresh_setup,
+    ),
+    Route(
+        "token_verify",
+        "post",
+        data=lambda ctx, extra: {"token": ctx["access"]},
+    ),
+]
+
+
+def route_id(route):
+    name = (
+        route.name if route.method == "get" else f"{route.name}:{route.method}"
+    )
+    return f"{name}?{route.query}" if route.query else name
+
+
+def route_names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
+
+
+def test_every_route_is_benchmarked():
+    """Test a new route can not be added without a benchmark"""
+
+    benchmarked = {route.name for route in ROUTES}
+    assert set(route_names(core_urls.urlpatterns)) - benchmarked == set()
+    assert JWT_ROUTES <= benchmarked
+
+
+@pytest.fixture(scope="module")
+def catalog(django_db_setup, django_db_blocker):
+    """A generated catalog shared by every benchmark in the module"""
+
+    with django_db_blocker.unblock():
+        generator = SyntheticCatalog(CATALOG_SIZE, seed=0, batch_size=100)
+        for _ in generator.run():
+            pass
+        user = User.objects.get(username="shopper0")
+        variant = (
+            Variant.objects.filter(stock__gt=0).order_by("id").values("pk")
+        )[0]["pk"]
+        product = Product.objects.order_by("id").first()
+        yield {
+            "user": user,
+            "password": "shopper-0",
+            "access": str(RefreshToken.for_user(user).access_token),
+            "product": product.pk,
+            "review": reviews.create_review(product, user, 3, "Bench").pk,
+            "tag": tags.tag_cloud(1)[0]["slug"],
+            "brand": Brand.objects.order_by("id").first().pk,
+            "category": Category.objects.order_by("id").first().pk,
+            "variant": variant,
+            "order": Order.objects.filter(user=user).first().pk,
+        }
+        # the rows were committed outside of any test transaction
+        call_command("flush", interactive=False, verbosity=0)
+        search.rebuild_index()
+
+
+@pytest.fixture(scope="module")
+def baseline(request):
+    """Baseline numbers, rewritten after the run with --benchmark-update"""
+
+    stored = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    results = {}
+    yield stored, results
+    if request.config.getoption("--benchmark-update") and results:
+        BASELINE.write_text(
+            json.dumps(
+                {
+                    "budget": stored.get("budget", DEFAULT_BUDGET),
+                    "routes": dict(
+                        sorted({**stored.get("routes", {}), **results}.items())
+                    ),
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+
+
+def measure(route, ctx):
+    client = APIClient()
+    if route.auth:
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {ctx['access']}")
+    url = reverse(route.name, kwargs=route.kwargs(ctx))
+    if route.query:
+        url = f"{url}?{route.query}"
+
+    timings, queries, sizes = [], [], []
+    # collector pauses land on random rounds and swamp the p95
+    gc.collect()
+    gc.disable()
+    try:
+        for round_ in range(WARMUP + ROUNDS):
+            extra = route.setup(ctx) if route.setup else {}
+            data = route.data(ctx, extra)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, route.method)(
+                    url, data, format="json"
+                )
+                elapsed = time.perf_counter() - started
+            assert response.status_code < 400, (route, response.content[:500])
+            if round_ >= WARMUP:
+                timings.append(elapsed * 1000)
+                queries.append(len(captured))
+                sizes.append(len(response.content))
+    finally:
+        gc.enable()
+
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(statistics.quantiles(timings, n=20)[18], 3),
+        "queries": max(queries),
+        "bytes": max(sizes),
+    }
+
+
+def regressions(result, expected, budget):
+    """Human readable budget violations of ``result``"""
+
+    failures = []
+    if result["queries"] > expected["queries"] + budget["queries"]:
+        failures.append(f"queries {result['queries']} > {expected['queries']}")
+    if result["bytes"] > expected["bytes"] * (1 + budget["bytes"]):
+        failures.append(f"bytes {result['bytes']} > {expected['bytes']}")
+    allowed = max(
+        expected["p95_ms"] * (1 + budget["p95"]),
+        expected["p95_ms"] + budget["p95_floor_ms"],
+    )
+    if result["p95_ms"] > allowed:
+        failures.append(f"p95 {result['p95_ms']}ms > {allowed:.3f}ms")
+    return failures
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize("route", ROUTES, ids=route_id)
+def test_endpoint_benchmark(route, catalog, baseline, request, settings):
+    """Test each route stays within its budget"""
+
+    # the rounds log in far faster than any person would
+    settings.LOGIN_THROTTLE_RATES = {}
+
+    stored, results = baseline
+    result = measure(route, catalog)
+    results[route_id(route)] = result
+    if request.config.getoption("--benchmark-update"):
+        return
+
+    expected = stored.get("routes", {}).get(route_id(route))
+    if expected is None:
+        pytest.fail(
+            f"No baseline for {route_id(route)}, run --benchmark-update"
+        )
+    budget = {**DEFAULT_BUDGET, **stored.get("budget", {})}
+    budget.update(expected.get("budget", {}))
+    failures = regressions(result, expected, budget)
+    assert not failures, f"{route_id(route)}: {', '.join(failures)}"
+
+
+def authenticate_p50(backend, request):
+    """Median microseconds of ``backend.authenticate(request)``"""
+
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for round_ in range(WARMUP + ROUNDS * 10):
+            started = time.perf_counter()
+            backend.authenticate(request)
+            elapsed = time.perf_counter() - started
+            if round_ >= WARMUP:
+                timings.append(elapsed * 1e6)
+    finally:
+        gc.enable()
+    return statistics.median(timings)
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_jwt_authentication_benchmark(catalog):
+    """Test the caching authentication beats simplejwt's on a known token"""
+
+    request = APIRequestFactory().get(
+        "/", HTTP_AUTHORIZATION=f"Bearer {catalog['access']}"
+    )
+    stock = authenticate_p50(simplejwt.JWTAuthentication(), request)
+    cached = authenticate_p50(authentication.JWTAuthentication(), request)
+    assert cached * 2 < stock, f"cached {cached:.1f}us, stock {stock:.1f}us"
+
+
+def render_p50(renderer, data):
+    """Median milliseconds of ``renderer.render(data)``"""
+
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for round_ in range(WARMUP + ROUNDS // 3):
+            started = time.perf_counter()
+            renderer.render(data)
+            elapsed = time.perf_counter() - started
+            if round_ >= WARMUP:
+                timings.append(elapsed * 1000)
+    finally:
+        gc.enable()
+    return statistics.median(timings)
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_json_renderer_benchmark(catalog):
+    """Test the fast renderer beats DRF's on 1,000 product details"""
+
+    products = plan_queryset(
+        Product.objects.order_by("id"), ProductDetailSerializer
+    )
+    request = APIRequestFactory().get("/")
+    details = ProductDetailSerializer(
+        products, many=True, context={"request": request}
+    ).data
+    data = [details[i % len(details)] for i in range(JSON_PRODUCTS)]
+
+    stock = render_p50(drf_renderers.JSONRenderer(), data)
+    fast = render_p50(renderers.JSONRenderer(), data)
+    assert renderers.JSONRenderer().render(data) == (
+        drf_renderers.JSONRenderer().render(data)
+    )
+    # the stdlib fallback is DRF's encoder minus the per call set up
+    speedup = 2 if renderers.orjson is not None else 1
+    assert (
+        fast * speedup < stock * 1.1
+    ), f"fast {fast:.1f}ms, stock {stock:.1f}ms"
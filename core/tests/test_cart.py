@@ -0,0 +1,183 @@
+"""
+Test Cart API, /cart/ and /cart/items/
+"""
+
+import threading
+import pytest
+from django.db import connection, connections
+from django.db.migrations.loader import MigrationLoader
+from django.urls import reverse
+from rest_framework import status
+from core import cart as carts
+from core.models import CartItem, Variant
+
+
+@pytest.fixture
+def variants(product):
+    """Two variants priced 5.50 and 2.25"""
+
+    return Variant.objects.bulk_create(
+        [
+            Variant(
+                product=product,
+                name="Black",
+                price="5.50",
+                color="Black",
+                stock=10,
+                size="M",
+            ),
+            Variant(
+                product=product,
+                name="Red",
+                price="2.25",
+                color="Red",
+                stock=10,
+                size="S",
+            ),
+        ]
+    )
+
+
+@pytest.mark.django_db
+def test_cart_requires_authentication(api_client):
+    """Test anonymous users have no cart"""
+
+    response = api_client.get(reverse("cart"))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_empty_cart(auth_client):
+    """Test a new user gets an empty cart"""
+
+    response = auth_client.get(reverse("cart"))
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["items"] == []
+    assert response.data["total"] == "0.00"
+
+
+@pytest.mark.django_db
+def test_add_items_increments_line(auth_client, variants):
+    """Test adding the same variant twice increments one line"""
+
+    url = reverse("cart-items")
+    auth_client.post(url, {"variant": variants[0].id, "quantity": 2})
+    auth_client.post(url, {"variant": variants[1].id})
+    response = auth_client.post(url, {"variant": variants[0].id})
+
+    assert response.status_code == status.HTTP_201_CREATED
+    lines = {item["variant"]["id"]: item for item in response.data["items"]}
+    assert lines[variants[0].id]["quantity"] == 3
+    assert lines[variants[0].id]["line_total"] == "16.50"
+    assert lines[variants[1].id]["quantity"] == 1
+    assert response.data["total"] == "18.75"
+    assert CartItem.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_add_unknown_variant(auth_client):
+    """Test adding a missing variant is rejected"""
+
+    response = auth_client.post(reverse("cart-items"), {"variant": 999})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_set_quantity_and_remove(auth_client, variants):
+    """Test PUT sets the quantity, 0 or DELETE removes the line"""
+
+    url = reverse("cart-item-detail", kwargs={"variant_id": variants[0].id})
+    response = auth_client.put(url, {"quantity": 4})
+    assert response.data["items"][0]["quantity"] == 4
+    assert response.data["total"] == "22.00"
+
+    response = auth_client.put(url, {"quantity": 0})
+    assert response.data["items"] == []
+
+    auth_client.put(url, {"quantity": 1})
+    response = auth_client.delete(url)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert not CartItem.objects.exists()
+
+
+@pytest.mark.django_db
+def test_clear_cart(auth_client, variants):
+    """Test DELETE /cart/ removes every line"""
+
+    for variant in variants:
+        auth_client.post(reverse("cart-items"), {"variant": variant.id})
+    response = auth_client.delete(reverse("cart"))
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert auth_client.get(reverse("cart")).data["items"] == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_adds_lose_no_updates(user, variants):
+    """Test concurrent first adds create one line with every increment"""
+
+    cart = carts.get_cart(user)
+    workers = 16
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def add():
+        try:
+            barrier.wait()
+            carts.add_item(cart, variants[0], 1)
+        except Exception as exc:  # pylint: disable=broad-except
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=add) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert list(CartItem.objects.values_list("quantity", flat=True)) == [
+        workers
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_migration_merges_duplicate_lines(settings, user, variants):
+    """Test repeated lines are summed so the unique constraint applies"""
+
+    # the suite runs with --nomigrations, load the real ones
+    settings.MIGRATION_MODULES = {}
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    state = loader.project_state(("core", "0003_copy_legacy_tags"))
+    merge, constrain = loader.get_migration(
+        "core", "0004_merge_duplicate_cart_items"
+    ).operations
+
+    with connection.schema_editor() as editor:
+        editor.remove_constraint(
+            state.apps.get_model("core", "CartItem"), constrain.constraint
+        )
+    try:
+        cart = carts.get_cart(user)
+        black, red = variants
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart=cart, product_variant=black, quantity=2),
+                CartItem(cart=cart, product_variant=red, quantity=1),
+                CartItem(cart=cart, product_variant=black, quantity=3),
+                CartItem(cart=cart, product_variant=black, quantity=1),
+            ]
+        )
+        first = CartItem.objects.order_by("pk").first().pk
+
+        merge.code(state.apps, connection.schema_editor())
+
+        assert list(
+            CartItem.objects.order_by("pk").values_list(
+                "pk", "product_variant", "quantity"
+            )
+        ) == [(first, black.pk, 6), (first + 1, red.pk, 1)]
+    finally:
+        CartItem.objects.all().delete()
+        with connection.schema_editor() as editor:
+            editor.add_constraint(CartItem, constrain.constraint)
@@ -0,0 +1,147 @@
+"""
+Test checkout, POST /checkout/
+"""
+
+import threading
+import pytest
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from core import cart as carts
+from core import checkout
+from core.models import CartItem, Order, OrderItem, User, Variant
+
+
+def make_variants(product, count, stock=5):
+    return Variant.objects.bulk_create(
+        [
+            Variant(
+                product=product,
+                name=f"v{index}",
+                price=f"{index + 1}.50",
+                color="Black",
+                stock=stock,
+                size="M",
+            )
+            for index in range(count)
+        ]
+    )
+
+
+def fill_cart(user, variants, quantity=1):
+    cart = carts.get_cart(user)
+    for variant in variants:
+        carts.add_item(cart, variant, quantity)
+    return cart
+
+
+@pytest.mark.django_db
+def test_checkout_creates_order(auth_client, user, product):
+    """Test checkout snapshots prices, reserves stock and clears cart"""
+
+    variants = make_variants(product, 2)
+    fill_cart(user, variants, quantity=2)
+    response = auth_client.post(
+        reverse("checkout"), {"shipping_address": "1 Main St"}
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.data["total_amount"] == "8.00"
+    assert response.data["payment_mode"] == "qrcode"
+    assert [item["price"] for item in response.data["items"]] == [
+        "1.50",
+        "2.50",
+    ]
+    assert list(
+        Variant.objects.order_by("pk").values_list("stock", flat=True)
+    ) == [3, 3]
+    assert not CartItem.objects.exists()
+
+    # later price changes do not touch the order
+    Variant.objects.update(price=99)
+    assert str(Order.objects.get().items.first().price) == "1.50"
+
+
+@pytest.mark.django_db
+def test_checkout_insufficient_stock_changes_nothing(
+    auth_client, user, product
+):
+    """Test one short variant fails the whole checkout"""
+
+    plenty, short = make_variants(product, 2)
+    Variant.objects.filter(pk=short.pk).update(stock=1)
+    cart = fill_cart(user, [plenty])
+    carts.add_item(cart, short, 2)
+
+    response = auth_client.post(
+        reverse("checkout"), {"shipping_address": "1 Main St"}
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.data["variants"] == [short.pk]
+    assert Variant.objects.get(pk=plenty.pk).stock == 5
+    assert not Order.objects.exists()
+    assert CartItem.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_checkout_empty_cart(auth_client):
+    """Test checking out an empty cart is rejected"""
+
+    response = auth_client.post(
+        reverse("checkout"), {"shipping_address": "1 Main St"}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_checkout_query_count_is_constant(user, product):
+    """Test checkout costs the same queries for 1 or 20 cart lines"""
+
+    counts = []
+    for size in (1, 20):
+        fill_cart(user, make_variants(product, size))
+        with CaptureQueriesContext(connection) as queries:
+            checkout.checkout(user, "1 Main St")
+        counts.append(len(queries))
+    assert counts[0] == counts[1]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_checkouts_never_oversell(product):
+    """Test buyers racing for the last units cannot oversell"""
+
+    (variant,) = make_variants(product, 1, stock=3)
+    buyers = [
+        User.objects.create_user(username=f"buyer{index}", password="pw")
+        for index in range(12)
+    ]
+    for buyer in buyers:
+        fill_cart(buyer, [variant])
+
+    barrier = threading.Barrier(len(buyers))
+    outcomes, errors = [], []
+
+    def buy(buyer):
+        try:
+            barrier.wait()
+            checkout.checkout(buyer, "1 Main St")
+            outcomes.append("ordered")
+        except checkout.InsufficientStockError:
+            outcomes.append("sold out")
+        except Exception as exc:  # pylint: disable=broad-except
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=buy, args=(buyer,)) for buyer in buyers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert outcomes.count("ordered") == 3
+    assert outcomes.count("sold out") == 9
+    assert Variant.objects.get(pk=variant.pk).stock == 0
+    assert OrderItem.objects.count() == 3
@@ -0,0 +1,120 @@
+"""
+Test ETag / Last-Modified conditional GET on catalog endpoints
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+from core.models import Category, Image
+
+
+@pytest.mark.django_db
+def test_category_list_not_modified(auth_client, category):
+    """Test a matching If-None-Match is answered with one query"""
+
+    url = reverse("category-list")
+    first = auth_client.get(url)
+    assert first.status_code == status.HTTP_200_OK
+    assert first["ETag"].startswith('"')
+    assert "Last-Modified" in first
+
+    with CaptureQueriesContext(connection) as queries:
+        second = auth_client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert second.status_code == status.HTTP_304_NOT_MODIFIED
+    assert second["ETag"] == first["ETag"]
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_category_list_etag_changes_on_write(auth_client, category):
+    """Test creating and deleting rows changes the ETag"""
+
+    url = reverse("category-list")
+    etag = auth_client.get(url)["ETag"]
+
+    extra = Category.objects.create(name="extra")
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] != etag
+
+    extra.delete()
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_brand_detail_if_modified_since(auth_client, brand):
+    """Test If-Modified-Since at or after updated_at returns 304"""
+
+    url = reverse("brand-detail", kwargs={"pk": brand.id})
+    response = auth_client.get(
+        url, HTTP_IF_MODIFIED_SINCE=http_date(brand.updated_at.timestamp())
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = auth_client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(0))
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["name"] == brand.name
+
+
+@pytest.mark.django_db
+def test_product_detail_etag_tracks_children(api_client, product_detail_obj):
+    """Test a nested FAQ edit changes the product detail ETag"""
+
+    url = reverse("product-detail", kwargs={"pk": product_detail_obj.id})
+    etag = api_client.get(url)["ETag"]
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    faq = product_detail_obj.faqs.first()
+    faq.answer = "updated answer"
+    faq.save()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_product_detail_etag_tracks_image_swaps(
+    api_client, product_detail_obj
+):
+    """Test swapping a variant image keeping count and latest changes it"""
+
+    variant = product_detail_obj.variants.first()
+    old, spare = Image.objects.bulk_create(
+        [
+            Image(url="https://example.com/old.png"),
+            Image(url="https://example.com/spare.png"),
+        ]
+    )
+    newest = Image.objects.create(url="https://example.com/newest.png")
+    variant.images.set([old, newest])
+    url = reverse("product-detail", kwargs={"pk": product_detail_obj.id})
+    etag = api_client.get(url)["ETag"]
+
+    variant.images.remove(old)
+    spare.variant_images.add(variant)
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_product_detail_bad_lookup(api_client):
+    """Test a lookup that is not a product id is a 404, not a 500"""
+
+    url = reverse("product-detail", kwargs={"pk": "abc"})
+    response = api_client.get(url)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_product_list_etag_depends_on_page(api_client, product):
+    """Test different list pages get different ETags"""
+
+    url = reverse("product-list")
+    first = api_client.get(url)["ETag"]
+    second = api_client.get(url, {"fields": "id"})["ETag"]
+    assert first != second
@@ -0,0 +1,85 @@
+"""
+Test SQLite connection tuning and the read replica router
+"""
+
+import pytest
+from django.db import connection, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.urls import reverse
+from core import db, views
+from core.models import Product
+
+
+def pragma(wrapper, name):
+    with wrapper.cursor() as cursor:
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db
+def test_pragmas_applied_to_new_connections(settings, tmp_path):
+    """Test connection_created runs SQLITE_PRAGMAS on a file database"""
+
+    settings.SQLITE_PRAGMAS = settings.PRODUCTION_SQLITE_PRAGMAS
+    wrapper = DatabaseWrapper(
+        {**connection.settings_dict, "NAME": str(tmp_path / "tuned.sqlite3")},
+        alias="tuned",
+    )
+    try:
+        assert pragma(wrapper, "journal_mode") == "wal"
+        # NORMAL
+        assert pragma(wrapper, "synchronous") == 1
+        assert pragma(wrapper, "cache_size") == -64 * 1024
+        assert pragma(wrapper, "busy_timeout") == 5000
+    finally:
+        wrapper.close()
+
+
+def test_router_sends_replica_reads(settings):
+    """Test only reads inside replica_reads() move to the replica"""
+
+    router = db.ReadReplicaRouter()
+    assert router.db_for_read(Product) is None
+    with db.replica_reads():
+        # no replica configured
+        assert router.db_for_read(Product) is None
+
+    settings.DATABASES = {**settings.DATABASES, "replica": {}}
+    assert router.db_for_read(Product) is None
+    with db.replica_reads():
+        assert router.db_for_read(Product) == "replica"
+        assert router.db_for_write(Product) is None
+        with db.primary_reads():
+            assert router.db_for_read(Product) is None
+        assert router.db_for_read(Product) == "replica"
+    assert router.allow_migrate("replica", "core") is False
+    assert router.allow_migrate("default", "core") is None
+
+
+@pytest.mark.django_db
+def test_router_keeps_transactions_on_primary(settings):
+    """Test reads inside a transaction see the transaction's writes"""
+
+    settings.DATABASES = {**settings.DATABASES, "replica": {}}
+    with db.replica_reads(), transaction.atomic():
+        assert db.ReadReplicaRouter().db_for_read(Product) is None
+
+
+@pytest.mark.django_db
+def test_product_reads_use_replica(api_client, monkeypatch, product):
+    """Test safe product reads use the replica, cached detail builds not"""
+
+    routed = []
+    get_queryset = views.ProductAPIViewset.get_queryset
+
+    def spy(self):
+        routed.append(db._replica_reads.get())
+        return get_queryset(self)
+
+    monkeypatch.setattr(views.ProductAPIViewset, "get_queryset", spy)
+    api_client.get(reverse("product-list"))
+    api_client.get(reverse("product-detail", kwargs={"pk": product.pk}))
+    api_client.delete(reverse("product-detail", kwargs={"pk": product.pk}))
+
+    assert routed[:2] == [True, False]
+    assert db._replica_reads.get() is False
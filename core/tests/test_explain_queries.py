@@ -0,0 +1,56 @@
+"""
+Test the query plan audit and the explain_queries command
+"""
+
+from io import StringIO
+import pytest
+from django.core.management import CommandError, call_command
+from core import explain
+from core.models import Faq, Tag
+from core.synthetic import SyntheticCatalog
+
+
+@pytest.mark.django_db
+def test_endpoint_queries_use_indexes():
+    for _ in SyntheticCatalog(60, seed=3).run():
+        pass
+    out = StringIO()
+    call_command("explain_queries", verbosity=2, stdout=out)
+    output = out.getvalue()
+
+    assert "statements use indexes" in output
+    assert "USING COVERING INDEX product_updated_idx" in output
+    assert "USING COVERING INDEX orderitem_order_qty_idx" in output
+    assert "carousel_product_order_idx" in output
+
+
+@pytest.mark.django_db
+def test_full_scan_is_flagged():
+    queryset = Faq.objects.filter(question="Does it fold?")
+    sql, params = queryset.query.sql_with_params()
+
+    assert explain.full_scans(explain.plan(sql, params)) == ["SCAN core_faq"]
+    assert explain.full_scans(["SCAN core_brand"]) == []
+    assert explain.full_scans(["SCAN core_faq USING INDEX faq_idx"]) == []
+    # SQLite before 3.36
+    assert explain.full_scans(
+        ["SCAN TABLE core_faq", "SCAN TABLE core_brand AS U0"]
+    ) == ["SCAN TABLE core_faq"]
+
+
+@pytest.mark.django_db
+def test_catalog_without_tags_is_audited():
+    for _ in SyntheticCatalog(20, seed=3).run():
+        pass
+    Tag.objects.all().delete()
+    out = StringIO()
+    call_command("explain_queries", verbosity=2, stdout=out)
+
+    assert "statements use indexes" in out.getvalue()
+    assert "tag-products" not in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_empty_catalog_is_refused():
+    with pytest.raises(CommandError, match="populate_db"):
+        call_command("explain_queries", stdout=StringIO())
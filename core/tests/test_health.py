@@ -0,0 +1,125 @@
+"""
+Test readiness probes, GET /health/ready/
+"""
+
+import threading
+import time
+import pytest
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.urls import reverse
+from rest_framework import status
+from core import health
+from core.health import HealthChecker, ProbeFailed
+
+
+@pytest.fixture(autouse=True)
+def fresh_results():
+    health.health_checker.reset()
+    yield
+    health.health_checker.reset()
+
+
+@pytest.mark.django_db
+def test_liveness(api_client):
+    """Test liveness does not touch any dependency"""
+
+    response = api_client.get(reverse("liveness"))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == "healthy"
+
+
+@pytest.mark.django_db
+def test_readiness(api_client):
+    """Test every probe passes against the test database"""
+
+    response = api_client.get(reverse("readiness"))
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["status"] == "ready"
+    assert set(data["checks"]) == {"database", "migrations", "cache", "disk"}
+    assert all(check["status"] == "ok" for check in data["checks"].values())
+
+
+@pytest.mark.django_db
+def test_readiness_failure(api_client, monkeypatch):
+    """Test a failing probe makes the worker unavailable"""
+
+    def broken():
+        raise ProbeFailed("cache 'default' did not return the value")
+
+    monkeypatch.setitem(health.health_checker.probes, "cache", broken)
+    response = api_client.get(reverse("readiness"))
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["checks"]["cache"] == {
+        "status": "fail",
+        "error": "ProbeFailed: cache 'default' did not return the value",
+        "duration_ms": response.json()["checks"]["cache"]["duration_ms"],
+    }
+
+
+def test_results_are_cached():
+    """Test probes only run again once their result expires"""
+
+    calls = []
+    checker = HealthChecker({"probe": lambda: calls.append(1) or {}}, ttl=60)
+
+    assert checker.run()[0]
+    assert checker.run()[0]
+    assert len(calls) == 1
+    checker.reset()
+    checker.run()
+    assert len(calls) == 2
+
+
+def test_probes_run_concurrently():
+    """Test slow probes overlap and a hung probe times out"""
+
+    release = threading.Event()
+
+    def slow():
+        time.sleep(0.2)
+        return {}
+
+    def hung():
+        release.wait(5)
+        return {}
+
+    checker = HealthChecker(
+        {"a": slow, "b": slow, "c": hung}, ttl=60, timeout=0.5
+    )
+    started = time.perf_counter()
+    healthy, results = checker.run()
+    elapsed = time.perf_counter() - started
+    release.set()
+
+    assert elapsed < 0.7
+    assert not healthy
+    assert results["a"]["status"] == results["b"]["status"] == "ok"
+    assert results["c"] == {"status": "fail", "error": "timed out"}
+
+
+@pytest.mark.django_db
+def test_migrations_probe_with_real_migrations(settings, monkeypatch):
+    """Test apps without migrations, like django_filters, pass the probe"""
+
+    # the suite runs with --nomigrations, load the real ones
+    settings.MIGRATION_MODULES = {}
+    nodes = MigrationLoader(connection, ignore_no_migrations=True).graph.nodes
+    applied = dict(nodes)
+    monkeypatch.setattr(
+        MigrationRecorder, "applied_migrations", lambda self: dict(applied)
+    )
+
+    result = health.check_migrations()
+    assert result["unapplied"] == 0
+    assert "django_filters" in result["unmigrated"]
+    assert "core" not in result["unmigrated"]
+
+    del applied["auth", "0012_alter_user_first_name_max_length"]
+    with pytest.raises(ProbeFailed, match="1 unapplied migrations"):
+        health.check_migrations()
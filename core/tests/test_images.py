@@ -0,0 +1,119 @@
+"""
+Test the image registry, url hashing, upserts and the dedupe_images and
+gc_images commands
+"""
+
+from datetime import timedelta
+from io import StringIO
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from core.cache import product_detail_cache
+from core.images import upsert_images
+from core.models import Image, Review
+
+
+def test_normalize_url():
+    """Test spellings of one url normalize, and hash, the same"""
+
+    assert (
+        Image.normalize_url(" HTTPS://CDN.Example.com:443/a/B.jpg#zoom ")
+        == "https://cdn.example.com/a/B.jpg"
+    )
+    assert Image.normalize_url("http://example.com:8080") == (
+        "http://example.com:8080/"
+    )
+    assert Image.hash_url("https://Example.com/a.jpg") == Image.hash_url(
+        "https://example.com:443/a.jpg"
+    )
+    assert Image.hash_url("https://example.com/a.jpg") != Image.hash_url(
+        "https://example.com/A.jpg"
+    )
+
+
+@pytest.mark.django_db
+def test_upsert_images_reuses_rows():
+    """Test a url seen again resolves to its existing image"""
+
+    first, inserted = upsert_images(
+        ["https://example.com/a.jpg", "https://EXAMPLE.com/a.jpg#top"]
+    )
+    assert inserted == 1
+    assert len(set(first.values())) == 1
+
+    second, inserted = upsert_images(
+        ["https://example.com:443/a.jpg", "https://example.com/b.jpg"]
+    )
+    assert inserted == 1
+    assert (
+        second["https://example.com:443/a.jpg"]
+        == first["https://example.com/a.jpg"]
+    )
+    assert Image.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_dedupe_images_merges_links(
+    variant, user, django_capture_on_commit_callbacks
+):
+    """Test legacy duplicates are merged and their links moved"""
+
+    registered, _ = upsert_images(["https://example.com/a.jpg"])
+    legacy = Image.objects.bulk_create(
+        [
+            Image(url="https://EXAMPLE.com/a.jpg"),
+            Image(url="https://example.com/b.jpg"),
+            Image(url="https://example.com/b.jpg#zoom"),
+        ]
+    )
+    review = Review.objects.create(
+        product=variant.product, reviewer=user, rating=4, comment="ok"
+    )
+    variant.images.set([legacy[0], legacy[1]])
+    review.images.set([legacy[1], legacy[2]])
+
+    key = product_detail_cache.key(variant.product_id)
+    out = StringIO()
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command("dedupe_images", "--batch-size", "2", stdout=out)
+        # the payload is only retired once the relinked rows commit
+        assert product_detail_cache.key(variant.product_id) == key
+
+    assert product_detail_cache.key(variant.product_id) != key
+    assert "1 images registered, 2 duplicates merged" in out.getvalue()
+    assert Image.objects.count() == 2
+    assert not Image.objects.filter(url_hash__isnull=True).exists()
+    kept = Image.objects.get(url_hash=Image.hash_url(legacy[1].url)).pk
+    assert set(variant.images.values_list("pk", flat=True)) == {
+        registered["https://example.com/a.jpg"],
+        kept,
+    }
+    assert list(review.images.values_list("pk", flat=True)) == [kept]
+
+
+@pytest.mark.django_db
+def test_gc_images_deletes_old_orphans(variant):
+    """Test only orphaned images past the grace period are deleted"""
+
+    ids, _ = upsert_images(
+        [
+            "https://example.com/linked.jpg",
+            "https://example.com/orphan.jpg",
+            "https://example.com/fresh.jpg",
+        ]
+    )
+    variant.images.add(ids["https://example.com/linked.jpg"])
+    Image.objects.exclude(pk=ids["https://example.com/fresh.jpg"]).update(
+        created_at=timezone.now() - timedelta(hours=2)
+    )
+
+    out = StringIO()
+    call_command("gc_images", "--dry-run", stdout=out)
+    assert "1 orphaned images would be deleted" in out.getvalue()
+    assert Image.objects.count() == 3
+
+    call_command("gc_images", stdout=StringIO())
+    assert set(Image.objects.values_list("pk", flat=True)) == {
+        ids["https://example.com/linked.jpg"],
+        ids["https://example.com/fresh.jpg"],
+    }
@@ -0,0 +1,128 @@
+"""
+Test the import_catalog management command
+"""
+
+import csv
+import json
+from io import StringIO
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from core import search
+from core.models import Brand, Category, Image, Product, Tag, Variant
+
+
+def record(index, brand="Acme", image="https://img.local/shared.jpg"):
+    return {
+        "base_name": f"Imported {index}",
+        "description": "imported product",
+        "base_price": "19.99",
+        "brand": {"name": brand, "description": f"{brand} brand"},
+        "category": "Desks",
+        "variants": [
+            {
+                "name": "Black",
+                "price": "17.50",
+                "color": "Black",
+                "stock": 4,
+                "size": "M",
+                "images": [image, f"https://img.local/{index}.jpg"],
+            }
+        ],
+        "specifications": [{"name": "Material", "value": "Teak"}],
+        "compatibility": [{"name": "Desk", "product_type": "Furniture"}],
+        "delivery_time_status": {
+            "shipping_cost": "2.00",
+            "estimated_delivery_time": "3-5 days",
+            "additional_info": "",
+        },
+        "faqs": [{"question": "Q?", "answer": "A."}],
+        "carousel": [{"image": "https://img.local/c.jpg", "order": 1}],
+        "tags": ["desk"],
+    }
+
+
+@pytest.mark.django_db
+def test_import_is_silent_at_verbosity_0(tmp_path):
+    """Test -v 0 prints neither progress nor the summary"""
+
+    path = tmp_path / "catalog.jsonl"
+    path.write_text(json.dumps(record(0)) + "\n")
+    out = StringIO()
+    call_command("import_catalog", str(path), verbosity=0, stdout=out)
+
+    assert out.getvalue() == ""
+    assert Product.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_import_jsonl(tmp_path):
+    """Test nested records are imported and shared rows deduplicated"""
+
+    Brand.objects.create(name="Acme", description="existing")
+    path = tmp_path / "catalog.jsonl"
+    path.write_text(
+        "\n".join(json.dumps(record(index)) for index in range(5)) + "\n"
+    )
+    out = StringIO()
+    call_command("import_catalog", str(path), batch_size=2, stdout=out)
+
+    assert "Imported 5 products" in out.getvalue()
+    # progress after each batch, at the default verbosity
+    assert "2 products, " in out.getvalue()
+    assert "4 products, " in out.getvalue()
+    assert Product.objects.count() == 5
+    assert Brand.objects.count() == 1
+    assert Category.objects.count() == 1
+    # one shared image plus one image per product
+    assert Image.objects.count() == 6
+    variant = Variant.objects.select_related("product").first()
+    assert variant.images.count() == 2
+    assert variant.product.delivery_time_status.shipping_cost == 2
+    assert variant.product.tags.get().name == "desk"
+    assert Tag.objects.count() == 1
+    assert len(search.get_backend().search("teak")) == 5
+
+
+@pytest.mark.django_db
+def test_import_csv_reuses_existing_images(tmp_path):
+    """Test CSV nested columns and images already in the database"""
+
+    Image.objects.create(url="https://img.local/shared.jpg")
+    path = tmp_path / "catalog.csv"
+    fields = ["base_name", "description", "base_price", "brand", "variants"]
+    with path.open("w", newline="") as stream:
+        writer = csv.DictWriter(stream, fieldnames=fields)
+        writer.writeheader()
+        for index in range(3):
+            row = record(index)
+            writer.writerow(
+                {
+                    "base_name": row["base_name"],
+                    "description": row["description"],
+                    "base_price": row["base_price"],
+                    "brand": "Acme",
+                    "variants": json.dumps(row["variants"]),
+                }
+            )
+    call_command("import_catalog", str(path), stdout=StringIO())
+
+    assert Product.objects.filter(category__isnull=True).count() == 3
+    assert Image.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_import_rolls_back_bad_chunk(tmp_path):
+    """Test a malformed record fails its chunk with a readable error"""
+
+    bad = record(2)
+    del bad["base_price"]
+    path = tmp_path / "catalog.jsonl"
+    path.write_text(
+        "\n".join(json.dumps(r) for r in [record(0), record(1), bad])
+    )
+    with pytest.raises(CommandError, match="records 3-3: KeyError"):
+        call_command(
+            "import_catalog", str(path), batch_size=2, stdout=StringIO()
+        )
+    assert Product.objects.count() == 2
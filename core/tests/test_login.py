@@ -0,0 +1,138 @@
+"""
+Test the login endpoint, /api/token/, its password checks and throttling
+"""
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.urls import reverse
+from rest_framework import status
+from core import login
+from core.models import User
+
+
+@pytest.fixture
+def shopper():
+    return User.objects.create_user(
+        username="shopper", email="shopper@example.com", password="secret-pw"
+    )
+
+
+@pytest.mark.django_db
+def test_login_returns_tokens_and_user(api_client, shopper):
+    """Test a correct password returns both tokens and the user"""
+
+    response = api_client.post(
+        reverse("token_obtain_pair"),
+        {"username": "shopper", "password": "secret-pw"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert {"access", "refresh"} <= set(response.json())
+    assert response.json()["user"]["username"] == "shopper"
+
+
+@pytest.mark.django_db
+def test_unknown_user_pays_for_a_hash(api_client, shopper, monkeypatch):
+    """Test unknown usernames and wrong passwords hash exactly once"""
+
+    login.password_checker.dummy_hash()
+    checked = []
+    original = login.check_password
+
+    def counting(password, encoded, **kwargs):
+        checked.append(encoded)
+        return original(password, encoded, **kwargs)
+
+    monkeypatch.setattr(login, "check_password", counting)
+    for username in ("nobody", "shopper"):
+        response = api_client.post(
+            reverse("token_obtain_pair"),
+            {"username": username, "password": "wrong"},
+        )
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    assert checked == [login.password_checker.dummy_hash(), shopper.password]
+
+
+@pytest.mark.django_db
+def test_outdated_hash_is_upgraded(api_client, settings):
+    """Test a login rehashes a password stored with an older hasher"""
+
+    settings.PASSWORD_HASHERS = [
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+    ]
+    user = User.objects.create(
+        username="legacy", password=make_password("old-pw", hasher="md5")
+    )
+
+    response = api_client.post(
+        reverse("token_obtain_pair"),
+        {"username": "legacy", "password": "old-pw"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    user.refresh_from_db()
+    assert user.password.startswith("pbkdf2_sha256$")
+    assert user.check_password("old-pw")
+
+
+@pytest.mark.django_db
+def test_login_is_throttled_per_username(api_client, shopper, settings):
+    """Test attempts beyond the username's rate are refused"""
+
+    settings.LOGIN_THROTTLE_RATES = {"username": "2/min"}
+    codes = [
+        api_client.post(
+            reverse("token_obtain_pair"),
+            {"username": "shopper", "password": "wrong"},
+        ).status_code
+        for _ in range(3)
+    ]
+
+    assert codes == [401, 401, 429]
+    response = api_client.post(
+        reverse("token_obtain_pair"),
+        {"username": "someone-else", "password": "wrong"},
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_address_buckets_use_the_forwarded_client(api_client, settings):
+    """Test clients behind the same proxy are throttled separately"""
+
+    settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, "NUM_PROXIES": 1}
+    settings.LOGIN_THROTTLE_RATES = {"address": "2/min"}
+
+    def attempt(client):
+        return api_client.post(
+            reverse("token_obtain_pair"),
+            {"username": "nobody", "password": "wrong"},
+            REMOTE_ADDR="10.0.0.1",
+            HTTP_X_FORWARDED_FOR=f"198.51.100.7, {client}",
+        ).status_code
+
+    assert [attempt("203.0.113.1") for _ in range(3)] == [401, 401, 429]
+    assert attempt("203.0.113.2") == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_async_password_check(settings):
+    """Test async callers await the pool, rehash included"""
+
+    settings.PASSWORD_HASHERS = [
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+    ]
+    user = User.objects.create(
+        username="legacy", password=make_password("old-pw", hasher="md5")
+    )
+    check = async_to_sync(login.password_checker.acheck)
+
+    assert not check(None, "old-pw")
+    assert not check(user, "wrong")
+    assert check(user, "old-pw")
+    user.refresh_from_db()
+    assert user.password.startswith("pbkdf2_sha256$")
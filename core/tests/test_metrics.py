@@ -0,0 +1,174 @@
+"""
+Test the metrics registry and GET /metrics/
+"""
+
+import json
+import os
+import pytest
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from core.metrics import Counter, Gauge, Histogram, Registry
+from core.models import User
+
+
+def parse(text):
+    """``{sample line without value: value}`` of an exposition"""
+
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines()
+        if line and not line.startswith("#")
+    }
+
+
+def test_exposition_format():
+    """Test counters, gauges and cumulative histogram buckets"""
+
+    registry = Registry()
+    requests = Counter("requests_total", "Requests", ("code",), registry)
+    in_flight = Gauge("in_flight", "In flight", registry=registry)
+    latency = Histogram(
+        "latency_seconds", "Latency", buckets=(0.1, 1), registry=registry
+    )
+    requests.inc(code=200)
+    requests.inc(2, code=200)
+    requests.inc(code='5"0')
+    in_flight.set(4)
+    for value in (0.05, 0.5, 3):
+        latency.observe(value)
+
+    text = registry.expose()
+    assert "# TYPE latency_seconds histogram" in text
+    assert parse(text) == {
+        'requests_total{code="200"}': 3,
+        'requests_total{code="5\\"0"}': 1,
+        "in_flight": 4,
+        'latency_seconds_bucket{le="0.1"}': 1,
+        'latency_seconds_bucket{le="1.0"}': 2,
+        'latency_seconds_bucket{le="+Inf"}': 3,
+        "latency_seconds_sum": 3.55,
+        "latency_seconds_count": 3,
+    }
+    with pytest.raises(ValueError):
+        requests.inc(method="GET")
+    with pytest.raises(ValueError):
+        requests.inc(-1, code=200)
+
+
+def test_multi_process_aggregation(tmp_path):
+    """Test the snapshots of other workers are merged into the output"""
+
+    registry = Registry(directory=tmp_path, flush_interval=0)
+    requests = Counter("requests_total", "Requests", ("code",), registry)
+    in_flight = Gauge("in_flight", "In flight", registry=registry)
+    peak = Gauge("peak", "Peak", registry=registry, aggregate="max")
+    latency = Histogram(
+        "latency_seconds", "Latency", buckets=(1,), registry=registry
+    )
+    requests.inc(code=200)
+    in_flight.set(2)
+    peak.set(5)
+    latency.observe(0.5)
+    registry.flush()
+    assert json.loads((tmp_path / f"{os.getpid()}.json").read_text())
+
+    sibling = {
+        "requests_total": [[["200"], 4], [["404"], 1]],
+        "in_flight": [[[], 3]],
+        "peak": [[[], 9]],
+        "latency_seconds": [[[], [0, 1, 2.0]]],
+    }
+    # the parent process is alive, an unused pid is not
+    (tmp_path / f"{os.getppid()}.json").write_text(json.dumps(sibling))
+    (tmp_path / "999999999.json").write_text(json.dumps(sibling))
+
+    expected = {
+        'requests_total{code="200"}': 9,
+        'requests_total{code="404"}': 2,
+        "in_flight": 5,
+        "peak": 9,
+        'latency_seconds_bucket{le="1.0"}': 1,
+        'latency_seconds_bucket{le="+Inf"}': 3,
+        "latency_seconds_sum": 4.5,
+        "latency_seconds_count": 3,
+    }
+    assert parse(registry.expose()) == expected
+
+    # the exited worker's snapshot is folded away, its counts are not
+    assert not (tmp_path / "999999999.json").exists()
+    (tmp_path / "999999998.json").write_text(
+        json.dumps({"requests_total": [[["200"], 1]]})
+    )
+    expected['requests_total{code="200"}'] += 1
+    assert parse(registry.expose()) == expected
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == sorted(
+        [f"{os.getpid()}.json", f"{os.getppid()}.json", "retired.json"]
+    )
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_needs_a_token_or_an_admin(api_client, settings):
+    """Test anonymous and non staff callers can not read the metrics"""
+
+    settings.METRICS_TOKEN = "scraper-secret"
+    url = reverse("metrics")
+    assert api_client.get(url).status_code == 401
+    response = api_client.get(url, HTTP_AUTHORIZATION="Bearer wrong")
+    assert response.status_code == 401
+
+    staff = User.objects.create(username="ops", is_staff=True)
+    member = User.objects.create(username="member")
+    for user, code in ((member, 401), (staff, 200)):
+        response = api_client.get(
+            url, HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+        assert response.status_code == code
+    response = api_client.get(url, HTTP_AUTHORIZATION="Bearer scraper-secret")
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint(api_client, user, product_detail_obj, settings):
+    """Test requests, queries, cache lookups and JWT outcomes are exposed"""
+
+    settings.METRICS_TOKEN = "scraper-secret"
+    scrape = {"HTTP_AUTHORIZATION": "Bearer scraper-secret"}
+    before = parse(
+        api_client.get(reverse("metrics"), **scrape).content.decode()
+    )
+    url = reverse("product-detail", kwargs={"pk": product_detail_obj.id})
+    api_client.get(url)
+    api_client.get(url)
+    api_client.credentials(
+        HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+    )
+    api_client.get(reverse("user-profile"))
+    api_client.credentials(HTTP_AUTHORIZATION="Bearer broken")
+    api_client.get(reverse("user-profile"))
+
+    api_client.credentials()
+    response = api_client.get(reverse("metrics"), **scrape)
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    after = parse(response.content.decode())
+
+    def delta(sample):
+        return after.get(sample, 0) - before.get(sample, 0)
+
+    route = 'route="product-detail"'
+    assert delta(f'http_requests_total{{{route},method="GET",status="200"}}')
+    assert delta(f"http_request_queries_count{{{route}}}") == 2
+    assert (
+        delta(f'http_request_duration_seconds_count{{{route},method="GET"}}')
+        == 2
+    )
+    assert (
+        delta('cache_requests_total{cache="product-detail",result="miss"}')
+        == 1
+    )
+    assert (
+        delta('cache_requests_total{cache="product-detail",result="hit"}') == 1
+    )
+    assert delta('jwt_authentications_total{outcome="success"}') == 1
+    assert delta('jwt_authentications_total{outcome="invalid_token"}') == 1
+    assert after["http_requests_in_progress"] == 1
@@ -0,0 +1,86 @@
+"""
+Test the request instrumentation middleware
+"""
+
+import json
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core.db import observe_queries
+from core.middleware import RequestMetrics
+from core.models import Brand
+
+
+def timings(response):
+    """Parse ``Server-Timing`` into ``{name: (duration, description)}``"""
+
+    metrics = {}
+    for entry in response["Server-Timing"].split(", "):
+        name, *params = entry.split(";")
+        params = dict(param.split("=", 1) for param in params)
+        metrics[name] = (float(params["dur"]), params.get("desc"))
+    return metrics
+
+
+@pytest.mark.django_db
+def test_disabled_by_default(api_client, product_detail_obj):
+    """Test the middleware is dropped from the chain when disabled"""
+
+    url = reverse("product-detail", kwargs={"pk": product_detail_obj.id})
+    response = api_client.get(url)
+
+    assert response.status_code == 200
+    assert not response.has_header("Server-Timing")
+
+
+@pytest.mark.django_db
+def test_server_timing(settings, product_detail_obj):
+    """Test database, serializer and render timings are reported"""
+
+    settings.REQUEST_INSTRUMENTATION = True
+    url = reverse("product-detail", kwargs={"pk": product_detail_obj.id})
+    with CaptureQueriesContext(connection) as queries:
+        response = APIClient().get(url)
+
+    metrics = timings(response)
+    assert set(metrics) == {"db", "serialize", "render", "total"}
+    assert metrics["db"][1] == f'"{len(queries)} queries"'
+    assert metrics["serialize"][0] > 0
+    assert metrics["render"][0] > 0
+    assert metrics["total"][0] >= metrics["db"][0]
+
+
+@pytest.mark.django_db
+def test_slow_request_logged(settings, caplog, product_detail_obj):
+    """Test requests over the threshold are logged as JSON records"""
+
+    settings.REQUEST_INSTRUMENTATION = True
+    settings.SLOW_REQUEST_THRESHOLD_MS = 0
+    url = reverse("product-detail", kwargs={"pk": product_detail_obj.id})
+    with caplog.at_level("WARNING", logger="core.performance"):
+        with CaptureQueriesContext(connection) as queries:
+            APIClient().get(f"{url}?fields=id")
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record["path"] == f"{url}?fields=id"
+    assert record["status"] == 200
+    assert record["queries"] == len(queries)
+    assert caplog.records[-1].request_metrics == record
+
+
+@pytest.mark.django_db
+def test_duplicated_statements():
+    """Test repeated statements are ranked by their executions"""
+
+    metrics = RequestMetrics()
+    with observe_queries(metrics.observe):
+        for pk in range(3):
+            list(Brand.objects.filter(pk=pk))
+        list(Brand.objects.all())
+
+    assert metrics.query_count == 4
+    (duplicate,) = metrics.duplicates()
+    assert duplicate["count"] == 3
+    assert 'WHERE "core_brand"."id" = %s' in duplicate["sql"]
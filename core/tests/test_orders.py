@@ -0,0 +1,112 @@
+"""
+Test order history API, GET /orders/ and /orders/{id}/
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from core.models import Order, OrderItem, User, Variant
+
+
+@pytest.fixture
+def orders(user, product):
+    """Five orders of ``user``, two lines each, and one of a stranger"""
+
+    variant = Variant.objects.create(
+        product=product, name="v", price=3, color="c", stock=9, size="s"
+    )
+    statuses = ["pending", "shipped", "pending", "delivered", "shipped"]
+    created = []
+    for order_status in statuses:
+        order = Order.objects.create(
+            user=user,
+            status=order_status,
+            total_amount=9,
+            shipping_address="1 Main St",
+        )
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order, product_variant=variant, quantity=1, price=3
+                ),
+                OrderItem(
+                    order=order, product_variant=variant, quantity=2, price=3
+                ),
+            ]
+        )
+        created.append(order)
+    stranger = User.objects.create_user(username="stranger", password="pw")
+    Order.objects.create(
+        user=stranger, total_amount=1, shipping_address="elsewhere"
+    )
+    return created
+
+
+@pytest.mark.django_db
+def test_order_list_requires_authentication(api_client):
+    """Test anonymous users cannot list orders"""
+
+    response = api_client.get(reverse("order-list"))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_order_list_summaries(auth_client, orders):
+    """Test the list shows only own orders with annotated item counts"""
+
+    with CaptureQueriesContext(connection) as queries:
+        response = auth_client.get(reverse("order-list"))
+    assert response.status_code == status.HTTP_200_OK
+    results = response.data["results"]
+    assert [item["id"] for item in results] == [
+        order.id for order in reversed(orders)
+    ]
+    assert results[0]["item_count"] == 3
+    assert "items" not in results[0]
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_order_list_status_filter_and_pages(auth_client, orders):
+    """Test ``?status=`` filters and cursor pages cover every match"""
+
+    url = reverse("order-list") + "?status=pending,shipped&page_size=2"
+    seen = []
+    while url:
+        response = auth_client.get(url)
+        seen.extend(item["id"] for item in response.data["results"])
+        url = response.data["next"]
+    expected = [
+        order.id
+        for order in reversed(orders)
+        if order.status in ("pending", "shipped")
+    ]
+    assert seen == expected
+
+
+@pytest.mark.django_db
+def test_order_detail_prefetches_items(auth_client, orders):
+    """Test the detail view returns lines in a fixed number of queries"""
+
+    url = reverse("order-detail", kwargs={"pk": orders[0].id})
+    with CaptureQueriesContext(connection) as queries:
+        response = auth_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.data["items"]) == 2
+    assert response.data["items"][0]["variant"]["product_name"] == (
+        "test_product"
+    )
+    # the order, then its lines joined to variant and product
+    assert len(queries) == 2
+
+
+@pytest.mark.django_db
+def test_order_detail_of_other_user(api_client, orders):
+    """Test users cannot read someone else's order"""
+
+    stranger = User.objects.get(username="stranger")
+    api_client.force_authenticate(user=stranger)
+    url = reverse("order-detail", kwargs={"pk": orders[0].id})
+    assert api_client.get(url).status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,97 @@
+"""
+Test the populate_db management command
+"""
+
+from io import StringIO
+import pytest
+from django.core.management import call_command
+from core.models import (
+    Brand,
+    Cart,
+    Category,
+    Image,
+    Order,
+    OrderItem,
+    Product,
+    Review,
+    Variant,
+)
+
+
+def snapshot():
+    return {
+        "products": list(
+            Product.objects.order_by("id").values_list(
+                "base_name", "base_price", "brand__name", "category__name"
+            )
+        ),
+        "variants": list(
+            Variant.objects.order_by("id").values_list(
+                "name", "price", "stock"
+            )
+        ),
+        "reviews": list(
+            Review.objects.order_by("id").values_list(
+                "reviewer__username", "rating"
+            )
+        ),
+        "orders": list(
+            Order.objects.order_by("id").values_list(
+                "user__username", "status", "total_amount"
+            )
+        ),
+    }
+
+
+def generate(**options):
+    call_command(
+        "populate_db", products=60, batch_size=25, stdout=StringIO(), **options
+    )
+
+
+@pytest.mark.django_db
+def test_populate_sample():
+    """Test the default run still creates the single sample product"""
+
+    call_command("populate_db", stdout=StringIO())
+
+    product = Product.objects.get()
+    assert product.base_name == "Leatherwood Table"
+    assert product.variants.count() == 2
+
+
+@pytest.mark.django_db
+def test_populate_synthetic_catalog():
+    """Test every related table is populated consistently"""
+
+    generate(seed=3)
+
+    assert Product.objects.count() == 60
+    assert Variant.objects.count() >= 60
+    assert not Variant.objects.filter(images=None).exists()
+    assert Image.objects.count() >= 60
+    assert (
+        Product.objects.filter(delivery_time_status__isnull=True).count() == 0
+    )
+    assert Order.objects.count() == 30
+    for order in Order.objects.prefetch_related("items"):
+        assert order.total_amount == sum(
+            item.price * item.quantity for item in order.items.all()
+        )
+    assert OrderItem.objects.count() >= 30
+    assert Cart.objects.filter(items__isnull=False).exists()
+
+
+@pytest.mark.django_db
+def test_populate_is_deterministic():
+    """Test the same seed reproduces the same catalog"""
+
+    generate(seed=5)
+    first = snapshot()
+    for model in (Order, Product, Brand, Category, Image):
+        model.objects.all().delete()
+    generate(seed=5)
+
+    assert snapshot() == first
+    generate(seed=6)
+    assert snapshot()["products"][120:] != first["products"]
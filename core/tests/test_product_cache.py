@@ -0,0 +1,94 @@
+"""
+Test the versioned product detail response cache
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from core.cache import product_detail_cache
+from core.models import Image
+
+
+def get_detail(api_client, product):
+    """GET the product detail page"""
+
+    url = reverse("product-detail", kwargs={"pk": product.id})
+    response = api_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    return response
+
+
+@pytest.mark.django_db
+def test_second_read_is_served_from_cache(api_client, product_detail_obj):
+    """Test a repeated read is a hit and skips serialization queries"""
+
+    first = get_detail(api_client, product_detail_obj)
+    with CaptureQueriesContext(connection) as queries:
+        second = get_detail(api_client, product_detail_obj)
+
+    assert first["X-Cache"] == "MISS"
+    assert second["X-Cache"] == "HIT"
+    assert second.content == first.content
+    # only the conditional GET validators are read
+    assert len(queries) == 1
+    assert product_detail_cache.stats() == {"hits": 1, "misses": 1}
+
+
+@pytest.mark.django_db
+def test_product_save_invalidates(api_client, product_detail_obj):
+    """Test saving the product serves the new payload"""
+
+    get_detail(api_client, product_detail_obj)
+    product_detail_obj.base_name = "renamed"
+    product_detail_obj.save()
+
+    response = get_detail(api_client, product_detail_obj)
+    assert response["X-Cache"] == "MISS"
+    assert response.json()["base_name"] == "renamed"
+
+
+@pytest.mark.django_db
+def test_child_delete_invalidates(api_client, product_detail_obj):
+    """Test deleting a nested FAQ serves the new payload"""
+
+    get_detail(api_client, product_detail_obj)
+    product_detail_obj.faqs.first().delete()
+
+    response = get_detail(api_client, product_detail_obj)
+    assert len(response.json()["faqs"]) == 2
+
+
+@pytest.mark.django_db
+def test_variant_images_change_invalidates(api_client, product_detail_obj):
+    """Test adding, editing and deleting variant images invalidates"""
+
+    variant = product_detail_obj.variants.first()
+    image = Image.objects.create(url="https://img.local/a.jpg")
+    get_detail(api_client, product_detail_obj)
+
+    variant.images.add(image)
+    data = get_detail(api_client, product_detail_obj).json()
+    assert data["variants"][0]["images"] == [{"url": image.url}]
+
+    image.url = "https://img.local/b.jpg"
+    image.save()
+    data = get_detail(api_client, product_detail_obj).json()
+    assert data["variants"][0]["images"] == [{"url": image.url}]
+
+    image.delete()
+    data = get_detail(api_client, product_detail_obj).json()
+    assert data["variants"][0]["images"] == []
+
+
+@pytest.mark.django_db
+def test_brand_save_invalidates(api_client, product_detail_obj):
+    """Test renaming the brand retires cached products"""
+
+    get_detail(api_client, product_detail_obj)
+    product_detail_obj.brand.name = "rebranded"
+    product_detail_obj.brand.save()
+
+    response = get_detail(api_client, product_detail_obj)
+    assert response.json()["brand"]["name"] == "rebranded"
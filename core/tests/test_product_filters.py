@@ -0,0 +1,146 @@
+"""
+Test product filters and facet counts, GET /products/?..., /products/facets/
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from core.models import Brand, Product, Variant
+
+
+@pytest.fixture
+def catalog(category, brand):
+    """Three products with variants across colors, sizes and stock"""
+
+    other_brand = Brand.objects.create(name="other", description="other")
+    shirt = Product.objects.create(
+        base_name="shirt",
+        description="shirt",
+        base_price=20,
+        category=category,
+        brand=brand,
+    )
+    pants = Product.objects.create(
+        base_name="pants",
+        description="pants",
+        base_price=40,
+        category=category,
+        brand=brand,
+    )
+    hat = Product.objects.create(
+        base_name="hat",
+        description="hat",
+        base_price=10,
+        category=category,
+        brand=other_brand,
+    )
+    Variant.objects.bulk_create(
+        [
+            Variant(
+                product=shirt,
+                name="s1",
+                price=20,
+                color="Black",
+                size="M",
+                stock=0,
+            ),
+            Variant(
+                product=shirt,
+                name="s2",
+                price=25,
+                color="Red",
+                size="M",
+                stock=4,
+            ),
+            Variant(
+                product=pants,
+                name="p1",
+                price=40,
+                color="Black",
+                size="L",
+                stock=2,
+            ),
+            Variant(
+                product=hat,
+                name="h1",
+                price=10,
+                color="Red",
+                size="S",
+                stock=0,
+            ),
+        ]
+    )
+    return {"shirt": shirt, "pants": pants, "hat": hat, "brand": other_brand}
+
+
+def listed(api_client, **params):
+    response = api_client.get(reverse("product-list"), params)
+    assert response.status_code == status.HTTP_200_OK
+    return {item["base_name"] for item in response.data["results"]}
+
+
+@pytest.mark.django_db
+def test_filter_by_brand(api_client, catalog):
+    """Test ``?brand=`` accepts a comma separated list"""
+
+    assert listed(api_client, brand=catalog["brand"].id) == {"hat"}
+    brands = f"{catalog['brand'].id},{catalog['shirt'].brand_id}"
+    assert listed(api_client, brand=brands) == {"shirt", "pants", "hat"}
+
+
+@pytest.mark.django_db
+def test_variant_filters_match_one_variant(api_client, catalog):
+    """Test variant conditions must hold on the same variant"""
+
+    # the black shirt is out of stock, only its red variant is in stock
+    assert listed(api_client, color="Black", in_stock="true") == {"pants"}
+    assert listed(api_client, color="Black") == {"shirt", "pants"}
+    assert listed(api_client, in_stock="false") == {"hat"}
+    assert listed(api_client, min_price=15, max_price=30) == {"shirt"}
+
+
+@pytest.mark.django_db
+def test_facet_counts(api_client, catalog):
+    """Test facets exclude their own filter and count products"""
+
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get(
+            reverse("product-facets"), {"color": "Black"}
+        )
+    assert response.status_code == status.HTTP_200_OK
+    facets = response.data
+
+    # the color facet ignores ?color= so every color is offered
+    assert facets["color"] == [
+        {"value": "Black", "count": 2},
+        {"value": "Red", "count": 2},
+    ]
+    # the other facets count the two products with a black variant
+    assert facets["brand"] == [
+        {
+            "value": catalog["shirt"].brand_id,
+            "label": "test_brand",
+            "count": 2,
+        }
+    ]
+    assert facets["size"] == [
+        {"value": "L", "count": 1},
+        {"value": "M", "count": 1},
+    ]
+    assert facets["in_stock"] == [
+        {"value": True, "count": 1},
+        {"value": False, "count": 1},
+    ]
+    assert facets["price"] == {"min": "20.00", "max": "40.00"}
+    # one query per facet
+    assert len(queries) == 6
+
+
+@pytest.mark.django_db
+def test_facets_reject_invalid_filters(api_client, catalog):
+    """Test malformed filter values return 400"""
+
+    response = api_client.get(reverse("product-facets"), {"min_price": "x"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
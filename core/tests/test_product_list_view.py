@@ -0,0 +1,128 @@
+"""
+Test Product API, GET /products/
+"""
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from core.models import Product, Carousel
+
+
+@pytest.fixture
+def products(category, brand):
+    """Create five products, oldest first"""
+
+    return [
+        Product.objects.create(
+            base_name=f"product {index}",
+            description="listed product",
+            base_price=index + 1,
+            category=category,
+            brand=brand,
+        )
+        for index in range(5)
+    ]
+
+
+def collect_pages(api_client, url):
+    """Follow ``next`` links and return every listed product id"""
+
+    seen = []
+    while url:
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        seen.extend(item["id"] for item in response.data["results"])
+        url = response.data["next"]
+    return seen
+
+
+@pytest.mark.django_db
+def test_product_list_representation(api_client, products):
+    """Test the list returns the lightweight product representation"""
+
+    Carousel.objects.create(product=products[0], image="https://b.jpg")
+    Carousel.objects.create(
+        product=products[0], image="https://a.jpg", order=1
+    )
+    response = api_client.get(reverse("product-list"))
+    assert response.status_code == status.HTTP_200_OK
+    oldest = response.data["results"][-1]
+    assert oldest == {
+        "id": products[0].id,
+        "base_name": "product 0",
+        "base_price": "1.00",
+        "brand_name": "test_brand",
+        "category_name": "test_category",
+        "lead_image": "https://a.jpg",
+        "rating_average": 0.0,
+        "rating_count": 0,
+    }
+
+
+@pytest.mark.django_db
+def test_product_list_sparse_fieldset(api_client, products):
+    """Test ``?fields=`` limits the serialized fields"""
+
+    response = api_client.get(
+        reverse("product-list"), {"fields": "id,base_name,unknown"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.data["results"][0]) == {"id", "base_name"}
+
+
+@pytest.mark.django_db
+def test_product_list_cursor_pages(api_client, products):
+    """Test cursor pages walk every product newest first exactly once"""
+
+    url = reverse("product-list") + "?page_size=2"
+    seen = collect_pages(api_client, url)
+    assert seen == [product.id for product in reversed(products)]
+
+
+@pytest.mark.django_db
+def test_product_list_cursor_ties_on_created_at(api_client, products):
+    """Test products sharing ``created_at`` are ordered by id"""
+
+    Product.objects.update(created_at=products[0].created_at)
+    seen = collect_pages(api_client, reverse("product-list") + "?page_size=2")
+    assert seen == sorted(seen, reverse=True)
+    assert len(seen) == len(products)
+
+
+@pytest.mark.django_db
+def test_product_list_previous_page(api_client, products):
+    """Test the ``previous`` link returns the page before"""
+
+    first = api_client.get(reverse("product-list"), {"page_size": 2})
+    assert first.data["previous"] is None
+    second = api_client.get(first.data["next"])
+    back = api_client.get(second.data["previous"])
+    assert back.data["results"] == first.data["results"]
+    assert back.data["previous"] is None
+
+
+@pytest.mark.django_db
+def test_product_list_invalid_cursor(api_client, products):
+    """Test a malformed cursor returns 404"""
+
+    for cursor in (
+        "bogus",
+        # {"p": [null, null]}
+        "eyJwIjpbbnVsbCxudWxsXX0=",
+        # {"p": [[1], {"a": 1}]}
+        "eyJwIjogW1sxXSwgeyJhIjogMX1dfQ==",
+    ):
+        response = api_client.get(reverse("product-list"), {"cursor": cursor})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_product_retrieve_keeps_detail_payload(api_client, products):
+    """Test retrieve still uses the full product detail serializer"""
+
+    response = api_client.get(
+        reverse("product-detail", kwargs={"pk": products[0].id})
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert "variants" in response.data
+    assert response.data["brand"]["name"] == "test_brand"
@@ -0,0 +1,127 @@
+"""
+Test queryset planning for nested serializers
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from core.models import Product, Variant, Image
+from core.querysets import plan_for, plan_queryset
+from core.serializers import (
+    ProductDetailSerializer,
+    ProductListSerializer,
+    VariantSerializer,
+)
+
+
+def create_products(count, category, brand):
+    """Create ``count`` products with two imaged variants each"""
+
+    for index in range(count):
+        product = Product.objects.create(
+            base_name=f"product {index}",
+            description="planned product",
+            base_price=10,
+            category=category,
+            brand=brand,
+        )
+        for color in ("Black", "White"):
+            variant = Variant.objects.create(
+                product=product,
+                name=color,
+                price=5,
+                color=color,
+                stock=3,
+                size="M",
+            )
+            variant.images.add(
+                Image.objects.create(url=f"https://img.local/{variant.pk}.jpg")
+            )
+        product.specifications.create(name="Material", value="Wood")
+        product.faqs.create(question="Q?", answer="A")
+        product.carousel.create(image="https://img.local/c.jpg", order=1)
+
+
+def test_product_detail_plan():
+    """Test nested relations are joined or prefetched"""
+
+    plan = plan_for(ProductDetailSerializer)
+    assert set(plan.select_related) == {
+        "category",
+        "brand",
+        "delivery_time_status",
+    }
+    prefetched = dict(plan.prefetch_related)
+    assert set(prefetched) == {
+        "variants",
+        "specifications",
+        "compatibility",
+        "faqs",
+        "carousel",
+    }
+    assert [
+        lookup for lookup, _ in prefetched["variants"].prefetch_related
+    ] == ["images"]
+
+
+def test_variant_plan_follows_nested_joins():
+    """Test a nested FK serializer joins through its own relations"""
+
+    plan = plan_for(VariantSerializer)
+    assert set(plan.select_related) == {
+        "product",
+        "product__category",
+        "product__brand",
+    }
+    assert [lookup for lookup, _ in plan.prefetch_related] == ["images"]
+
+
+def test_dotted_sources_are_joined():
+    """Test ``source="brand.name"`` style fields join their relation"""
+
+    plan = plan_for(ProductListSerializer)
+    assert set(plan.select_related) == {"brand", "category"}
+    assert plan.prefetch_related == ()
+
+
+@pytest.mark.django_db
+def test_product_detail_query_count_is_constant(category, brand):
+    """Test serializing 1 or 10 full products costs the same queries"""
+
+    counts = []
+    for total in (1, 10):
+        Product.objects.all().delete()
+        create_products(total, category, brand)
+        with CaptureQueriesContext(connection) as queries:
+            queryset = plan_queryset(
+                Product.objects.all(), ProductDetailSerializer
+            )
+            data = ProductDetailSerializer(queryset, many=True).data
+        assert len(data) == total
+        assert len(data[0]["variants"][0]["images"]) == 1
+        counts.append(len(queries))
+
+    # products, variants, variant images, specifications,
+    # compatibility, faqs, carousel
+    assert counts == [7, 7]
+
+
+@pytest.mark.django_db
+def test_product_list_query_count_is_constant(api_client, category, brand):
+    """Test a product list page costs the same queries for 1 or 10"""
+
+    url = reverse("product-list")
+    counts = []
+    for total in (1, 10):
+        Product.objects.all().delete()
+        create_products(total, category, brand)
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == total
+        counts.append(len(queries))
+
+    # conditional GET validators, then the page itself
+    assert counts == [2, 2]
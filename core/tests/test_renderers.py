@@ -0,0 +1,127 @@
+"""
+Test the fast JSON renderer and parser against DRF's
+"""
+
+import datetime
+import decimal
+import io
+import os
+import subprocess
+import sys
+import textwrap
+import uuid
+from pathlib import Path
+import pytest
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from core import parsers
+from core import renderers as fast
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def backend(request, monkeypatch):
+    """Run a test with orjson and with the stdlib fallback"""
+
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(fast, "orjson", None)
+        monkeypatch.setattr(parsers, "orjson", None)
+    return request.param
+
+
+def test_renders_what_drf_renders(backend):
+    """Test decimals, dates and the other odd types come out alike"""
+
+    data = {
+        "price": decimal.Decimal("12.50"),
+        "created": datetime.datetime(
+            2024, 5, 1, 8, 30, 15, 250000, tzinfo=datetime.timezone.utc
+        ),
+        "naive": datetime.datetime(2024, 5, 1, 8, 30),
+        "day": datetime.date(2024, 5, 1),
+        "at": datetime.time(8, 30),
+        "took": datetime.timedelta(minutes=2),
+        "id": uuid.UUID(int=1),
+        "label": gettext_lazy("Not found."),
+        "text": "café\u2028line\u2029",
+        "items": [1, 2.5, None, True, {"nested": (1, 2)}],
+    }
+
+    rendered = fast.JSONRenderer().render(data)
+
+    assert rendered == renderers.JSONRenderer().render(data)
+
+
+def test_pretty_printing_is_left_to_drf(backend):
+    """Test an indent asked for in the media type is honoured"""
+
+    data = {"a": [1, 2]}
+    media_type = "application/json; indent=2"
+
+    assert fast.JSONRenderer().render(data, media_type) == (
+        renderers.JSONRenderer().render(data, media_type)
+    )
+
+
+def test_parses_bodies_like_drf(backend):
+    """Test valid bodies parse and broken ones raise a parse error"""
+
+    parser = parsers.JSONParser()
+    body = '{"name": "café", "price": 1.5, "tags": []}'.encode()
+
+    assert parser.parse(io.BytesIO(body)) == {
+        "name": "café",
+        "price": 1.5,
+        "tags": [],
+    }
+    wide = (
+        b'{"a": 123456789012345678901234567890, "b": [-9223372036854775809]}'
+    )
+    assert parser.parse(io.BytesIO(wide)) == {
+        "a": 123456789012345678901234567890,
+        "b": [-9223372036854775809],
+    }
+    assert fast.JSONRenderer().render(parser.parse(io.BytesIO(wide))) == (
+        b'{"a":123456789012345678901234567890,"b":[-9223372036854775809]}'
+    )
+    for broken in (b'{"name": ', b'{"price": NaN}'):
+        with pytest.raises(ParseError):
+            parser.parse(io.BytesIO(broken))
+
+
+@pytest.mark.django_db
+def test_responses_use_the_fast_renderer(api_client, product):
+    """Test API responses go through the configured renderer"""
+
+    response = api_client.get(reverse("product-detail", args=[product.pk]))
+
+    assert response.status_code == 200
+    assert isinstance(response.accepted_renderer, fast.JSONRenderer)
+    assert response.json()["base_price"] == "10.99"
+
+
+def test_without_orjson_installed():
+    """Test the stdlib path in an interpreter where orjson is missing"""
+
+    script = textwrap.dedent("""
+        import io, sys
+        sys.modules["orjson"] = None  # import orjson raises ImportError
+        import django
+        django.setup()
+        from core import parsers, renderers
+        assert renderers.orjson is None and parsers.orjson is None
+        data = parsers.JSONParser().parse(io.BytesIO(b'{"a": [1, 2.5]}'))
+        sys.stdout.write(renderers.JSONRenderer().render(data).decode())
+        """)
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        check=True,
+        cwd=Path(__file__).resolve().parents[2],
+        env={**os.environ, "DJANGO_SETTINGS_MODULE": "eshop_backend.settings"},
+        text=True,
+    )
+    assert result.stdout == '{"a":[1,2.5]}'
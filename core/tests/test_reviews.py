@@ -0,0 +1,188 @@
+"""
+Test Review API, /products/{id}/reviews/ and /reviews/{id}, and the
+product rating aggregates
+"""
+
+from io import StringIO
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from core import reviews
+from core.cache import product_detail_cache
+from core.images import upsert_images
+from core.models import Product, Review, User
+
+
+def aggregates(product):
+    product.refresh_from_db()
+    return (
+        product.rating_count,
+        product.rating_sum,
+        product.rating_average,
+        [getattr(product, f"rating_{n}_count") for n in reviews.RATINGS],
+    )
+
+
+@pytest.mark.django_db
+def test_create_review_updates_aggregates(auth_client, product):
+    """Test posting reviews counts them on the product"""
+
+    url = reverse("product-reviews", kwargs={"pk": product.pk})
+    for rating in (5, 4):
+        response = auth_client.post(
+            url,
+            {
+                "rating": rating,
+                "comment": "Sturdy",
+                "images": ["https://img.example.com/a.jpg"],
+            },
+            format="json",
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+    assert response.data["reviewer"] == "test1"
+    assert response.data["images"] == [
+        {"url": "https://img.example.com/a.jpg"}
+    ]
+    assert aggregates(product) == (2, 9, 4.5, [0, 0, 0, 1, 1])
+
+
+@pytest.mark.django_db
+def test_create_review_validation(auth_client, api_client, product):
+    """Test ratings outside 1-5 and anonymous reviews are rejected"""
+
+    url = reverse("product-reviews", kwargs={"pk": product.pk})
+    response = auth_client.post(url, {"rating": 6, "comment": "x"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    auth_client.force_authenticate(user=None)
+    response = api_client.post(url, {"rating": 5, "comment": "x"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert aggregates(product)[0] == 0
+
+
+@pytest.mark.django_db
+def test_update_and_delete_review(auth_client, user, product):
+    """Test editing moves the rating between buckets, deleting removes it"""
+
+    review = reviews.create_review(product, user, 2, "Wobbly")
+    reviews.create_review(product, user, 4, "Fine")
+    url = reverse("review-detail", kwargs={"pk": review.pk})
+
+    response = auth_client.patch(url, {"rating": 5}, format="json")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["comment"] == "Wobbly"
+    assert aggregates(product) == (2, 9, 4.5, [0, 0, 0, 1, 1])
+
+    response = auth_client.delete(url)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert aggregates(product) == (1, 4, 4.0, [0, 0, 0, 1, 0])
+    # deleting again is a 404, not a second decrement
+    assert auth_client.delete(url).status_code == status.HTTP_404_NOT_FOUND
+    assert aggregates(product)[0] == 1
+
+
+@pytest.mark.django_db
+def test_only_reviewer_can_edit(auth_client, product):
+    """Test another user's review can not be edited"""
+
+    other = User.objects.create(username="other", email="o@example.com")
+    review = reviews.create_review(product, other, 3, "Mine")
+    url = reverse("review-detail", kwargs={"pk": review.pk})
+    response = auth_client.patch(url, {"rating": 1}, format="json")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_review_list_pages_newest_first(
+    api_client, user, product, django_assert_num_queries
+):
+    """Test reviews are listed with a constant number of queries"""
+
+    created = [
+        reviews.create_review(product, user, 5, f"review {n}")
+        for n in range(5)
+    ]
+    for review in created:
+        review.images.set(upsert_images(["https://a.jpg"])[0].values())
+    url = reverse("product-reviews", kwargs={"pk": product.pk})
+
+    seen = []
+    page_url = f"{url}?page_size=2"
+    while page_url:
+        # product, reviews with reviewer, images
+        with django_assert_num_queries(3):
+            response = api_client.get(page_url)
+        assert response.status_code == status.HTTP_200_OK
+        seen.extend(item["id"] for item in response.data["results"])
+        page_url = response.data["next"]
+    assert seen == [review.pk for review in reversed(created)]
+
+
+@pytest.mark.django_db
+def test_product_list_orders_by_rating(api_client, user, category, brand):
+    """Test ``?ordering=rating`` lists the best rated products first"""
+
+    products = [
+        Product.objects.create(
+            base_name=f"product {n}",
+            description="rated",
+            base_price=1,
+            category=category,
+            brand=brand,
+        )
+        for n in range(3)
+    ]
+    for product, ratings in zip(products, ([3], [5, 5], [5])):
+        for rating in ratings:
+            reviews.create_review(product, user, rating, "ok")
+
+    seen, url = [], reverse("product-list") + "?ordering=rating&page_size=1"
+    while url:
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        seen.extend(item["id"] for item in response.data["results"])
+        url = response.data["next"]
+    assert seen == [products[1].pk, products[2].pk, products[0].pk]
+
+    response = api_client.get(reverse("product-list"), {"ordering": "price"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_reconcile_ratings(user, product):
+    """Test the command rebuilds aggregates of bulk created reviews"""
+
+    reviews.create_review(product, user, 1, "Broke")
+    Review.objects.bulk_create(
+        [
+            Review(product=product, reviewer=user, rating=5, comment="Great")
+            for _ in range(3)
+        ]
+    )
+    out = StringIO()
+    call_command("reconcile_ratings", "--batch-size", "1", stdout=out)
+    assert "1 products had stale ratings" in out.getvalue()
+    assert aggregates(product) == (4, 16, 4.0, [1, 0, 0, 0, 3])
+
+    out = StringIO()
+    call_command("reconcile_ratings", stdout=out)
+    assert "0 products had stale ratings" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_review_invalidates_after_commit(
+    user, product, django_capture_on_commit_callbacks
+):
+    """Test a read before the commit can not cache under the new version"""
+
+    key = product_detail_cache.key(product.pk)
+    with django_capture_on_commit_callbacks(execute=True):
+        review = reviews.create_review(product, user, 4, "Fine")
+        assert product_detail_cache.key(product.pk) == key
+    assert product_detail_cache.key(product.pk) != key
+
+    key = product_detail_cache.key(product.pk)
+    with django_capture_on_commit_callbacks(execute=True):
+        reviews.delete_review(review)
+        assert product_detail_cache.key(product.pk) == key
+    assert product_detail_cache.key(product.pk) != key
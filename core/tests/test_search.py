@@ -0,0 +1,186 @@
+"""
+Test product full-text search, GET /products/search/
+"""
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from core import search
+from core.models import Brand, Product, Tag
+
+
+@pytest.fixture
+def catalog(category, brand):
+    """Create products with distinguishable text"""
+
+    table = Product.objects.create(
+        base_name="Oak dining table",
+        description="Solid oak table for six",
+        base_price=300,
+        category=category,
+        brand=brand,
+    )
+    lamp = Product.objects.create(
+        base_name="Desk lamp",
+        description="LED lamp, fits any table",
+        base_price=40,
+        category=category,
+        brand=brand,
+    )
+    chair = Product.objects.create(
+        base_name="Office chair",
+        description="Ergonomic chair",
+        base_price=120,
+        category=category,
+        brand=brand,
+    )
+    chair.tags.add(Tag.objects.create(name="ergonomic"))
+    chair.specifications.create(name="Material", value="Mesh")
+    return {"table": table, "lamp": lamp, "chair": chair}
+
+
+def search_ids(api_client, query):
+    response = api_client.get(reverse("product-search"), {"q": query})
+    assert response.status_code == status.HTTP_200_OK
+    return [item["id"] for item in response.data["results"]]
+
+
+def test_tokenize():
+    """Test tokens are lower-cased and split on punctuation"""
+
+    assert search.tokenize("LED-lamp, fits_any") == [
+        "led",
+        "lamp",
+        "fits",
+        "any",
+    ]
+
+
+@pytest.mark.django_db
+def test_uses_fts5_on_sqlite():
+    """Test the FTS5 table is created on migrate"""
+
+    assert search.get_backend() is search.fts5_backend
+
+
+@pytest.mark.django_db
+def test_search_ranks_name_matches_first(api_client, catalog):
+    """Test a name match outranks a description match"""
+
+    assert search_ids(api_client, "table") == [
+        catalog["table"].id,
+        catalog["lamp"].id,
+    ]
+
+
+@pytest.mark.django_db
+def test_search_tags_and_specifications(api_client, catalog):
+    """Test tags and specifications are searchable and kept in sync"""
+
+    assert search_ids(api_client, "mesh") == [catalog["chair"].id]
+    Tag.objects.create(name="mesh").products.add(catalog["lamp"])
+    assert set(search_ids(api_client, "mesh")) == {
+        catalog["chair"].id,
+        catalog["lamp"].id,
+    }
+
+
+@pytest.mark.django_db
+def test_search_follows_updates_and_deletes(api_client, catalog):
+    """Test renamed and deleted products are reindexed"""
+
+    catalog["chair"].base_name = "Gaming throne"
+    catalog["chair"].save()
+    assert search_ids(api_client, "throne") == [catalog["chair"].id]
+
+    catalog["chair"].delete()
+    assert search_ids(api_client, "throne") == []
+
+
+@pytest.mark.django_db
+def test_search_ignores_query_syntax(api_client, catalog):
+    """Test FTS5 operators in user input are treated as text"""
+
+    assert search_ids(api_client, 'table" OR NEAR(*') == [
+        catalog["table"].id,
+        catalog["lamp"].id,
+    ]
+
+
+@pytest.mark.django_db
+def test_search_requires_query(api_client):
+    """Test an empty query is rejected"""
+
+    response = api_client.get(reverse("product-search"))
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_in_memory_backend_matches_fts5(catalog):
+    """Test the pure-Python fallback ranks like FTS5"""
+
+    backend = search.InMemorySearchBackend()
+    ranked = [pk for pk, _ in backend.search("oak table")]
+    assert ranked == [pk for pk, _ in search.fts5_backend.search("oak table")]
+
+    table_id = catalog["table"].id
+    catalog["table"].delete()
+    backend.remove([table_id])
+    assert [pk for pk, _ in backend.search("oak table")] == [
+        catalog["lamp"].id
+    ]
+
+
+@pytest.mark.django_db
+def test_rebuild_search_index_command(api_client, catalog):
+    """Test the rebuild command restores rows written without signals"""
+
+    Product.objects.filter(pk=catalog["lamp"].id).update(base_name="Torch")
+    assert search_ids(api_client, "torch") == []
+    call_command("rebuild_search_index", batch_size=2, stdout=None)
+    assert search_ids(api_client, "torch") == [catalog["lamp"].id]
+
+
+@pytest.mark.django_db
+def test_in_memory_backend_sees_other_processes(settings, catalog):
+    """Test an index built before another process's write is rebuilt"""
+
+    settings.SEARCH_INDEX_CHECK_INTERVAL = 0
+    backend = search.InMemorySearchBackend()
+    assert backend.search("throne") == []
+
+    # the signal handlers update this process's backend, not ``backend``
+    catalog["chair"].base_name = "Gaming throne"
+    catalog["chair"].save()
+    assert [pk for pk, _ in backend.search("throne")] == [catalog["chair"].id]
+
+    settings.SEARCH_INDEX_CHECK_INTERVAL = 60
+    catalog["lamp"].specifications.create(name="Bulb", value="Halogen")
+    assert backend.search("halogen") == []
+
+
+@pytest.mark.django_db
+def test_brand_rename_reindexes_after_commit(
+    api_client, catalog, brand, django_capture_on_commit_callbacks
+):
+    """Test a brand rename reindexes its products once it commits"""
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        brand.name = "Zenith"
+        brand.save()
+        assert search_ids(api_client, "zenith") == []
+    assert len(callbacks) == 1
+    callbacks[0]()
+    assert sorted(search_ids(api_client, "zenith")) == sorted(
+        product.id for product in catalog.values()
+    )
+
+    # edits leaving the name alone reindex nothing
+    with django_capture_on_commit_callbacks() as callbacks:
+        brand.save(update_fields=["updated_at"])
+    assert callbacks == []
+
+    Brand.objects.filter(pk=brand.pk).update(name="Apex")
+    search.reindex_catalog(batch_size=2, brand=brand.pk)
+    assert len(search_ids(api_client, "apex")) == 3
@@ -0,0 +1,177 @@
+"""
+Test Tag API, /tags/ and /tags/{slug}/products/, and the migration of
+the legacy tag rows
+"""
+
+import pytest
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.urls import reverse
+from rest_framework import status
+from core import tags
+from core.models import Product, ProductTag, Tag
+
+
+@pytest.fixture
+def products(category, brand):
+    """Five products, oldest first"""
+
+    return [
+        Product.objects.create(
+            base_name=f"product {index}",
+            description="tagged product",
+            base_price=index + 1,
+            category=category,
+            brand=brand,
+        )
+        for index in range(5)
+    ]
+
+
+@pytest.mark.django_db
+def test_link_tags_dedupes_names(products):
+    """Test names differing in case or spacing share one tag"""
+
+    count = tags.link_tags(
+        [
+            (products[0].pk, "Standing  Desk"),
+            (products[0].pk, "standing desk"),
+            (products[1].pk, " Standing Desk "),
+            (products[1].pk, "   "),
+        ]
+    )
+    assert count == 2
+    assert list(Tag.objects.values_list("name", "slug")) == [
+        ("Standing Desk", "standing-desk")
+    ]
+    assert ProductTag.objects.count() == 2
+    # linking again changes nothing
+    tags.link_tags([(products[0].pk, "STANDING DESK")])
+    assert ProductTag.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_link_tags_keeps_distinct_names_apart(api_client, products):
+    """Test names sharing a slug stay distinct tags, in any script"""
+
+    tags.link_tags(
+        [
+            (products[0].pk, "C"),
+            (products[1].pk, "C++"),
+            (products[2].pk, "C#"),
+            (products[3].pk, "Café"),
+            (products[3].pk, "CAFÉ"),
+            (products[4].pk, "!!!"),
+        ]
+    )
+    assert dict(Tag.objects.values_list("name", "slug")) == {
+        "C": "c",
+        "C++": "c-2",
+        "C#": "c-3",
+        "Café": "café",
+        "!!!": "tag",
+    }
+    # a later tag with a taken slug gets the next free suffix
+    Tag.objects.create(name="C--")
+    assert Tag.objects.get(name="C--").slug == "c-4"
+
+    response = api_client.get(reverse("tag-products", kwargs={"slug": "café"}))
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["id"] for item in response.data["results"]] == [
+        products[3].pk
+    ]
+
+
+@pytest.mark.django_db
+def test_tag_products_pages(api_client, products, django_assert_num_queries):
+    """Test a tag's products are paged newest first with a fixed query count"""
+
+    tags.link_tags((product.pk, "desk") for product in products[1:])
+    tags.link_tags([(products[0].pk, "lamp")])
+    url = reverse("tag-products", kwargs={"slug": "desk"}) + "?page_size=2"
+
+    seen = []
+    while url:
+        # tag, products with their brand, category and lead image
+        with django_assert_num_queries(2):
+            response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        seen.extend(item["id"] for item in response.data["results"])
+        url = response.data["next"]
+    assert seen == [product.pk for product in reversed(products[1:])]
+
+    response = api_client.get(
+        reverse("tag-products", kwargs={"slug": "missing"})
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_tag_cloud_is_cached(api_client, products, django_assert_num_queries):
+    """Test the cloud counts products per tag and is served from cache"""
+
+    tags.link_tags((product.pk, "desk") for product in products)
+    tags.link_tags([(products[0].pk, "lamp")])
+    url = reverse("tag-cloud")
+
+    response = api_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == [
+        {"name": "desk", "slug": "desk", "count": 5},
+        {"name": "lamp", "slug": "lamp", "count": 1},
+    ]
+    with django_assert_num_queries(0):
+        assert api_client.get(url, {"limit": 1}).data == response.data[:1]
+
+    Tag.objects.get(slug="lamp").products.add(products[1])
+    assert api_client.get(url).data[1]["count"] == 2
+    ProductTag.objects.filter(tag__slug="desk").first().delete()
+    assert api_client.get(url).data[0]["count"] == 4
+
+
+@pytest.mark.django_db
+def test_migration_merges_legacy_tags(settings, products):
+    """Test legacy per-product rows become shared tags without repeats"""
+
+    # the suite runs with --nomigrations, load the real ones
+    settings.MIGRATION_MODULES = {}
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    state = loader.project_state(("core", "0002_catalog_schema"))
+    copy = loader.get_migration("core", "0003_copy_legacy_tags").operations[0]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TABLE core_tags (id integer PRIMARY KEY, "
+            "product_id integer, tag_name varchar(255), "
+            "created_at datetime, updated_at datetime)"
+        )
+    Tags = state.apps.get_model("core", "Tags")
+    for product, name in [
+        (products[0], "Oak"),
+        (products[0], "oak"),
+        (products[1], "oak "),
+        (products[1], "Walnut"),
+        (products[2], "Oak"),
+        (products[2], "C"),
+        (products[3], "C++"),
+        (products[3], "Café"),
+        (products[4], "CAFÉ"),
+        (products[4], " "),
+    ]:
+        Tags.objects.create(product_id=product.pk, tag_name=name)
+    Tag.objects.create(name="walnut oil")
+    Tag.objects.create(name="Oak", slug="oak-trees")
+
+    copy.code(state.apps, connection.schema_editor())
+
+    assert dict(Tag.objects.values_list("name", "slug")) == {
+        "walnut oil": "walnut-oil",
+        "Oak": "oak-trees",
+        "Walnut": "walnut",
+        "C": "c",
+        "C++": "c-2",
+        "Café": "café",
+    }
+    assert Tag.objects.get(slug="oak-trees").products.count() == 3
+    assert Tag.objects.get(slug="café").products.count() == 2
+    assert ProductTag.objects.count() == 8
@@ -0,0 +1,118 @@
+"""
+Test the refresh token blacklist, its Bloom filter and pruning
+"""
+
+import time
+from datetime import timedelta
+from io import StringIO
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.blacklist import BloomFilter, TokenBlacklist
+from core.models import BlacklistedToken
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test every added item is found and few others are"""
+
+    bloom = BloomFilter(1000, error_rate=0.01)
+    for index in range(1000):
+        bloom.add(f"added-{index}")
+    assert all(f"added-{index}" in bloom for index in range(1000))
+    false_positives = sum(f"other-{index}" in bloom for index in range(5000))
+    assert false_positives < 5000 * 0.03
+
+
+@pytest.mark.django_db
+def test_unknown_jti_skips_the_table():
+    """Test a jti outside the filter is answered without a query"""
+
+    blacklist = TokenBlacklist(capacity=100)
+    blacklist.add("revoked", timezone.now() + timedelta(days=1))
+
+    with CaptureQueriesContext(connection) as captured:
+        assert "revoked" in blacklist
+    assert len(captured) == 1
+    with CaptureQueriesContext(connection) as captured:
+        assert "unknown" not in blacklist
+    assert len(captured) == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_filter_is_built_off_the_request_path(settings):
+    """Test checks use the index until the background build is ready"""
+
+    settings.TOKEN_BLACKLIST_BACKGROUND_LOAD = True
+    BlacklistedToken.objects.create(
+        jti="revoked", expires_at=timezone.now() + timedelta(days=1)
+    )
+    blacklist = TokenBlacklist(capacity=100)
+
+    with CaptureQueriesContext(connection) as captured:
+        assert "unknown" not in blacklist
+        assert "revoked" in blacklist
+    assert len(captured) == 2
+
+    deadline = time.monotonic() + 5
+    while True:
+        with CaptureQueriesContext(connection) as captured:
+            assert "unknown" not in blacklist
+        if not captured or time.monotonic() > deadline:
+            break
+        time.sleep(0.01)
+    assert len(captured) == 0
+    assert "revoked" in blacklist
+
+
+@pytest.mark.django_db
+def test_filter_syncs_rows_added_elsewhere(settings):
+    """Test rows written by another process reach the filter"""
+
+    settings.TOKEN_BLACKLIST_SYNC_INTERVAL = 0
+    blacklist = TokenBlacklist(capacity=100)
+    assert "elsewhere" not in blacklist
+    BlacklistedToken.objects.create(
+        jti="elsewhere", expires_at=timezone.now() + timedelta(days=1)
+    )
+    assert "elsewhere" in blacklist
+
+
+@pytest.mark.django_db
+def test_rotated_refresh_token_is_refused(api_client, user):
+    """Test a refresh token can not be used again after rotation"""
+
+    refresh = str(RefreshToken.for_user(user))
+    response = api_client.post(reverse("token_refresh"), {"refresh": refresh})
+    assert response.status_code == 200
+    assert response.json()["refresh"] != refresh
+
+    response = api_client.post(reverse("token_refresh"), {"refresh": refresh})
+    assert response.status_code == 401
+    response = api_client.post(reverse("token_verify"), {"token": refresh})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_prune_token_blacklist():
+    """Test only expired rows are pruned, in batches"""
+
+    now = timezone.now()
+    BlacklistedToken.objects.bulk_create(
+        [
+            BlacklistedToken(jti=f"old-{index}", expires_at=now - timedelta(1))
+            for index in range(5)
+        ]
+        + [BlacklistedToken(jti="live", expires_at=now + timedelta(1))]
+    )
+
+    out = StringIO()
+    call_command("prune_token_blacklist", "--batch-size", "2", stdout=out)
+
+    assert "5 expired tokens pruned" in out.getvalue()
+    assert list(BlacklistedToken.objects.values_list("jti", flat=True)) == [
+        "live"
+    ]
@@ -2,10 +2,20 @@
 URL enpoints to core App
 """
 
-from django.urls import path
+from django.urls import path, register_converter
+from django.urls.converters import SlugConverter
 from rest_framework import routers
+from core.async_views import (
+    AsyncBrandDetailView,
+    AsyncBrandListView,
+    AsyncCategoryDetailView,
+    AsyncCategoryListView,
+    AsyncProductDetailView,
+    AsyncProductListView,
+)
 from core.views import (
     HealthCheckView,
+    ReadinessView,
     RegisterUserView,
     ProfileView,
     CategoryListAPIView,
@@ -14,14 +24,33 @@ from core.views import (
     BrandDetailAPIView,
     BrandPartialUpdateAPIView,
     ProductAPIViewset,
+    ReviewDetailAPIView,
+    TagCloudView,
+    TagProductListView,
+    CartView,
+    CartItemListAPIView,
+    CartItemDetailAPIView,
+    CheckoutView,
+    OrderViewSet,
 )
 
 
+class UnicodeSlugConverter(SlugConverter):
+    """Slugs in any script, as ``slugify(allow_unicode=True)`` makes them"""
+
+    regex = r"[-\w]+"
+
+
+register_converter(UnicodeSlugConverter, "unicode_slug")
+
 router = routers.DefaultRouter()
 router.register(r"products", ProductAPIViewset)
+router.register(r"orders", OrderViewSet)
 
 urlpatterns = [
     path("health/", HealthCheckView.as_view(), name="health-check"),
+    path("health/live/", HealthCheckView.as_view(), name="liveness"),
+    path("health/ready/", ReadinessView.as_view(), name="readiness"),
     path("register/", RegisterUserView.as_view(), name="register"),
     path("profile/", ProfileView.as_view(), name="user-profile"),
     path("categories/", CategoryListAPIView.as_view(), name="category-list"),
@@ -41,6 +70,52 @@ urlpatterns = [
         BrandPartialUpdateAPIView.as_view(),
         name="partial-update-brand",
     ),
+    path(
+        "reviews/<int:pk>", ReviewDetailAPIView.as_view(), name="review-detail"
+    ),
+    path("tags/", TagCloudView.as_view(), name="tag-cloud"),
+    path(
+        "tags/<unicode_slug:slug>/products/",
+        TagProductListView.as_view(),
+        name="tag-products",
+    ),
+    path("cart/", CartView.as_view(), name="cart"),
+    path("cart/items/", CartItemListAPIView.as_view(), name="cart-items"),
+    path(
+        "cart/items/<int:variant_id>",
+        CartItemDetailAPIView.as_view(),
+        name="cart-item-detail",
+    ),
+    path("checkout/", CheckoutView.as_view(), name="checkout"),
+    # async catalog reads, for ASGI deployments
+    path(
+        "async/categories/",
+        AsyncCategoryListView.as_view(),
+        name="async-category-list",
+    ),
+    path(
+        "async/category-detail/<int:pk>",
+        AsyncCategoryDetailView.as_view(),
+        name="async-category-detail",
+    ),
+    path(
+        "async/brands/", AsyncBrandListView.as_view(), name="async-brand-list"
+    ),
+    path(
+        "async/brand-detail/<int:pk>",
+        AsyncBrandDetailView.as_view(),
+        name="async-brand-detail",
+    ),
+    path(
+        "async/products/",
+        AsyncProductListView.as_view(),
+        name="async-product-list",
+    ),
+    path(
+        "async/products/<int:pk>/",
+        AsyncProductDetailView.as_view(),
+        name="async-product-detail",
+    ),
 ]
 
 urlpatterns += router.urls
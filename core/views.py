@@ -2,22 +2,75 @@
 URL endpoint API response views
 """
 
-from rest_framework import generics, viewsets
+from rest_framework import generics, serializers, viewsets
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.generics import GenericAPIView
 from rest_framework.mixins import UpdateModelMixin
 from rest_framework import status
-from rest_framework import permissions
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from core.models import User, Category, Brand, Product
+from rest_framework import exceptions, permissions
+from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.crypto import constant_time_compare
+from django.views import View
+from core import cart as carts
+from core import metrics
+from core.authentication import JWTAuthentication
+from core import checkout
+from core.cache import product_detail_cache
+from core import reviews
+from core import search
+from core.conditional import conditional_get
+from core.db import primary_reads, replica_reads
+from core.health import health_checker
+from core.filters import OrderFilter, ProductFilter, facet_counts
+from core.models import (
+    User,
+    Order,
+    Category,
+    Brand,
+    Product,
+    Variant,
+    Specification,
+    Compatibility,
+    DeliveryTimeStatus,
+    Faq,
+    Carousel,
+    Image,
+    OrderItem,
+    Review,
+    Tag,
+)
+from core.pagination import (
+    OrderCursorPagination,
+    ProductCursorPagination,
+    ReviewCursorPagination,
+    TagProductCursorPagination,
+)
+from core.querysets import annotate_lead_image, plan_queryset
+from core import tags
 from core.serializers import (
     RegisterSerializer,
     UserSerializer,
     CategorySerializer,
     BrandSerializer,
     ProductSerializer,
+    ProductListSerializer,
     ProductDetailSerializer,
+    CartSerializer,
+    CartItemCreateSerializer,
+    CartItemQuantitySerializer,
+    CheckoutSerializer,
+    OrderSerializer,
+    OrderSummarySerializer,
+    ReviewSerializer,
+    ReviewWriteSerializer,
 )
 
 
@@ -36,6 +89,57 @@ class HealthCheckView(APIView):
         return Response(health_data, status=status.HTTP_200_OK)
 
 
+class ReadinessView(APIView):
+    """
+    Returns 200 when the database, migrations, cache and disk are usable
+    and 503 otherwise, see core/health.py.
+    """
+
+    permission_classes = (permissions.AllowAny,)
+
+    def get(self, request):
+        healthy, checks = health_checker.run()
+        return Response(
+            {
+                "status": "ready" if healthy else "unavailable",
+                "checks": checks,
+            },
+            status=(
+                status.HTTP_200_OK
+                if healthy
+                else status.HTTP_503_SERVICE_UNAVAILABLE
+            ),
+        )
+
+
+class MetricsView(View):
+    """
+    Metrics of every worker in the Prometheus text format, for scrapers
+    presenting ``METRICS_TOKEN`` as a bearer token and for admin users.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not self.allowed(request):
+            response = HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+            response["WWW-Authenticate"] = 'Bearer realm="metrics"'
+            return response
+        return HttpResponse(
+            metrics.REGISTRY.expose(), content_type=metrics.CONTENT_TYPE
+        )
+
+    @staticmethod
+    def allowed(request):
+        header = request.META.get("HTTP_AUTHORIZATION", "")
+        token = getattr(settings, "METRICS_TOKEN", None)
+        if token and constant_time_compare(header, f"Bearer {token}"):
+            return True
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            return False
+        return result is not None and result[0].is_staff
+
+
 class RegisterUserView(generics.CreateAPIView):
     """Register a new user"""
 
@@ -60,6 +164,10 @@ class CategoryListAPIView(APIView):
     API endpoint for managing categories.
     """
 
+    def get_conditional_querysets(self, request, *args, **kwargs):
+        return [Category.objects.all()]
+
+    @conditional_get
     def get(self, request, *args, **kwargs):
         categories = Category.objects.all()
         serializer = CategorySerializer(categories, many=True)
@@ -86,6 +194,10 @@ class CategoryDetailAPIView(APIView):
         except Category.MultipleObjectsReturned:
             return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def get_conditional_querysets(self, request, pk, *args, **kwargs):
+        return [Category.objects.filter(pk=pk)]
+
+    @conditional_get
     def get(self, request, pk, *args, **kwargs):
         category = self.get_object(pk)
         serializer = CategorySerializer(category)
@@ -110,6 +222,10 @@ class BrandListAPIView(APIView):
     API endpoint for managing brands.
     """
 
+    def get_conditional_querysets(self, request, *args, **kwargs):
+        return [Brand.objects.all()]
+
+    @conditional_get
     def get(self, request, *args, **kwargs):
 
         brands = Brand.objects.all()
@@ -138,6 +254,10 @@ class BrandDetailAPIView(APIView):
         except Brand.MultipleObjectsReturned:
             return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def get_conditional_querysets(self, request, pk, *args, **kwargs):
+        return [Brand.objects.filter(pk=pk)]
+
+    @conditional_get
     def get(self, request, pk, *args, **kwargs):
         brand = self.get_object(pk)
         serializer = BrandSerializer(brand)
@@ -177,8 +297,352 @@ class BrandPartialUpdateAPIView(GenericAPIView, UpdateModelMixin):
 class ProductAPIViewset(viewsets.ModelViewSet):
     """
     API endpoint for managing products.
+
+    Safe requests read from the read replica when one is configured.
     """
 
     queryset = Product.objects.all()
     serializer_class = ProductDetailSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = ProductCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProductFilter
+
+    search_limit = 20
+    max_search_limit = 100
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in permissions.SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+    def get_serializer_class(self):
+        if self.action in ("list", "search"):
+            return ProductListSerializer
+        if self.action == "reviews":
+            return ReviewSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "reviews":
+            return queryset
+        if self.action in ("list", "search"):
+            queryset = annotate_lead_image(queryset)
+        return plan_queryset(queryset, self.get_serializer_class())
+
+    def get_conditional_querysets(self, request, *args, **kwargs):
+        if self.action == "list":
+            return [
+                Product.objects.all(),
+                Brand.objects.all(),
+                Category.objects.all(),
+                Carousel.objects.all(),
+                Variant.objects.all(),
+            ]
+        try:
+            pk = Product._meta.pk.to_python(
+                self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            )
+        except ValidationError:
+            # as get_object_or_404 would, before the lookup reaches SQL
+            raise Http404
+        return [
+            Product.objects.filter(pk=pk),
+            Brand.objects.filter(products=pk),
+            Category.objects.filter(products=pk),
+            Variant.objects.filter(product=pk),
+            Image.objects.filter(variant_images__product=pk),
+            Specification.objects.filter(product=pk),
+            Compatibility.objects.filter(product=pk),
+            DeliveryTimeStatus.objects.filter(product=pk),
+            Faq.objects.filter(product=pk),
+            Carousel.objects.filter(product=pk),
+        ]
+
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if (
+            not str(lookup).isdigit()
+            or renderer.format != "json"
+            or request.accepted_media_type != renderer.media_type
+        ):
+            return super().retrieve(request, *args, **kwargs)
+
+        key = product_detail_cache.key(int(lookup))
+        content = product_detail_cache.get(key)
+        if content is not None:
+            response = HttpResponse(content, content_type=renderer.media_type)
+            response["X-Cache"] = "HIT"
+            return response
+
+        # the version was bumped on the primary; a lagging replica would
+        # cache the old payload under it
+        with primary_reads():
+            response = super().retrieve(request, *args, **kwargs)
+        response.add_post_render_callback(
+            lambda rendered: product_detail_cache.set(key, rendered.content)
+        )
+        response["X-Cache"] = "MISS"
+        return response
+
+    @action(detail=False, methods=["get"])
+    def search(self, request, *args, **kwargs):
+        """Rank products matching ``?q=`` with BM25"""
+
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            raise serializers.ValidationError({"q": "This field is required."})
+        try:
+            limit = int(request.query_params.get("limit", self.search_limit))
+        except ValueError:
+            limit = self.search_limit
+        limit = min(max(limit, 1), self.max_search_limit)
+
+        ranked = search.get_backend().search(query, limit=limit)
+        products = self.get_queryset().in_bulk([pk for pk, _ in ranked])
+        results = []
+        for pk, score in ranked:
+            if pk in products:
+                data = self.get_serializer(products[pk]).data
+                data["score"] = round(score, 4)
+                results.append(data)
+        return Response({"query": query, "results": results})
+
+    @action(detail=False, methods=["get"])
+    def facets(self, request, *args, **kwargs):
+        """Product counts per filter value for the current filters"""
+
+        filterset = self.filterset_class(
+            request.query_params,
+            queryset=Product.objects.all(),
+            request=request,
+        )
+        if not filterset.is_valid():
+            raise serializers.ValidationError(filterset.errors)
+        return Response(facet_counts(filterset))
+
+    @action(
+        detail=True,
+        methods=["get", "post"],
+        pagination_class=ReviewCursorPagination,
+    )
+    def reviews(self, request, *args, **kwargs):
+        """A product's reviews, newest first, or add one"""
+
+        product = self.get_object()
+        if request.method == "POST":
+            serializer = ReviewWriteSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            review = reviews.create_review(
+                product, request.user, **serializer.validated_data
+            )
+            review = plan_queryset(Review.objects.all(), ReviewSerializer).get(
+                pk=review.pk
+            )
+            return Response(
+                ReviewSerializer(review).data, status=status.HTTP_201_CREATED
+            )
+
+        queryset = plan_queryset(
+            Review.objects.filter(product=product), ReviewSerializer
+        )
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(
+            self.get_serializer(page, many=True).data
+        )
+
+
+class ReviewDetailAPIView(APIView):
+    """
+    API endpoint for editing or deleting one of the user's reviews.
+    """
+
+    def get_review(self, request, pk):
+        return get_object_or_404(Review, pk=pk, reviewer=request.user)
+
+    def patch(self, request, pk, *args, **kwargs):
+        serializer = ReviewWriteSerializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        review = reviews.update_review(
+            self.get_review(request, pk), **serializer.validated_data
+        )
+        review = plan_queryset(Review.objects.all(), ReviewSerializer).get(
+            pk=review.pk
+        )
+        return Response(ReviewSerializer(review).data)
+
+    def delete(self, request, pk, *args, **kwargs):
+        reviews.delete_review(self.get_review(request, pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TagCloudView(APIView):
+    """
+    API endpoint for the most used tags with their product counts.
+    """
+
+    permission_classes = (permissions.AllowAny,)
+    default_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = min(max(limit, 1), tags.TAG_CLOUD_SIZE)
+        return Response(tags.tag_cloud(limit))
+
+
+class TagProductListView(generics.ListAPIView):
+    """
+    API endpoint for the products carrying a tag, newest first.
+    """
+
+    serializer_class = ProductListSerializer
+    permission_classes = (permissions.AllowAny,)
+    pagination_class = TagProductCursorPagination
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+    def get_queryset(self):
+        tag = get_object_or_404(Tag, slug=self.kwargs["slug"])
+        queryset = annotate_lead_image(
+            Product.objects.filter(product_tags__tag=tag).annotate(
+                tagged_product_id=F("product_tags__product_id")
+            )
+        )
+        return plan_queryset(queryset, self.get_serializer_class())
+
+
+class CartResponseMixin:
+    """Render the requesting user's cart"""
+
+    def cart_response(self, cart, status_code=status.HTTP_200_OK):
+        serializer = CartSerializer(
+            {
+                "id": cart.id,
+                "items": carts.cart_items(cart),
+                "total": carts.cart_total(cart),
+            }
+        )
+        return Response(serializer.data, status=status_code)
+
+
+class CartView(CartResponseMixin, APIView):
+    """
+    API endpoint for the authenticated user's cart.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return self.cart_response(carts.get_cart(request.user))
+
+    def delete(self, request, *args, **kwargs):
+        carts.clear(carts.get_cart(request.user))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CartItemListAPIView(CartResponseMixin, APIView):
+    """
+    API endpoint for adding variants to the cart.
+    """
+
+    def post(self, request, *args, **kwargs):
+        serializer = CartItemCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        cart = carts.get_cart(request.user)
+        carts.add_item(
+            cart,
+            serializer.validated_data["variant"],
+            serializer.validated_data["quantity"],
+        )
+        return self.cart_response(cart, status.HTTP_201_CREATED)
+
+
+class CartItemDetailAPIView(CartResponseMixin, APIView):
+    """
+    API endpoint for a single cart line, addressed by variant id.
+    """
+
+    def put(self, request, variant_id, *args, **kwargs):
+        serializer = CartItemQuantitySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        variant = get_object_or_404(Variant, pk=variant_id)
+        cart = carts.get_cart(request.user)
+        carts.set_quantity(
+            cart, variant, serializer.validated_data["quantity"]
+        )
+        return self.cart_response(cart)
+
+    def delete(self, request, variant_id, *args, **kwargs):
+        carts.remove_item(carts.get_cart(request.user), variant_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CheckoutView(APIView):
+    """
+    API endpoint for placing an order from the user's cart.
+    """
+
+    def post(self, request, *args, **kwargs):
+        serializer = CheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            order = checkout.checkout(
+                request.user, **serializer.validated_data
+            )
+        except checkout.EmptyCartError as exc:
+            return Response(
+                {"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        except checkout.InsufficientStockError as exc:
+            return Response(
+                {"detail": str(exc), "variants": exc.variant_ids},
+                status=status.HTTP_409_CONFLICT,
+            )
+        order = plan_queryset(Order.objects.all(), OrderSerializer).get(
+            pk=order.pk
+        )
+        return Response(
+            OrderSerializer(order).data, status=status.HTTP_201_CREATED
+        )
+
+
+class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for the authenticated user's order history.
+    """
+
+    queryset = Order.objects.all()
+    serializer_class = OrderSerializer
+    pagination_class = OrderCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = OrderFilter
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return OrderSummarySerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset().filter(user=self.request.user)
+        if self.action == "list":
+            item_count = (
+                OrderItem.objects.filter(order=OuterRef("pk"))
+                .values("order")
+                .annotate(count=Sum("quantity"))
+                .values("count")
+            )
+            return queryset.annotate(
+                item_count=Coalesce(Subquery(item_count), 0)
+            )
+        return plan_queryset(queryset, self.get_serializer_class())
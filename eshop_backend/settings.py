@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "rest_framework",
+    "django_filters",
     "core",
     "corsheaders",
     "rest_framework_simplejwt",
@@ -49,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.RequestTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -62,11 +65,25 @@ MIDDLEWARE = [
 # Configure Django REST Framework
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "core.authentication.JWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    # orjson backed when requirements-fast.txt is installed, see
+    # core/renderers.py
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "core.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+    # proxies in front of the app, so throttles and the login buckets
+    # key on the client in X-Forwarded-For rather than on the proxy
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
 }
 
 SIMPLE_JWT = {
@@ -74,8 +91,32 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_OBTAIN_SERIALIZER": "core.serializers.TokenObtainSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "core.serializers.TokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "core.serializers.TokenVerifySerializer",
 }
 
+# Login password checks and attempt limits, see core/login.py; hashing
+# threads default to the number of CPUs
+LOGIN_HASH_WORKERS = None
+LOGIN_THROTTLE_RATES = {"username": "10/min", "address": "60/min"}
+
+# Rotated refresh tokens, see core/blacklist.py
+TOKEN_BLACKLIST_CAPACITY = 1000000
+TOKEN_BLACKLIST_ERROR_RATE = 0.01
+TOKEN_BLACKLIST_SYNC_INTERVAL = 1.0
+TOKEN_BLACKLIST_PRUNE_INTERVAL = 60
+TOKEN_BLACKLIST_BACKGROUND_LOAD = True
+
+# Verified tokens and their users kept per process, see
+# core/authentication.py
+JWT_TOKEN_CACHE_SIZE = 10000
+JWT_USER_CACHE_TIMEOUT = 60
+
+# Seconds between checks that a per-process search index (used where
+# SQLite lacks FTS5) still matches the catalog, see core/search.py
+SEARCH_INDEX_CHECK_INTERVAL = 5.0
+
 ROOT_URLCONF = "eshop_backend.urls"
 
 TEMPLATES = [
@@ -107,6 +148,97 @@ DATABASES = {
     }
 }
 
+# Applied to every new SQLite connection, see core/db.py
+SQLITE_PRAGMAS = {}
+
+# DATABASE_PROFILE=production: WAL so readers never wait for the writer,
+# fsync only at checkpoints, a 64 MiB page cache, 256 MiB of mmap I/O,
+# writers wait for the lock instead of failing, and connections are
+# kept for ten minutes and health checked before reuse.
+PRODUCTION_SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "cache_size": -64 * 1024,
+    "mmap_size": 256 * 2**20,
+    "busy_timeout": 5000,
+    "temp_store": "memory",
+}
+if os.environ.get("DATABASE_PROFILE") == "production":
+    SQLITE_PRAGMAS = PRODUCTION_SQLITE_PRAGMAS
+    DATABASES["default"].update(
+        {
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {"timeout": 5},
+        }
+    )
+
+# Optional read replica (a copy of the primary file or another
+# database) serving the read-only product actions, see core/db.py
+if os.environ.get("DATABASE_REPLICA"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.environ["DATABASE_REPLICA"],
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["core.db.ReadReplicaRouter"]
+REPLICA_DATABASE_ALIAS = "replica"
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory per process; point "default" at a shared backend (redis,
+# memcached) in production so every worker sees the same versions.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "eshop-default",
+    }
+}
+
+# Rendered product detail payloads, see core/cache.py
+PRODUCT_DETAIL_CACHE_ALIAS = "default"
+PRODUCT_DETAIL_CACHE_TIMEOUT = 60 * 60
+
+
+# Request instrumentation, see core/middleware.py
+# Server-Timing headers and slow request logs; removed from the
+# middleware chain at startup unless enabled.
+
+REQUEST_INSTRUMENTATION = os.environ.get(
+    "REQUEST_INSTRUMENTATION", ""
+).lower() in ("1", "true", "yes")
+SLOW_REQUEST_THRESHOLD_MS = 500
+SLOW_REQUEST_TOP_QUERIES = 5
+
+# Metrics served at /metrics/, see core/metrics.py
+# Set METRICS_DIR to a directory shared by all workers to aggregate the
+# metrics of several processes. Scrapers authenticate with METRICS_TOKEN
+# as a bearer token; without one only admin users can read the metrics.
+
+METRICS_ENABLED = True
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None
+METRICS_FLUSH_INTERVAL = 1.0
+
+# Readiness probes, see core/health.py
+
+HEALTH_PROBE_TTL = 5.0
+HEALTH_PROBE_TIMEOUT = 2.0
+HEALTH_MIN_FREE_DISK_BYTES = 100 * 2**20
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core.performance": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -7,13 +7,13 @@ from django.urls import path, include
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from core.views import MetricsView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
     TokenVerifyView,
 )
 
-
 schema_view = get_schema_view(
     openapi.Info(
         title="Eshop API",
@@ -30,6 +30,7 @@ schema_view = get_schema_view(
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/v1/", include("core.urls")),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
     path(
         "swagger<format>/",
         schema_view.without_ui(cache_timeout=0),